@@ -1,7 +1,9 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from .constantes import SECRET_KEY
+from .constantes import SECRET_KEY, ENVIRONNEMENT, PROFILS_MOTEUR, INSTRUMENTATION, REQUETE_LENTE, REQUETE_SQL_LENTE, \
+    COMPRESSION, COMPRESSION_SEUIL, COMPRESSION_NIVEAU_GZIP, COMPRESSION_NIVEAU_BROTLI
+from .moteur import installer_pragmas, options_moteur
 import os
 
 chemin_actuel = os.path.dirname(os.path.abspath(__file__))
@@ -12,12 +14,47 @@ app = Flask("application", template_folder=templates, static_folder=statics)
 
 app.config['SECRET_KEY'] = SECRET_KEY
 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///../recettes.sqlite'
+app.config['RECETTES_ENV'] = ENVIRONNEMENT
+
+app.config['RECETTES_DB'] = os.environ.get(
+    "RECETTES_DB", os.path.join(os.path.dirname(chemin_actuel), "recettes.sqlite"))
+
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    "RECETTES_DB_URI", "sqlite:///" + os.path.abspath(app.config['RECETTES_DB']))
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options_moteur(PROFILS_MOTEUR[app.config['RECETTES_ENV']])
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+app.config['INSTRUMENTATION'] = INSTRUMENTATION
+
+app.config['REQUETE_LENTE'] = REQUETE_LENTE
+
+app.config['REQUETE_SQL_LENTE'] = REQUETE_SQL_LENTE
+
+app.config['COMPRESSION'] = COMPRESSION
+
+app.config['COMPRESSION_SEUIL'] = COMPRESSION_SEUIL
+
+app.config['COMPRESSION_NIVEAU_GZIP'] = COMPRESSION_NIVEAU_GZIP
+
+app.config['COMPRESSION_NIVEAU_BROTLI'] = COMPRESSION_NIVEAU_BROTLI
+
+installer_pragmas(PROFILS_MOTEUR[app.config['RECETTES_ENV']]["pragmas"])
+
 db = SQLAlchemy(app)
 
 login = LoginManager(app)
 
+from .cache import ExtensionCache
+app.jinja_env.add_extension(ExtensionCache)
+
 from .routes import generic, api
+from . import commandes
+from .instrumentation import installer_instrumentation
+from .ressources import installer_ressources
+from .compression import installer_compression
+
+installer_instrumentation()
+installer_ressources()
+installer_compression()
@@ -0,0 +1,274 @@
+"""Mode de service asynchrone (ASGI) de l'API des plats.
+
+Les routes /api/plats et /api/plats/<plat_id> y sont servies par une session SQLAlchemy asynchrone (aiosqlite) :
+pendant qu'une lecture SQLite attend, la boucle d'évènements sert les autres requêtes, au lieu de bloquer un
+processus léger du serveur WSGI. Les modèles et la sérialisation sont ceux de l'application Flask, le json produit
+est donc identique à celui de routes/api.py. Les autres routes restent servies par run.py.
+
+    uvicorn application.asgi:application --workers 1
+"""
+import asyncio
+from urllib.parse import parse_qs
+
+from flask import request
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from .app import app, db
+from .constantes import API_ROUTE, PROFILS_MOTEUR
+from .moteur import options_moteur
+from .modeles.donnees import Plat
+from .modeles.jsonapi import lire_parametres, parametres_a_reporter, options_plats, inclure
+from .modeles.recherche import index_disponible, selection_plats
+from .routes.api import decoder_curseur, liens_pages, liens_curseurs, lire_limite
+
+
+def adresse_asynchrone(adresse: str) -> str:
+    """permet de transformer l'adresse SQLAlchemy de la base de données en adresse pour le pilote aiosqlite.
+
+            Paramètres
+            ----------
+            adresse :
+                valeur de SQLALCHEMY_DATABASE_URI, par exemple "sqlite:////chemin/recettes.sqlite".
+
+            Returns
+            -------
+            str
+                adresse utilisable par create_async_engine()
+            """
+    if adresse.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + adresse[len("sqlite:"):]
+    return adresse
+
+
+class ApplicationAsgi:
+    """
+        C'est une classe qui implémente une application ASGI servant en asynchrone la lecture des plats de l'API.
+        ...
+
+        Les requêtes SQL sont exécutées par une session asynchrone ; la sérialisation (to_jsonapi_dict(), url_for(),
+        json de Flask) est faite dans un contexte de requête Flask construit à partir de la requête ASGI, pour que
+        les liens et le json soient identiques à ceux de l'application Flask.
+
+        Méthodes
+        -------
+        api_plats_browse(arguments)
+            permet de lister ou de chercher les plats, par page ou par curseur.
+
+        api_places_single(plat_id)
+            permet d'obtenir un plat.
+        """
+
+    def __init__(self):
+        self.moteur = None
+        self.sessions = None
+        self._verrou = asyncio.Lock()
+
+    async def demarrer(self):
+        """permet de créer le moteur asynchrone et de vérifier la présence des index plein texte, une seule fois.
+        """
+        async with self._verrou:
+            if self.moteur is not None:
+                return
+            # index_disponible() utilise la session synchrone de Flask : elle est appelée une fois, hors de la boucle.
+            await asyncio.to_thread(self._verifier_index)
+            options = options_moteur(PROFILS_MOTEUR[app.config["RECETTES_ENV"]])
+            self.moteur = create_async_engine(adresse_asynchrone(app.config["SQLALCHEMY_DATABASE_URI"]), **options)
+            self.sessions = async_sessionmaker(self.moteur, expire_on_commit=False)
+
+    @staticmethod
+    def _verifier_index():
+        with app.app_context():
+            index_disponible()
+
+    async def arreter(self):
+        """permet de fermer les connexions du moteur asynchrone.
+        """
+        if self.moteur is not None:
+            await self.moteur.dispose()
+            self.moteur = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._cycle_de_vie(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        await self.demarrer()
+        chemin = scope["path"]
+        # Comme request.args.get() : paramètres vides gardés ("?after=") et première valeur d'un paramètre répété.
+        arguments = {clef: valeurs[0] for clef, valeurs in parse_qs(scope["query_string"].decode("latin-1"),
+                                                                    keep_blank_values=True).items()}
+        if scope["method"] not in ("GET", "HEAD"):
+            statut, corps = 405, None
+        elif chemin == API_ROUTE + "/plats":
+            statut, corps = await self.api_plats_browse(arguments)
+        elif chemin.startswith(API_ROUTE + "/plats/") and "/" not in chemin[len(API_ROUTE + "/plats/"):]:
+            statut, corps = await self.api_places_single(chemin[len(API_ROUTE + "/plats/"):], arguments)
+        else:
+            statut, corps = 404, None
+
+        with self._contexte(scope):
+            if corps is None:
+                response = app.json.response({"erreur": "Impossible d'accéder à la requête"})
+            else:
+                response = app.json.response(corps())
+        donnees = response.get_data()
+        await send({
+            "type": "http.response.start",
+            "status": statut,
+            "headers": [(b"content-type", response.content_type.encode("latin-1")),
+                        (b"content-length", str(len(donnees)).encode("latin-1"))]
+        })
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else donnees})
+
+    async def _cycle_de_vie(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self.demarrer()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.arreter()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    def _contexte(scope):
+        """permet de construire le contexte de requête Flask correspondant à une requête ASGI, pour que url_for() et
+        request.url produisent les mêmes liens que l'application Flask.
+        """
+        entetes = {clef.decode("latin-1"): valeur.decode("latin-1") for clef, valeur in scope["headers"]}
+        serveur = entetes.get("host")
+        if serveur is None and scope.get("server"):
+            serveur = "{}:{}".format(*scope["server"])
+        return app.test_request_context(
+            scope["path"],
+            base_url="{}://{}{}".format(scope.get("scheme", "http"), serveur or "localhost", scope.get("root_path", "")),
+            query_string=scope["query_string"].decode("latin-1"),
+            method=scope["method"]
+        )
+
+    async def api_places_single(self, plat_id: str, arguments: dict):
+        """permet d'obtenir un plat, comme api_places_single() dans routes/api.py.
+
+                Returns
+                -------
+                tuple
+                    statut HTTP et fonction produisant le json (None si le plat n'existe pas)
+                """
+        statut, donnees = lire_parametres(arguments)
+        if statut is not True:
+            return 400, lambda: {"erreurs": donnees}
+        champs, inclusions = donnees
+
+        async with self.sessions() as session:
+            plat = (await session.scalars(
+                db.select(Plat).options(*options_plats(champs, inclusions)).filter(Plat.plat_id == plat_id)
+            )).first()
+        if plat is None:
+            return 404, None
+
+        def corps():
+            dictionnaire = plat.to_jsonapi_dict(champs=champs, inclusions=inclusions)
+            if inclusions:
+                return {"data": dictionnaire, "included": inclure([plat], inclusions)}
+            return dictionnaire
+        return 200, corps
+
+    async def api_plats_browse(self, arguments: dict):
+        """permet de lister ou de chercher les plats, par page ou par curseur, comme api_plats_browse() dans
+        routes/api.py.
+
+                Paramètres
+                ----------
+                arguments :
+                    paramètres de la requête (q, page, limit, after, before).
+
+                Returns
+                -------
+                tuple
+                    statut HTTP et fonction produisant le json (None si la page n'existe pas)
+                """
+        motclef = arguments.get("q", None)
+        page = arguments.get("page", "1")
+        page = int(page) if page.isdigit() else 1
+        limite = lire_limite(arguments.get("limit", None))
+        apres = arguments.get("after", None)
+        avant = arguments.get("before", None)
+
+        statut, donnees = lire_parametres(arguments)
+        if statut is not True:
+            return 400, lambda: {"erreurs": donnees}
+        champs, inclusions = donnees
+
+        requete = selection_plats(motclef) if motclef else db.select(Plat).order_by(Plat.plat_id)
+
+        if apres is not None or avant is not None:
+            return await self._curseur(requete, motclef, limite, apres, avant, arguments, champs, inclusions)
+        requete = requete.options(*options_plats(champs, inclusions))
+
+        if page < 1:
+            return 404, None
+        async with self.sessions() as session:
+            total = await session.scalar(
+                db.select(db.func.count()).select_from(requete.order_by(None).subquery()))
+            plats = (await session.scalars(requete.limit(limite).offset((page - 1) * limite))).all()
+        if not plats and page != 1:
+            return 404, None
+
+        def corps():
+            return self._document(plats, champs, inclusions, liens_pages(
+                motclef, limite, page, page * limite < total, page > 1, parametres_a_reporter(arguments)))
+        return 200, corps
+
+    @staticmethod
+    def _document(plats: list, champs: set, inclusions: set, liens: dict) -> dict:
+        """permet de produire le json d'une page de plats, avec les ressources incluses s'il y en a.
+        """
+        gabarits = Plat.gabarits_liens()
+        document = {
+            "links": dict({"self": request.url}, **liens),
+            "data": [plat.to_jsonapi_dict(gabarits=gabarits, champs=champs, inclusions=inclusions) for plat in plats]
+        }
+        if inclusions:
+            document["included"] = inclure(plats, inclusions)
+        return document
+
+    async def _curseur(self, requete, motclef: str, limite: int, apres: str, avant: str, arguments: dict,
+                       champs: set, inclusions: set):
+        """permet de parcourir les plats par curseur, comme api_plats_curseur() dans routes/api.py.
+        """
+        curseur = decoder_curseur(apres if apres is not None else avant)
+        if curseur is None:
+            return 404, None
+
+        requete = requete.order_by(None)
+        chargement = requete.options(*options_plats(champs, inclusions))
+
+        async def plat_au_dela(session, condition) -> bool:
+            # Comme plat_au_dela() dans routes/api.py : un plat précède-t-il (ou suit-il) la page ?
+            return await session.scalar(requete.filter(condition).with_only_columns(Plat.plat_id).limit(1)) \
+                is not None
+
+        async with self.sessions() as session:
+            if apres is not None:
+                plats = (await session.scalars(
+                    chargement.filter(Plat.plat_id > curseur).order_by(Plat.plat_id).limit(limite + 1))).all()
+                suivante = len(plats) > limite
+                plats = plats[:limite]
+                precedente = bool(plats) and await plat_au_dela(session, Plat.plat_id < plats[0].plat_id)
+            else:
+                plats = (await session.scalars(
+                    chargement.filter(Plat.plat_id < curseur).order_by(Plat.plat_id.desc()).limit(limite + 1))).all()
+                precedente = len(plats) > limite
+                plats = list(reversed(plats[:limite]))
+                suivante = bool(plats) and await plat_au_dela(session, Plat.plat_id > plats[-1].plat_id)
+
+        def corps():
+            return self._document(plats, champs, inclusions, liens_curseurs(
+                motclef, limite, plats, suivante, precedente, parametres_a_reporter(arguments)))
+        return 200, corps
+
+
+application = ApplicationAsgi()
@@ -0,0 +1,366 @@
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import threading
+import time
+
+from flask import request, session, g, make_response
+from flask_login import current_user
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from .constantes import CACHE_TAILLE_MAX, CACHE_DUREE, FRAGMENTS_TAILLE_MAX
+from .modeles.evenements import abonner, PLAT_AJOUTE, PLAT_MODIFIE, PLAT_SUPPRIME, COMPOSITION_AJOUTEE, \
+    INGREDIENT_AJOUTE
+
+
+class CacheLRU:
+    """
+        C'est une classe qui garde en mémoire des entrées limitées en taille totale (LRU) : les entrées les moins
+        récemment lues sont évincées lorsque la taille totale dépasse la limite. Chaque entrée porte des étiquettes,
+        par exemple ("plat", 3), qui permettent de la supprimer quand les données qu'elle contient changent.
+        ...
+
+        Une entrée est un dictionnaire qui contient au moins "corps" (dont la longueur compte pour la taille),
+        "creation" et "etiquettes", et éventuellement "duree" pour remplacer la durée de vie par défaut.
+
+        Méthodes
+        -------
+        invalider(*etiquettes)
+            permet de supprimer les entrées qui portent au moins une des étiquettes.
+
+        vider()
+            permet de vider entièrement le cache.
+
+        statistiques()
+            permet de connaître l'état du cache.
+        """
+
+    def __init__(self, taille_max: int = CACHE_TAILLE_MAX, duree: int = CACHE_DUREE):
+        self.taille_max = taille_max
+        self.duree = duree
+        self.taille = 0
+        self.compteurs = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self._entrees = OrderedDict()
+        self._par_etiquette = {}
+        self._verrou = threading.Lock()
+
+    def _retirer(self, clef):
+        """permet de retirer une entrée du cache ; le verrou doit être tenu.
+        """
+        entree = self._entrees.pop(clef, None)
+        if entree is None:
+            return
+        self.taille -= len(entree["corps"])
+        for etiquette in entree["etiquettes"]:
+            clefs = self._par_etiquette.get(etiquette)
+            if clefs is not None:
+                clefs.discard(clef)
+                if not clefs:
+                    del self._par_etiquette[etiquette]
+
+    def _lire(self, clef):
+        """permet de lire une entrée encore valide du cache.
+
+                Returns
+                -------
+                dict
+                    entrée du cache
+
+                None
+                    si l'entrée n'est pas en cache ou a expiré
+                """
+        with self._verrou:
+            entree = self._entrees.get(clef)
+            if entree is None:
+                return None
+            if time.time() - entree["creation"] > (entree.get("duree") or self.duree):
+                self._retirer(clef)
+                return None
+            self._entrees.move_to_end(clef)
+            return entree
+
+    def _ecrire(self, clef, entree):
+        """permet d'ajouter une entrée au cache, en évinçant les moins récemment servies si besoin.
+        """
+        if len(entree["corps"]) > self.taille_max // 4:
+            return
+        with self._verrou:
+            self._retirer(clef)
+            self._entrees[clef] = entree
+            self.taille += len(entree["corps"])
+            for etiquette in entree["etiquettes"]:
+                self._par_etiquette.setdefault(etiquette, set()).add(clef)
+            while self.taille > self.taille_max and self._entrees:
+                self._retirer(next(iter(self._entrees)))
+                self.compteurs["evictions"] += 1
+
+    def invalider(self, *etiquettes):
+        """permet de supprimer les entrées qui portent au moins une des étiquettes.
+
+                Paramètres
+                ----------
+                etiquettes :
+                    étiquettes, par exemple ("plat", 3) ou ("ingredient", 12).
+                """
+        with self._verrou:
+            for etiquette in etiquettes:
+                for clef in list(self._par_etiquette.get(etiquette, ())):
+                    self._retirer(clef)
+                    self.compteurs["invalidations"] += 1
+
+    def vider(self):
+        """permet de vider entièrement le cache.
+        """
+        with self._verrou:
+            self._entrees.clear()
+            self._par_etiquette.clear()
+            self.taille = 0
+
+    def statistiques(self) -> dict:
+        """permet de connaître l'état du cache.
+
+                Returns
+                -------
+                dict
+                    compteurs, nombre d'entrées et taille
+                """
+        with self._verrou:
+            return dict(self.compteurs, entrees=len(self._entrees), octets=self.taille, octets_max=self.taille_max)
+
+
+class CacheReponses(CacheLRU):
+    """
+        C'est une classe qui garde en mémoire les réponses des pages qui changent rarement (détail d'un plat, d'un
+        ingrédient), avec leur ETag et leur date de modification pour répondre 304 aux requêtes conditionnelles.
+        ...
+
+        Le cache est un LRU limité en octets (voir CacheLRU). Les événements publiés par les méthodes d'écriture des
+        modèles suppriment les réponses concernées par leurs étiquettes. Ces événements ne traversent pas les
+        processus : la durée de vie maximale des réponses (CACHE_DUREE) borne le retard d'un processus sur les
+        écritures faites par un autre.
+
+        Méthodes
+        -------
+        reponse(etiquettes)
+            décorateur qui met en cache la réponse d'une route.
+
+        invalider(*etiquettes)
+            permet de supprimer les réponses qui portent au moins une des étiquettes.
+        """
+
+    def __init__(self, taille_max: int = CACHE_TAILLE_MAX, duree: int = CACHE_DUREE):
+        super().__init__(taille_max, duree)
+        self.compteurs["not_modified"] = 0
+
+    @staticmethod
+    def _conditionnelle(entree):
+        """permet de construire la réponse à partir d'une entrée, et de la transformer en 304 si le client possède
+        déjà cette version.
+        """
+        response = make_response(entree["corps"], entree["statut"])
+        response.mimetype = entree["mimetype"]
+        response.set_etag(entree["etag"])
+        response.last_modified = entree["creation"]
+        response.cache_control.no_cache = True
+        response.make_conditional(request)
+        return response
+
+    def reponse(self, etiquettes=None):
+        """décorateur qui met en cache la réponse d'une route. Seules les réponses 200 aux requêtes GET sont gardées,
+        et jamais lorsque des messages flash attendent d'être affichés.
+
+                Paramètres
+                ----------
+                etiquettes :
+                    fonction qui reçoit les arguments de la route et renvoie les étiquettes de la réponse ; la route
+                    peut en ajouter d'autres avec etiqueter().
+
+                Returns
+                -------
+                function
+                    route décorée
+                """
+        def decorateur(route):
+            @wraps(route)
+            def route_en_cache(*args, **kwargs):
+                if request.method != "GET" or session.get("_flashes"):
+                    return route(*args, **kwargs)
+
+                utilisateur = current_user.get_id() if current_user.is_authenticated else None
+                clef = (request.full_path, utilisateur)
+                entree = self._lire(clef)
+                if entree is not None:
+                    response = self._conditionnelle(entree)
+                    with self._verrou:
+                        self.compteurs["hits"] += 1
+                        if response.status_code == 304:
+                            self.compteurs["not_modified"] += 1
+                    response.headers["X-Cache"] = "HIT"
+                    return response
+
+                with self._verrou:
+                    self.compteurs["misses"] += 1
+                g.etiquettes_cache = set(etiquettes(*args, **kwargs) if etiquettes else [])
+                response = make_response(route(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed or session.get("_flashes") \
+                        or g.get("ne_pas_garder"):
+                    return response
+
+                corps = response.get_data()
+                entree = {
+                    "corps": corps,
+                    "statut": response.status_code,
+                    "mimetype": response.mimetype,
+                    "etag": hashlib.sha1(corps).hexdigest(),
+                    "creation": time.time(),
+                    "etiquettes": g.etiquettes_cache
+                }
+                self._ecrire(clef, entree)
+                response = self._conditionnelle(entree)
+                response.headers["X-Cache"] = "MISS"
+                return response
+            return route_en_cache
+        return decorateur
+
+
+def etiqueter(*etiquettes):
+    """permet à une route mise en cache d'ajouter des étiquettes à sa réponse, par exemple celles des plats qu'elle
+    affiche.
+
+            Paramètres
+            ----------
+            etiquettes :
+                étiquettes, par exemple ("plat", 3).
+            """
+    if "etiquettes_cache" in g:
+        g.etiquettes_cache.update(etiquettes)
+
+
+def ne_pas_garder():
+    """permet à une route mise en cache d'empêcher que sa réponse soit gardée, par exemple lorsqu'elle est
+    incomplète parce qu'un index est encore en construction.
+    """
+    if "etiquettes_cache" in g:
+        g.ne_pas_garder = True
+
+
+cache_reponses = CacheReponses()
+
+
+def _plat_modifie(plat_id: int = None, plat=None, **autres):
+    cache_reponses.invalider(("plat", plat_id if plat is None else plat.plat_id))
+
+
+def _composition_ajoutee(plat_id: int, ingredients: list, **autres):
+    cache_reponses.invalider(("plat", plat_id), *[("ingredient", ingredient_id) for ingredient_id in ingredients])
+
+
+def _ingredient_ajoute(ingredient, **autres):
+    cache_reponses.invalider(("ingredient", ingredient.ingredient_id))
+
+
+class CacheFragments(CacheLRU):
+    """
+        C'est une classe qui garde en mémoire des morceaux de gabarits déjà rendus (barre de navigation, listes par
+        type...), rendus avec la balise {% cache clef, duree %} ... {% endcache %} de l'extension ExtensionCache.
+        ...
+
+        Chaque morceau est rangé sous sa clef et sous la version des données au moment du rendu. Toute écriture
+        publiée par les modèles change la version : les morceaux rendus avant ne sont plus lus, et finissent évincés
+        par le LRU. Comme pour les réponses, la durée de vie des morceaux borne le retard d'un processus sur les
+        écritures faites par un autre.
+
+        Méthodes
+        -------
+        rendre(clef, duree, rendu)
+            permet de lire un morceau en cache, ou de le rendre et de le garder.
+
+        changer_version()
+            permet de rendre obsolètes tous les morceaux déjà rendus.
+        """
+
+    def __init__(self, taille_max: int = FRAGMENTS_TAILLE_MAX, duree: int = CACHE_DUREE):
+        super().__init__(taille_max, duree)
+        self.version = 0
+
+    def changer_version(self, **autres):
+        """permet de rendre obsolètes tous les morceaux déjà rendus ; appelée à chaque écriture publiée.
+        """
+        with self._verrou:
+            self.version += 1
+
+    def rendre(self, clef, duree, rendu) -> str:
+        """permet de lire un morceau en cache, ou de le rendre et de le garder.
+
+                Paramètres
+                ----------
+                clef :
+                    clef du morceau, une chaîne ou une suite de valeurs (par exemple ("navigation", id utilisateur)).
+
+                duree :
+                    durée de vie du morceau en secondes, ou None pour CACHE_DUREE.
+
+                rendu :
+                    fonction qui rend le morceau.
+
+                Returns
+                -------
+                str
+                    morceau rendu
+                """
+        clef = (tuple(clef) if isinstance(clef, (list, tuple)) else clef, self.version)
+        entree = self._lire(clef)
+        if entree is not None:
+            with self._verrou:
+                self.compteurs["hits"] += 1
+            return entree["corps"]
+
+        with self._verrou:
+            self.compteurs["misses"] += 1
+        corps = rendu()
+        self._ecrire(clef, {"corps": corps, "creation": time.time(), "duree": duree, "etiquettes": ()})
+        return corps
+
+
+class ExtensionCache(Extension):
+    """
+        C'est une extension Jinja qui ajoute la balise {% cache clef, duree %} ... {% endcache %} : le contenu de la
+        balise n'est rendu qu'une fois par clef et par version des données, puis lu dans cache_fragments. La durée
+        (en secondes) est facultative.
+
+        Les variables dont dépend le contenu doivent faire partie de la clef, par exemple
+        {% cache ("navigation", current_user.get_id()) %}. Pour que le cache évite aussi les requêtes, la route
+        peut passer au gabarit une fonction qui lit les données, appelée à l'intérieur de la balise.
+        """
+    tags = {"cache"}
+
+    def parse(self, parser):
+        ligne = next(parser.stream).lineno
+        arguments = [parser.parse_expression()]
+        if parser.stream.skip_if("comma"):
+            arguments.append(parser.parse_expression())
+        else:
+            arguments.append(nodes.Const(None))
+        corps = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(self.call_method("_rendre", arguments), [], [], corps).set_lineno(ligne)
+
+    @staticmethod
+    def _rendre(clef, duree, caller):
+        return Markup(cache_fragments.rendre(clef, duree, caller))
+
+
+cache_fragments = CacheFragments()
+
+
+abonner(PLAT_AJOUTE, _plat_modifie)
+abonner(PLAT_MODIFIE, _plat_modifie)
+abonner(PLAT_SUPPRIME, _plat_modifie)
+abonner(COMPOSITION_AJOUTEE, _composition_ajoutee)
+abonner(INGREDIENT_AJOUTE, _ingredient_ajoute)
+abonner(PLAT_AJOUTE, cache_fragments.changer_version)
+abonner(PLAT_MODIFIE, cache_fragments.changer_version)
+abonner(PLAT_SUPPRIME, cache_fragments.changer_version)
+abonner(COMPOSITION_AJOUTEE, cache_fragments.changer_version)
+abonner(INGREDIENT_AJOUTE, cache_fragments.changer_version)
@@ -0,0 +1,91 @@
+import os
+
+import click
+
+from .app import app
+from .modeles.recherche import reconstruire_index
+from .modeles.importation import Importation, LECTEURS
+from .modeles.donnees import purger_orphelins
+from .modeles.courses import remplir_quantites
+from .migrations import migrer
+from .ressources import construire
+
+
+@app.cli.command("reconstruire-recherche")
+def reconstruire_recherche():
+    """permet de reconstruire les index plein texte des plats et des ingrédients, s'ils ont été désynchronisés.
+    """
+    if reconstruire_index():
+        click.echo("Les index de recherche ont été reconstruits.")
+    else:
+        raise click.ClickException("Impossible de reconstruire les index : la base de données n'est pas "
+                                   "migrée (flask migrer).")
+
+
+@app.cli.command("import")
+@click.argument("fichier", type=click.File("r", encoding="utf-8"))
+@click.option("--format", "format_fichier", type=click.Choice(sorted(LECTEURS)), default=None,
+              help="Format du fichier ; déduit de l'extension s'il n'est pas indiqué.")
+@click.option("--lot", default=10000, show_default=True, help="Nombre de lignes par transaction (le lot est écrit au début du plat suivant).")
+def importer(fichier, format_fichier, lot):
+    """permet d'importer en flux un catalogue de plats et de leurs ingrédients depuis un fichier CSV ou JSON Lines.
+    """
+    if format_fichier is None:
+        extension = os.path.splitext(fichier.name)[1].lower().lstrip(".")
+        format_fichier = "jsonl" if extension in ("jsonl", "ndjson") else extension
+    if format_fichier not in LECTEURS:
+        raise click.BadParameter("format inconnu, utilisez --format csv ou --format jsonl")
+
+    def rapport(statistiques):
+        click.echo("{lignes} lignes lues, {plats} plats, {ingredients} ingrédients et {compositions} compositions "
+                   "ajoutés, {ignorees} lignes ignorées ({debit:.0f} lignes/s)".format(
+                       debit=statistiques["lignes"] / max(statistiques["secondes"], 1e-9), **statistiques), err=True)
+
+    statistiques = Importation(taille_lot=lot, rapport=rapport).importer(LECTEURS[format_fichier](fichier))
+    click.echo("Import terminé en {:.1f} s.".format(statistiques["secondes"]))
+
+
+@app.cli.command("migrer")
+def migrer_base():
+    """permet de mettre à jour le schéma de la base de données en appliquant les migrations manquantes.
+    """
+    try:
+        appliquees = migrer(rapport=lambda fichier: click.echo("Migration appliquée : {}".format(fichier)))
+    except Exception as erreur:
+        raise click.ClickException("La migration a échoué : {}".format(erreur))
+    if not appliquees:
+        click.echo("La base de données est à jour.")
+
+
+@app.cli.command("purger-orphelins")
+@click.option("--simulation", is_flag=True, help="Compte les lignes orphelines sans les supprimer.")
+def purger(simulation):
+    """permet de supprimer les compositions et les éditions qui désignent un plat (ou un ingrédient) qui n'existe plus.
+    """
+    orphelins = purger_orphelins(simulation=simulation)
+    click.echo("{compositions} compositions et {editions} éditions orphelines {action}.".format(
+        action="trouvées" if simulation else "supprimées", **orphelins))
+
+
+@app.cli.command("remplir-quantites")
+@click.option("--tout", is_flag=True, help="Analyse à nouveau toutes les compositions.")
+@click.option("--lot", default=10000, show_default=True, help="Nombre de compositions par transaction.")
+def remplir(tout, lot):
+    """permet d'enregistrer la valeur et l'unité des quantités des compositions existantes.
+    """
+    traitees = remplir_quantites(taille_lot=lot, tout=tout,
+                                 rapport=lambda nombre: click.echo("{} compositions traitées".format(nombre), err=True))
+    click.echo("{} compositions analysées.".format(traitees))
+
+
+@app.cli.command("construire-ressources")
+def construire_ressources():
+    """permet de minifier les fichiers statiques, de leur donner un nom avec l'empreinte de leur contenu et d'en
+    écrire des versions compressées (gzip et brotli).
+    """
+    def rapport(nom, nom_construit, tailles):
+        origine, minifie, gzip, brotli = tailles
+        compresses = ", gzip {} o, brotli {} o".format(gzip, brotli) if gzip is not None else ""
+        click.echo("{} -> {} : {} o, minifié {} o{}".format(nom, nom_construit, origine, minifie, compresses))
+
+    construire(rapport=rapport)
@@ -0,0 +1,171 @@
+import zlib
+
+import brotli
+from flask import request
+
+from .app import app
+
+
+# Types des réponses compressées ; les images et les fichiers statiques construits (déjà compressés) sont laissés
+# tels quels.
+TYPES_COMPRESSES = {
+    "text/html", "text/plain", "text/css", "text/csv", "text/javascript", "application/javascript",
+    "application/json", "application/vnd.api+json", "application/x-ndjson", "image/svg+xml"
+}
+
+# En flux, quantité minimale de données (en octets) à compresser entre deux vidages du compresseur : vider après
+# chaque petit morceau (une ligne NDJSON) fait perdre l'essentiel du gain, surtout avec brotli.
+VIDAGE_MIN = 8 * 1024
+
+
+class Compresseur:
+    """
+        C'est une classe qui compresse le corps d'une réponse, en une fois ou morceau par morceau, avec gzip ou
+        brotli.
+        ...
+
+        En flux, le compresseur est vidé (flush) dès que VIDAGE_MIN octets ont été reçus depuis le vidage précédent,
+        pour que le navigateur puisse afficher le début de la page sans attendre la fin : la compression y perd un
+        peu, le temps de réponse presque rien.
+
+        Méthodes
+        -------
+        tout(donnees)
+            permet de compresser d'un coup un corps complet.
+
+        compresser(donnees)
+            permet de compresser un morceau et de renvoyer tout ce qui peut déjà être envoyé.
+
+        terminer()
+            permet de renvoyer la fin du flux compressé.
+        """
+
+    def __init__(self, encodage: str, niveau: int):
+        self.encodage = encodage
+        self._en_attente = 0
+        if encodage == "br":
+            self._brotli = brotli.Compressor(quality=niveau)
+        else:
+            # wbits = 16 + 15 : en-tête et somme de contrôle gzip autour du flux deflate.
+            self._zlib = zlib.compressobj(niveau, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compresser(self, donnees: bytes) -> bytes:
+        self._en_attente += len(donnees)
+        vider = self._en_attente >= VIDAGE_MIN
+        if vider:
+            self._en_attente = 0
+        if self.encodage == "br":
+            return self._brotli.process(donnees) + (self._brotli.flush() if vider else b"")
+        return self._zlib.compress(donnees) + (self._zlib.flush(zlib.Z_SYNC_FLUSH) if vider else b"")
+
+    def terminer(self) -> bytes:
+        if self.encodage == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+    def tout(self, donnees: bytes) -> bytes:
+        """permet de compresser d'un coup un corps complet.
+        """
+        if self.encodage == "br":
+            return self._brotli.process(donnees) + self._brotli.finish()
+        return self._zlib.compress(donnees) + self._zlib.flush()
+
+
+def choisir_encodage() -> str:
+    """permet de choisir, d'après l'en-tête Accept-Encoding de la requête, l'encodage de la réponse : brotli s'il est
+    accepté au moins autant que gzip, sinon gzip.
+
+            Returns
+            -------
+            str
+                "br", "gzip", ou None si aucun des deux n'est accepté
+            """
+    acceptes = request.accept_encodings
+    qualites = {"br": acceptes["br"], "gzip": max(acceptes["gzip"], acceptes["x-gzip"])}
+    encodage = max(("br", "gzip"), key=lambda nom: qualites[nom])
+    return encodage if qualites[encodage] > 0 else None
+
+
+def _morceaux(iterable, compresseur: Compresseur, charset: str = "utf-8"):
+    """permet de compresser au fil de l'eau le corps d'une réponse en flux.
+    """
+    try:
+        for morceau in iterable:
+            if isinstance(morceau, str):
+                morceau = morceau.encode(charset)
+            if morceau:
+                compresse = compresseur.compresser(morceau)
+                if compresse:
+                    yield compresse
+        yield compresseur.terminer()
+    finally:
+        if hasattr(iterable, "close"):
+            iterable.close()
+
+
+def _affaiblir_etag(response):
+    """permet de rendre faible l'ETag d'une réponse compressée : le corps envoyé n'est plus celui qui a servi à le
+    calculer.
+    """
+    etag, faible = response.get_etag()
+    if etag and not faible:
+        response.set_etag(etag, weak=True)
+
+
+def compresser_reponse(response):
+    """permet de compresser une réponse si le navigateur l'accepte et si elle s'y prête : type textuel, corps
+    d'au moins COMPRESSION_SEUIL octets (les réponses en flux, dont la taille n'est pas connue, sont toujours
+    compressées), pas d'encodage déjà appliqué. L'ETag d'une réponse compressée devient faible, pour que les requêtes
+    conditionnelles continuent d'obtenir des 304 ; un 304 (cache des réponses) reçoit le même ETag et le même Vary
+    que la réponse 200 qu'il remplace.
+
+            Paramètres
+            ----------
+            response :
+                réponse produite par la route.
+
+            Returns
+            -------
+            Response
+                la même réponse, compressée ou non
+            """
+    if request.method == "HEAD" or not (200 <= response.status_code < 300 or response.status_code == 304) \
+            or response.status_code in (204, 206) \
+            or response.direct_passthrough or "Content-Encoding" in response.headers \
+            or response.mimetype not in TYPES_COMPRESSES or response.cache_control.no_transform:
+        return response
+    response.vary.add("Accept-Encoding")
+    encodage = choisir_encodage()
+    if encodage is None:
+        return response
+    if not response.is_streamed and response.calculate_content_length() < app.config["COMPRESSION_SEUIL"]:
+        return response
+    if response.status_code == 304:
+        # Le corps d'un 304 n'est pas envoyé : seul son ETag doit être celui de la réponse compressée.
+        _affaiblir_etag(response)
+        return response
+
+    niveau = app.config["COMPRESSION_NIVEAU_BROTLI" if encodage == "br" else "COMPRESSION_NIVEAU_GZIP"]
+    compresseur = Compresseur(encodage, niveau)
+    if response.is_streamed:
+        response.response = _morceaux(response.response, compresseur)
+        response.headers.pop("Content-Length", None)
+    else:
+        response.set_data(compresseur.tout(response.get_data()))
+    response.content_encoding = encodage
+    _affaiblir_etag(response)
+    return response
+
+
+def installer_compression() -> bool:
+    """permet d'installer, si la configuration COMPRESSION le demande, la compression des réponses.
+
+            Returns
+            -------
+            Booleen
+                indique si la compression est active
+            """
+    if not app.config["COMPRESSION"]:
+        return False
+    app.after_request(compresser_reponse)
+    return True
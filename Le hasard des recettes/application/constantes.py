@@ -1,10 +1,136 @@
 from warnings import warn
+import os
 
-PLAT_PAR_PAGE = 5
+PLAT_PAR_PAGE = int(os.environ.get("PLAT_PAR_PAGE", 5))
+
+PLAT_PAR_PAGE_MAX = int(os.environ.get("PLAT_PAR_PAGE_MAX", 100))
+
+PLAT_PAR_LOT_EXPORT = int(os.environ.get("PLAT_PAR_LOT_EXPORT", 500))
+
+PLAT_PAR_SUPPRESSION_MAX = int(os.environ.get("PLAT_PAR_SUPPRESSION_MAX", 1000))
+
+# Listes complètes des plats et des ingrédients : lignes lues par lot, et taille des morceaux de page envoyés au
+# navigateur au fil du rendu.
+LISTE_PAR_LOT = int(os.environ.get("LISTE_PAR_LOT", 1000))
+
+FLUX_TAILLE_MORCEAU = int(os.environ.get("FLUX_TAILLE_MORCEAU", 16 * 1024))
+
+# Fichiers statiques construits par "flask construire-ressources" (minifiés, avec l'empreinte de leur contenu dans
+# leur nom) : sous-dossier de application/static et durée de cache envoyée au navigateur (un an).
+RESSOURCES_DOSSIER = "dist"
+
+RESSOURCES_DUREE = int(os.environ.get("RESSOURCES_DUREE", 365 * 24 * 3600))
 
 SECRET_KEY = "Je suis un secret !"
 
 API_ROUTE = "/api"
 
+CACHE_TAILLE_MAX = int(os.environ.get("CACHE_TAILLE_MAX", 8 * 1024 * 1024))
+
+CACHE_DUREE = int(os.environ.get("CACHE_DUREE", 300))
+
+FRAGMENTS_TAILLE_MAX = int(os.environ.get("FRAGMENTS_TAILLE_MAX", 4 * 1024 * 1024))
+
+# Méthode de hachage des mots de passe au format de werkzeug ("scrypt:n:r:p" ou "pbkdf2:sha256:itérations") : plus
+# le coût est élevé, plus le hachage résiste aux attaques et plus il occupe le processeur (environ 70 ms et 32 Mo de
+# mémoire pour scrypt:32768:8:1).
+HACHAGE_METHODE = os.environ.get("HACHAGE_METHODE", "scrypt:32768:8:1")
+
+HACHAGE_SIMULTANES = int(os.environ.get("HACHAGE_SIMULTANES", 2))
+
+HACHAGE_ATTENTE = float(os.environ.get("HACHAGE_ATTENTE", 2))
+
+# Signatures MinHash des plats similaires : 64 valeurs en 16 bandes de 4 ; deux plats deviennent candidats à
+# partir d'une similarité de Jaccard d'environ (1/16)^(1/4), soit 0,5.
+SIMILAIRES_PERMUTATIONS = int(os.environ.get("SIMILAIRES_PERMUTATIONS", 64))
+
+SIMILAIRES_BANDES = int(os.environ.get("SIMILAIRES_BANDES", 16))
+
+SIMILAIRES_NOMBRE = int(os.environ.get("SIMILAIRES_NOMBRE", 5))
+
+AUTOCOMPLETION_NOMBRE = int(os.environ.get("AUTOCOMPLETION_NOMBRE", 10))
+
+# Index gardés en mémoire (autocomplétion, composition, plats similaires) : ils suivent les écritures du processus par
+# ses événements, et sont reconstruits au plus tard INDEX_DUREE secondes après leur construction pour rattraper
+# celles des autres processus (autres travailleurs, commande flask import).
+INDEX_DUREE = int(os.environ.get("INDEX_DUREE", 300))
+
+UTILISATEUR_CACHE_DUREE = int(os.environ.get("UTILISATEUR_CACHE_DUREE", 60))
+
+# Instrumentation des requêtes (nombre et durée des requêtes SQL, rendu des gabarits, taille des réponses, route
+# /metrics) : désactivée par défaut, elle n'installe alors aucun écouteur et ne coûte rien.
+INSTRUMENTATION = os.environ.get("RECETTES_INSTRUMENTATION", "non").lower() in ("1", "oui", "true", "yes")
+
+REQUETE_LENTE = float(os.environ.get("REQUETE_LENTE", 0.5))
+
+REQUETE_SQL_LENTE = float(os.environ.get("REQUETE_SQL_LENTE", 0.1))
+
+# Compression des réponses (HTML, JSON...) selon l'en-tête Accept-Encoding : les réponses plus petites que
+# COMPRESSION_SEUIL octets ne sont pas compressées ; les niveaux vont de 1 à 9 pour gzip et de 0 à 11 pour brotli.
+COMPRESSION = os.environ.get("RECETTES_COMPRESSION", "oui").lower() in ("1", "oui", "true", "yes")
+
+COMPRESSION_SEUIL = int(os.environ.get("COMPRESSION_SEUIL", 1024))
+
+COMPRESSION_NIVEAU_GZIP = int(os.environ.get("COMPRESSION_NIVEAU_GZIP", 6))
+
+COMPRESSION_NIVEAU_BROTLI = int(os.environ.get("COMPRESSION_NIVEAU_BROTLI", 4))
+
+ENVIRONNEMENT = os.environ.get("RECETTES_ENV", "developpement")
+
+# Profils du moteur SQLite : les pragmas sont appliqués à chaque nouvelle connexion, les options sont passées à
+# create_engine(). WAL permet aux lectures de continuer pendant une écriture ; busy_timeout fait patienter un
+# écrivain au lieu de lever immédiatement "database is locked".
+PROFILS_MOTEUR = {
+    "developpement": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "foreign_keys": "ON",
+            "busy_timeout": 5000,
+            "cache_size": -16000,
+            "mmap_size": 64 * 1024 * 1024
+        },
+        "options": {
+            "pool_size": 5,
+            "max_overflow": 5,
+            "pool_timeout": 10
+        }
+    },
+    "production": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "foreign_keys": "ON",
+            "busy_timeout": 10000,
+            "cache_size": -64000,
+            "mmap_size": 256 * 1024 * 1024,
+            "temp_store": "MEMORY"
+        },
+        "options": {
+            "pool_size": 10,
+            "max_overflow": 20,
+            "pool_timeout": 30,
+            "pool_recycle": 3600
+        }
+    },
+    "test": {
+        "pragmas": {
+            "journal_mode": "MEMORY",
+            "synchronous": "OFF",
+            "foreign_keys": "ON",
+            "busy_timeout": 1000
+        },
+        "options": {
+            "pool_size": 2,
+            "max_overflow": 0,
+            "pool_timeout": 5
+        }
+    }
+}
+
+if ENVIRONNEMENT not in PROFILS_MOTEUR:
+    raise ValueError("RECETTES_ENV vaut \"{}\", qui n'est pas un profil connu : utilisez {}".format(
+        ENVIRONNEMENT, ", ".join(sorted(PROFILS_MOTEUR))))
+
 if SECRET_KEY == "Je suis un secret !":
     warn("Le secret par défaut n'a pas été changé, vous devriez le faire", Warning)
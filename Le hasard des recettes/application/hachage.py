@@ -0,0 +1,70 @@
+import threading
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from .constantes import HACHAGE_METHODE, HACHAGE_SIMULTANES, HACHAGE_ATTENTE
+
+
+class HachageSurcharge(Exception):
+    """
+        C'est une exception levée lorsque trop de hachages de mots de passe sont déjà en cours.
+        """
+
+
+# Le hachage est volontairement coûteux (environ 70 ms avec la méthode par défaut) : il est fait dans le fil
+# d'exécution de la requête, qui doit de toute façon attendre son résultat, mais au plus HACHAGE_SIMULTANES à la fois
+# par processus, pour qu'une rafale de connexions n'occupe pas tous les cœurs. Une requête qui n'obtient pas sa place
+# dans le délai HACHAGE_ATTENTE est refusée plutôt que de s'accumuler.
+_places = threading.BoundedSemaphore(HACHAGE_SIMULTANES)
+
+
+def _executer(fonction, *args, **kwargs):
+    """permet d'exécuter une fonction de hachage dès qu'une place se libère.
+
+            Raises
+            ------
+            HachageSurcharge
+                si aucune place ne s'est libérée dans le délai HACHAGE_ATTENTE
+            """
+    if not _places.acquire(timeout=HACHAGE_ATTENTE):
+        raise HachageSurcharge("Trop de demandes de connexion simultanées, veuillez réessayer.")
+    try:
+        return fonction(*args, **kwargs)
+    finally:
+        _places.release()
+
+
+def hacher(motdepasse: str) -> str:
+    """permet de hacher un mot de passe avec la méthode HACHAGE_METHODE.
+
+            Paramètres
+            ----------
+            motdepasse :
+                mot de passe en clair.
+
+            Returns
+            -------
+            str
+                empreinte du mot de passe, à enregistrer dans user_password
+            """
+    return _executer(generate_password_hash, motdepasse, method=HACHAGE_METHODE)
+
+
+def verifier(empreinte: str, motdepasse: str) -> bool:
+    """permet de vérifier un mot de passe ; l'empreinte indique elle-même la méthode avec laquelle elle a été
+    calculée, un changement de HACHAGE_METHODE ne concerne donc que les nouveaux mots de passe.
+
+            Paramètres
+            ----------
+            empreinte :
+                empreinte enregistrée dans user_password.
+
+            motdepasse :
+                mot de passe en clair.
+
+            Returns
+            -------
+            Booleen
+                indique si le mot de passe correspond à l'empreinte
+            """
+    return _executer(check_password_hash, empreinte, motdepasse)
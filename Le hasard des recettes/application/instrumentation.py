@@ -0,0 +1,326 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+import threading
+import time
+
+from flask import g, request, has_request_context, before_render_template, template_rendered, Response
+from sqlalchemy import event
+
+from .app import app, db
+from .cache import cache_reponses
+
+
+BORNES_DUREE = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+BORNES_REQUETES = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+BORNES_OCTETS = (512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608)
+
+# Nom Prometheus -> (description, bornes de l'histogramme, clef de la mesure dans g.mesures).
+HISTOGRAMMES = {
+    "recettes_http_duree_secondes": ("Durée de traitement des requêtes HTTP", BORNES_DUREE, "duree"),
+    "recettes_sql_requetes": ("Nombre de requêtes SQL par requête HTTP", BORNES_REQUETES, "requetes"),
+    "recettes_sql_duree_secondes": ("Durée cumulée des requêtes SQL par requête HTTP", BORNES_DUREE, "sql"),
+    "recettes_gabarit_duree_secondes": ("Durée du rendu des gabarits par requête HTTP", BORNES_DUREE, "gabarit"),
+    "recettes_reponse_octets": ("Taille du corps des réponses HTTP", BORNES_OCTETS, "octets")
+}
+
+# Statistiques du cache qui peuvent diminuer (type gauge) ; les autres (hits, misses...) sont des compteurs.
+JAUGES_CACHE = ("entrees", "octets", "octets_max")
+
+
+@contextmanager
+def compter_requetes():
+    """permet d'enregistrer toutes les requêtes SQL envoyées à la base de données pendant un bloc "with".
+
+            Returns
+            -------
+            list
+                liste, remplie au fur et à mesure, des requêtes SQL exécutées
+            """
+    requetes = []
+
+    def enregistrer(conn, cursor, statement, parameters, context, executemany):
+        requetes.append(statement)
+
+    with app.app_context():
+        moteur = db.engine
+    event.listen(moteur, "before_cursor_execute", enregistrer)
+    try:
+        yield requetes
+    finally:
+        event.remove(moteur, "before_cursor_execute", enregistrer)
+
+
+def verifier_nombre_requetes(url: str, maximum: int, client=None) -> list:
+    """permet de vérifier qu'une route ne dépasse pas un nombre donné de requêtes SQL, afin de repérer les
+    chargements "N+1" dans les tests.
+
+            Paramètres
+            ----------
+            url :
+                url de la route à appeler.
+
+            maximum :
+                nombre maximal de requêtes SQL autorisé.
+
+            client :
+                client de test Flask ; un nouveau client est créé s'il n'est pas fourni.
+
+            Returns
+            -------
+            list
+                liste des requêtes SQL exécutées
+
+            Raises
+            ------
+            AssertionError
+                si la route n'a pas répondu 200 ou a exécuté plus de requêtes que le maximum
+            """
+    client = client or app.test_client()
+    with compter_requetes() as requetes:
+        # Le corps est lu dans le bloc : les réponses en flux n'exécutent leurs requêtes qu'à ce moment.
+        response = client.get(url)
+        response.get_data()
+    assert response.status_code == 200, "{} a renvoyé le statut {}".format(url, response.status_code)
+    assert len(requetes) <= maximum, "{} a exécuté {} requêtes SQL (maximum : {}) :\n{}".format(
+        url, len(requetes), maximum, "\n".join(requetes))
+    return requetes
+
+
+class Histogramme:
+    """
+        C'est une classe qui compte des mesures par tranche, à la manière des histogrammes de Prometheus.
+        ...
+
+        Méthodes
+        -------
+        observer(valeur)
+            permet d'ajouter une mesure.
+
+        lignes(nom, etiquettes)
+            permet d'écrire l'histogramme au format texte de Prometheus.
+        """
+
+    def __init__(self, bornes: tuple):
+        self.bornes = bornes
+        self.comptes = [0] * (len(bornes) + 1)
+        self.somme = 0
+        self.nombre = 0
+
+    def observer(self, valeur: float):
+        self.comptes[bisect_left(self.bornes, valeur)] += 1
+        self.somme += valeur
+        self.nombre += 1
+
+    def lignes(self, nom: str, etiquettes: str) -> list:
+        lignes = []
+        cumul = 0
+        for borne, compte in zip(self.bornes + ("+Inf",), self.comptes):
+            cumul += compte
+            lignes.append('{}_bucket{{{},le="{}"}} {}'.format(nom, etiquettes, borne, cumul))
+        lignes.append("{}_sum{{{}}} {}".format(nom, etiquettes, round(self.somme, 6)))
+        lignes.append("{}_count{{{}}} {}".format(nom, etiquettes, self.nombre))
+        return lignes
+
+
+class Metriques:
+    """
+        C'est une classe qui agrège, par route, les mesures relevées pendant chaque requête HTTP.
+        ...
+
+        Méthodes
+        -------
+        enregistrer(endpoint, statut, mesures)
+            permet d'ajouter les mesures d'une requête.
+
+        exporter()
+            permet d'écrire toutes les métriques au format texte de Prometheus.
+        """
+
+    def __init__(self):
+        self._histogrammes = {}
+        self._reponses = {}
+        self._verrou = threading.Lock()
+
+    def enregistrer(self, endpoint: str, statut: int, mesures: dict):
+        with self._verrou:
+            self._reponses[(endpoint, statut)] = self._reponses.get((endpoint, statut), 0) + 1
+            for nom, (description, bornes, clef) in HISTOGRAMMES.items():
+                if mesures.get(clef) is None:
+                    continue
+                if (nom, endpoint) not in self._histogrammes:
+                    self._histogrammes[(nom, endpoint)] = Histogramme(bornes)
+                self._histogrammes[(nom, endpoint)].observer(mesures[clef])
+
+    def exporter(self) -> str:
+        lignes = ["# HELP recettes_http_reponses_total Nombre de réponses HTTP par route et par statut",
+                  "# TYPE recettes_http_reponses_total counter"]
+        with self._verrou:
+            for (endpoint, statut), nombre in sorted(self._reponses.items()):
+                lignes.append('recettes_http_reponses_total{{endpoint="{}",statut="{}"}} {}'.format(
+                    endpoint, statut, nombre))
+            for nom, (description, bornes, clef) in HISTOGRAMMES.items():
+                lignes.append("# HELP {} {}".format(nom, description))
+                lignes.append("# TYPE {} histogram".format(nom))
+                for (nom_histogramme, endpoint), histogramme in sorted(self._histogrammes.items()):
+                    if nom_histogramme == nom:
+                        lignes.extend(histogramme.lignes(nom, 'endpoint="{}"'.format(endpoint)))
+
+        for compteur, valeur in cache_reponses.statistiques().items():
+            type_metrique = "gauge" if compteur in JAUGES_CACHE else "counter"
+            lignes.append("# TYPE recettes_cache_{} {}".format(compteur, type_metrique))
+            lignes.append("recettes_cache_{} {}".format(compteur, valeur))
+        return "\n".join(lignes) + "\n"
+
+
+metriques = Metriques()
+
+
+def _avant_requete_sql(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("instrumentation_debuts", []).append(time.perf_counter())
+
+
+def _apres_requete_sql(conn, cursor, statement, parameters, context, executemany):
+    debuts = conn.info.get("instrumentation_debuts")
+    if not debuts:
+        return
+    duree = time.perf_counter() - debuts.pop()
+    mesures = g.get("mesures") if has_request_context() else None
+    if mesures is None:
+        return
+    mesures["requetes"] += 1
+    mesures["sql"] += duree
+    if duree >= app.config["REQUETE_SQL_LENTE"] and not executemany and len(mesures["lentes"]) < 5:
+        mesures["lentes"].append((statement, parameters, duree))
+
+
+def _avant_gabarit(expediteur, template, context, **autres):
+    if g.get("mesures") is not None:
+        g.mesures["debut_gabarit"] = time.perf_counter()
+
+
+def _apres_gabarit(expediteur, template, context, **autres):
+    mesures = g.get("mesures")
+    if mesures is not None and mesures.get("debut_gabarit") is not None:
+        mesures["gabarit"] = (mesures["gabarit"] or 0) + time.perf_counter() - mesures.pop("debut_gabarit")
+
+
+def _debut_requete():
+    g.mesures = {"debut": time.perf_counter(), "requetes": 0, "sql": 0.0, "gabarit": None, "lentes": []}
+
+
+def _plans(lentes: list) -> list:
+    """permet d'obtenir le plan d'exécution (EXPLAIN QUERY PLAN) des requêtes SQL lentes.
+
+            Paramètres
+            ----------
+            lentes :
+                liste de tuples (requête SQL, paramètres, durée).
+
+            Returns
+            -------
+            list
+                lignes à ajouter au journal
+            """
+    lignes = []
+    for statement, parameters, duree in lentes:
+        lignes.append("  {:.1f} ms : {}".format(duree * 1000, " ".join(statement.split())))
+        if db.engine.dialect.name != "sqlite" or not statement.lstrip().upper().startswith("SELECT"):
+            continue
+        try:
+            plan = db.session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+            lignes.extend("    {}".format(ligne[-1]) for ligne in plan)
+        except Exception as erreur:
+            lignes.append("    plan indisponible : {}".format(erreur))
+    return lignes
+
+
+def _enregistrer_mesures(mesures: dict, requete: tuple, statut: int):
+    """permet d'ajouter aux métriques les mesures d'une requête terminée et de journaliser les requêtes lentes.
+
+            Paramètres
+            ----------
+            mesures :
+                mesures relevées pendant la requête (g.mesures).
+
+            requete :
+                tuple (méthode, chemin, endpoint) de la requête.
+
+            statut :
+                statut HTTP de la réponse.
+            """
+    methode, chemin, endpoint = requete
+    mesures["duree"] = time.perf_counter() - mesures["debut"]
+    metriques.enregistrer(endpoint, statut, mesures)
+
+    if mesures["duree"] >= app.config["REQUETE_LENTE"] or mesures["lentes"]:
+        with app.app_context():
+            plans = _plans(mesures["lentes"])
+        app.logger.warning("\n".join([
+            "Requête lente : {} {} ({}) en {:.1f} ms, {} requêtes SQL en {:.1f} ms, gabarit {:.1f} ms, {} octets".format(
+                methode, chemin, endpoint, mesures["duree"] * 1000, mesures["requetes"],
+                mesures["sql"] * 1000, (mesures["gabarit"] or 0) * 1000, mesures["octets"])
+        ] + plans))
+
+
+def _compter_octets(morceaux, mesures: dict):
+    """permet de mesurer la taille du corps d'une réponse en flux au fur et à mesure de son envoi.
+    """
+    try:
+        for morceau in morceaux:
+            mesures["octets"] += len(morceau.encode() if isinstance(morceau, str) else morceau)
+            yield morceau
+    finally:
+        if hasattr(morceaux, "close"):
+            morceaux.close()
+
+
+def _fin_requete(response):
+    requete = (request.method, request.full_path, request.endpoint or "inconnu")
+    if not response.is_streamed:
+        mesures = g.pop("mesures", None)
+        if mesures is not None:
+            mesures["octets"] = response.calculate_content_length()
+            _enregistrer_mesures(mesures, requete, response.status_code)
+        return response
+
+    # Une réponse en flux (stream_template, export) n'exécute ses requêtes SQL et son rendu qu'une fois renvoyée
+    # par la vue : g.mesures reste en place pour le contexte gardé par stream_with_context, et les mesures ne sont
+    # enregistrées qu'à la fermeture de la réponse, une fois le corps entièrement envoyé.
+    mesures = g.get("mesures")
+    if mesures is None:
+        return response
+    mesures["octets"] = 0
+    response.response = _compter_octets(response.response, mesures)
+    response.call_on_close(lambda: _enregistrer_mesures(mesures, requete, response.status_code))
+    return response
+
+
+def route_metriques():
+    """permet d'exposer les métriques agrégées au format texte de Prometheus.
+    """
+    return Response(metriques.exporter(), mimetype="text/plain; version=0.0.4")
+
+
+def installer_instrumentation() -> bool:
+    """permet d'installer, si la configuration INSTRUMENTATION le demande, les écouteurs qui mesurent chaque
+    requête HTTP et la route /metrics. Sinon, rien n'est installé.
+
+            Returns
+            -------
+            Booleen
+                indique si l'instrumentation est active
+            """
+    if not app.config["INSTRUMENTATION"]:
+        return False
+    with app.app_context():
+        moteur = db.engine
+    event.listen(moteur, "before_cursor_execute", _avant_requete_sql)
+    event.listen(moteur, "after_cursor_execute", _apres_requete_sql)
+    before_render_template.connect(_avant_gabarit, app)
+    template_rendered.connect(_apres_gabarit, app)
+    app.before_request(_debut_requete)
+    app.after_request(_fin_requete)
+    app.add_url_rule("/metrics", "metriques", route_metriques)
+    return True
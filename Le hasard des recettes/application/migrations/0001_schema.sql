@@ -0,0 +1,42 @@
+-- Schéma de départ, identique à celui de uni.sql : les tables ne sont créées que si elles n'existent pas encore.
+CREATE TABLE IF NOT EXISTS "Plat" (
+	"plat_id"	INTEGER NOT NULL UNIQUE,
+	"plat_nom"	TINYTEXT NOT NULL,
+	"plat_recette"	VARCHAR(100) NOT NULL,
+	"plat_type"	TINYTEXT NOT NULL,
+	"plat_nombre_convives"	INTEGER NOT NULL,
+	PRIMARY KEY("plat_id" AUTOINCREMENT)
+);
+CREATE TABLE IF NOT EXISTS "Ingredient" (
+	"ingredient_id"	INTEGER NOT NULL UNIQUE,
+	"ingredient_nom"	TINYTEXT NOT NULL,
+	"ingredient_type"	TINYTEXT NOT NULL,
+	PRIMARY KEY("ingredient_id" AUTOINCREMENT)
+);
+CREATE TABLE IF NOT EXISTS "composition" (
+	"composition_id"	INTEGER NOT NULL UNIQUE,
+	"composition_plat_id"	INTEGER NOT NULL,
+	"composition_ingredient_id"	INTEGER NOT NULL,
+	"quantite"	VARCHAR(100),
+	FOREIGN KEY("composition_ingredient_id") REFERENCES "Ingredient"("ingredient_id"),
+	PRIMARY KEY("composition_id" AUTOINCREMENT),
+	FOREIGN KEY("composition_plat_id") REFERENCES "Plat"("plat_id")
+);
+CREATE TABLE IF NOT EXISTS "authorship" (
+	"authorship_id"	INTEGER NOT NULL UNIQUE,
+	"authorship_plat_id"	INTEGER NOT NULL,
+	"authorship_user_id"	INTEGER NOT NULL,
+	"authorship_date"	DATETIME DEFAULT current_timestamp,
+	FOREIGN KEY("authorship_plat_id") REFERENCES "Plat"("plat_id"),
+	PRIMARY KEY("authorship_id" AUTOINCREMENT),
+	FOREIGN KEY("authorship_user_id") REFERENCES "User"("user_id")
+);
+CREATE TABLE IF NOT EXISTS "User" (
+	"user_id"	INTEGER NOT NULL UNIQUE,
+	"user_nom"	TINYTEXT NOT NULL,
+	"user_prenom"	TINYTEXT NOT NULL,
+	"user_login"	VARCHAR(45) NOT NULL,
+	"user_email"	VARCHAR(45) NOT NULL,
+	"user_password"	VARCHAR(100) NOT NULL,
+	PRIMARY KEY("user_id" AUTOINCREMENT)
+);
@@ -0,0 +1,16 @@
+-- Index secondaires : composition et authorship sont lues par plat et par ingrédient/utilisateur à chaque
+-- affichage, les listes par type sont triées par nom.
+CREATE INDEX IF NOT EXISTS ix_composition_plat ON composition (composition_plat_id, composition_ingredient_id);
+CREATE INDEX IF NOT EXISTS ix_composition_ingredient ON composition (composition_ingredient_id, composition_plat_id);
+CREATE INDEX IF NOT EXISTS ix_authorship_plat ON authorship (authorship_plat_id);
+CREATE INDEX IF NOT EXISTS ix_authorship_user ON authorship (authorship_user_id);
+CREATE INDEX IF NOT EXISTS ix_plat_type ON plat (plat_type, plat_nom);
+CREATE INDEX IF NOT EXISTS ix_ingredient_type ON ingredient (ingredient_type, ingredient_nom);
+
+-- Contraintes d'unicité : elles remplacent les count() faits avant chaque insertion par Plat.ajout,
+-- Ingredient.ajout_ingr et User.creer. La migration échoue si la base contient déjà des doublons.
+CREATE UNIQUE INDEX IF NOT EXISTS ux_plat_nom ON plat (plat_nom);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_plat_recette ON plat (plat_recette);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_ingredient_nom ON ingredient (ingredient_nom);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_user_login ON user (user_login);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_user_email ON user (user_email);
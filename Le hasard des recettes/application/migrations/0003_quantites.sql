@@ -0,0 +1,5 @@
+-- Quantités structurées : valeur numérique et unité normalisée (g, ml, pincée...) analysées à partir du texte de
+-- "quantite", qui est conservé tel quel. Les lignes existantes sont remplies juste après la migration (rattrapage
+-- de migrations/__init__.py), ou par "flask remplir-quantites" s'il a été interrompu.
+ALTER TABLE composition ADD COLUMN quantite_valeur REAL;
+ALTER TABLE composition ADD COLUMN quantite_unite VARCHAR(40);
@@ -0,0 +1,5 @@
+-- Les quantités suivies d'un mot qui n'est pas une unité connue ("1 filet", "1/2 tablette") étaient comptées comme
+-- des pièces, et additionnées à tort avec elles dans la liste de courses. Les quantités enregistrées comme des pièces
+-- sont remises à NULL, pour être analysées à nouveau juste après la migration (rattrapage de
+-- migrations/__init__.py) : ce mot est désormais gardé comme unité.
+UPDATE composition SET quantite_valeur = NULL, quantite_unite = NULL WHERE quantite_unite = '';
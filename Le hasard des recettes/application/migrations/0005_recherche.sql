@@ -0,0 +1,33 @@
+-- Index plein texte des plats et des ingrédients : tables virtuelles FTS5 "à contenu externe", qui ne dupliquent pas
+-- les données de la table source et n'en gardent que l'index. Les déclencheurs les tiennent à jour à chaque écriture.
+-- "IF NOT EXISTS" : les anciennes versions de l'application créaient ces index à la première recherche. Ils sont
+-- reconstruits dans tous les cas à partir des données existantes.
+CREATE VIRTUAL TABLE IF NOT EXISTS plat_fts USING fts5(plat_nom, content='plat', content_rowid='plat_id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3');
+CREATE TRIGGER IF NOT EXISTS plat_fts_ai AFTER INSERT ON plat BEGIN
+    INSERT INTO plat_fts(rowid, plat_nom) VALUES (new.plat_id, new.plat_nom);
+END;
+CREATE TRIGGER IF NOT EXISTS plat_fts_ad AFTER DELETE ON plat BEGIN
+    INSERT INTO plat_fts(plat_fts, rowid, plat_nom) VALUES ('delete', old.plat_id, old.plat_nom);
+END;
+CREATE TRIGGER IF NOT EXISTS plat_fts_au AFTER UPDATE OF plat_nom ON plat BEGIN
+    INSERT INTO plat_fts(plat_fts, rowid, plat_nom) VALUES ('delete', old.plat_id, old.plat_nom);
+    INSERT INTO plat_fts(rowid, plat_nom) VALUES (new.plat_id, new.plat_nom);
+END;
+INSERT INTO plat_fts(plat_fts) VALUES ('rebuild');
+
+CREATE VIRTUAL TABLE IF NOT EXISTS ingredient_fts USING fts5(ingredient_nom, content='ingredient',
+    content_rowid='ingredient_id', tokenize='unicode61 remove_diacritics 2', prefix='2 3');
+CREATE TRIGGER IF NOT EXISTS ingredient_fts_ai AFTER INSERT ON ingredient BEGIN
+    INSERT INTO ingredient_fts(rowid, ingredient_nom) VALUES (new.ingredient_id, new.ingredient_nom);
+END;
+CREATE TRIGGER IF NOT EXISTS ingredient_fts_ad AFTER DELETE ON ingredient BEGIN
+    INSERT INTO ingredient_fts(ingredient_fts, rowid, ingredient_nom)
+        VALUES ('delete', old.ingredient_id, old.ingredient_nom);
+END;
+CREATE TRIGGER IF NOT EXISTS ingredient_fts_au AFTER UPDATE OF ingredient_nom ON ingredient BEGIN
+    INSERT INTO ingredient_fts(ingredient_fts, rowid, ingredient_nom)
+        VALUES ('delete', old.ingredient_id, old.ingredient_nom);
+    INSERT INTO ingredient_fts(rowid, ingredient_nom) VALUES (new.ingredient_id, new.ingredient_nom);
+END;
+INSERT INTO ingredient_fts(ingredient_fts) VALUES ('rebuild');
@@ -0,0 +1,101 @@
+import os
+import re
+
+from ..app import db
+
+
+chemin_migrations = os.path.dirname(os.path.abspath(__file__))
+
+
+def _remplir_quantites():
+    from ..modeles.courses import remplir_quantites
+    return remplir_quantites()
+
+
+# Rattrapages en Python exécutés juste après une migration : remplissage des nouvelles colonnes à partir des
+# données existantes, trop complexe pour du SQL.
+RATTRAPAGES = {
+    3: _remplir_quantites,
+    4: _remplir_quantites
+}
+
+
+def lister_migrations() -> list:
+    """permet de lister les migrations disponibles, fichiers SQL nommés NNNN_description.sql.
+
+            Returns
+            -------
+            list
+                tuples (numéro de version, nom du fichier), dans l'ordre des versions
+            """
+    migrations = []
+    for fichier in os.listdir(chemin_migrations):
+        correspondance = re.match(r"^(\d+)_\w+\.sql$", fichier)
+        if correspondance:
+            migrations.append((int(correspondance.group(1)), fichier))
+    return sorted(migrations)
+
+
+def version_actuelle(connexion) -> int:
+    """permet de lire la version du schéma d'une base de données, gardée dans PRAGMA user_version.
+
+            Paramètres
+            ----------
+            connexion :
+                connexion sqlite3.
+
+            Returns
+            -------
+            int
+                version du schéma, 0 pour une base qui n'a jamais été migrée
+            """
+    return connexion.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrer(rapport=None) -> list:
+    """permet d'appliquer, dans l'ordre, les migrations dont la version est supérieure à celle de la base de
+    données. Chaque migration est appliquée dans sa propre transaction avec la mise à jour de la version : une
+    migration qui échoue laisse la base dans l'état de la migration précédente. Le rattrapage d'une migration
+    (RATTRAPAGES) est exécuté après elle ; s'il est interrompu, il peut être relancé par sa commande (par exemple
+    "flask remplir-quantites"), qui reprend là où il s'était arrêté.
+
+            Paramètres
+            ----------
+            rapport :
+                fonction appelée avec le nom de chaque migration appliquée.
+
+            Returns
+            -------
+            list
+                noms des migrations appliquées
+
+            Raises
+            ------
+            sqlite3.Error
+                si une migration échoue (par exemple à cause de doublons pour une contrainte d'unicité)
+            """
+    appliquees = []
+    connexion = db.engine.raw_connection()
+    try:
+        version = version_actuelle(connexion)
+        for numero, fichier in lister_migrations():
+            if numero <= version:
+                continue
+            with open(os.path.join(chemin_migrations, fichier), encoding="utf-8") as f:
+                instructions = f.read()
+            try:
+                connexion.executescript("BEGIN;\n{}\nPRAGMA user_version = {};\nCOMMIT;".format(instructions, numero))
+            except Exception:
+                if connexion.in_transaction:
+                    connexion.execute("ROLLBACK")
+                raise
+            appliquees.append(fichier)
+            if rapport:
+                rapport(fichier)
+    finally:
+        connexion.close()
+
+    for numero, fichier in lister_migrations():
+        if fichier in appliquees and numero in RATTRAPAGES:
+            RATTRAPAGES[numero]()
+    return appliquees
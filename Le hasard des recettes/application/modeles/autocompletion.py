@@ -0,0 +1,159 @@
+from bisect import bisect_left, insort
+import re
+import threading
+import time
+import unicodedata
+
+from ..app import db
+from ..constantes import INDEX_DUREE
+from .donnees import Ingredient
+from .evenements import abonner, INGREDIENT_AJOUTE
+
+
+def replier(texte: str) -> str:
+    """permet de ramener un texte à une forme comparable : minuscules, sans accents ni signes diacritiques.
+
+            Paramètres
+            ----------
+            texte :
+                texte à replier, par exemple "Crème fraîche".
+
+            Returns
+            -------
+            str
+                texte replié, par exemple "creme fraiche"
+            """
+    decompose = unicodedata.normalize("NFKD", texte or "")
+    return "".join(caractere for caractere in decompose if not unicodedata.combining(caractere)).casefold().strip()
+
+
+class IndexNoms:
+    """
+        C'est une classe qui garde en mémoire des tableaux triés des noms d'ingrédients repliés (sans accents, en
+        minuscules), pour compléter un début de nom par une recherche dichotomique au lieu d'envoyer toute la liste
+        des ingrédients au navigateur.
+        ...
+
+        Le premier tableau contient les noms entiers, le second les fins de noms qui commencent à chacun des mots
+        suivants, pour que "parm" trouve aussi "Copeaux de parmesan" ; les noms qui commencent par le préfixe
+        passent devant. Une recherche ne lit que le nombre d'entrées demandé. Les tableaux sont construits en une
+        requête au premier appel, puis complétés par les événements publiés par Ingredient.ajout_ingr. Les
+        ingrédients enregistrés par un autre processus (autre travailleur, flask import) sont rattrapés à chaque
+        recherche par une lecture des id plus grands que le dernier connu, et les tableaux sont reconstruits toutes
+        les INDEX_DUREE secondes pour suivre les autres modifications.
+
+        Méthodes
+        -------
+        completer(prefixe, limite)
+            permet de trouver les ingrédients dont un mot du nom commence par un préfixe.
+        """
+
+    def __init__(self):
+        self._noms = None
+        self._mots = None
+        self._ingredients = None
+        self._dernier_id = 0
+        self._expiration = 0
+        self._verrou = threading.Lock()
+
+    @staticmethod
+    def _entrees(ingredient_id: int, nom: str) -> list:
+        """permet de découper un nom replié en fins de nom commençant à chaque mot.
+
+                Returns
+                -------
+                list
+                    tuples (fin du nom repliée, id de l'ingrédient), le premier correspondant au nom entier
+                """
+        replie = replier(nom)
+        return [(replie[mot.start():], ingredient_id) for mot in re.finditer(r"\w+", replie)] or [(replie, ingredient_id)]
+
+    def _construire(self):
+        """permet de (re)construire les tableaux en une seule requête.
+        """
+        noms, mots, ingredients = [], [], {}
+        for ingredient_id, nom, typologie in db.session.execute(
+                db.select(Ingredient.ingredient_id, Ingredient.ingredient_nom, Ingredient.ingredient_type)):
+            ingredients[ingredient_id] = (nom, typologie)
+            entrees = self._entrees(ingredient_id, nom)
+            noms.append(entrees[0])
+            mots.extend(entrees[1:])
+        noms.sort()
+        mots.sort()
+        with self._verrou:
+            self._noms, self._mots, self._ingredients = noms, mots, ingredients
+            self._dernier_id = max(ingredients, default=0)
+            self._expiration = time.monotonic() + INDEX_DUREE
+
+    def _rattraper(self):
+        """permet d'ajouter aux tableaux les ingrédients enregistrés depuis leur construction par un autre processus,
+        en une requête sur la clef primaire qui ne renvoie le plus souvent aucune ligne.
+        """
+        for ingredient in db.session.execute(
+                db.select(Ingredient.ingredient_id, Ingredient.ingredient_nom, Ingredient.ingredient_type)
+                .filter(Ingredient.ingredient_id > self._dernier_id)):
+            if ingredient.ingredient_id not in self._ingredients:
+                self.ajouter(ingredient)
+            self._dernier_id = max(self._dernier_id, ingredient.ingredient_id)
+
+    def ajouter(self, ingredient, **autres):
+        """permet d'ajouter aux tableaux un ingrédient qui vient d'être enregistré.
+        """
+        if self._noms is None:
+            return
+        entrees = self._entrees(ingredient.ingredient_id, ingredient.ingredient_nom)
+        with self._verrou:
+            self._ingredients[ingredient.ingredient_id] = (ingredient.ingredient_nom, ingredient.ingredient_type)
+            insort(self._noms, entrees[0])
+            for entree in entrees[1:]:
+                insort(self._mots, entree)
+
+    def invalider(self, **autres):
+        """permet de forcer la reconstruction des tableaux au prochain appel.
+        """
+        with self._verrou:
+            self._noms, self._mots, self._ingredients = None, None, None
+
+    def completer(self, prefixe: str, limite: int = 10) -> list:
+        """permet de trouver les ingrédients dont un mot du nom commence par un préfixe, sans tenir compte des
+        accents ni des majuscules.
+
+                Paramètres
+                ----------
+                prefixe :
+                    début de nom saisi par l'utilisateur.
+
+                limite :
+                    nombre maximal d'ingrédients renvoyés.
+
+                Returns
+                -------
+                list
+                    tuples (id, nom, type) ; les noms qui commencent par le préfixe d'abord, puis ceux dont un autre
+                    mot commence par le préfixe, chaque groupe par ordre alphabétique
+                """
+        prefixe = replier(prefixe)
+        if not prefixe:
+            return []
+        if self._noms is None or time.monotonic() >= self._expiration:
+            self._construire()
+        else:
+            self._rattraper()
+
+        resultats, vus = [], set()
+        with self._verrou:
+            for tableau in (self._noms, self._mots):
+                position = bisect_left(tableau, (prefixe,))
+                while position < len(tableau) and len(resultats) < limite:
+                    entree, ingredient_id = tableau[position]
+                    if not entree.startswith(prefixe):
+                        break
+                    if ingredient_id not in vus:
+                        vus.add(ingredient_id)
+                        resultats.append((ingredient_id,) + self._ingredients[ingredient_id])
+                    position += 1
+        return resultats
+
+
+index_noms = IndexNoms()
+abonner(INGREDIENT_AJOUTE, index_noms.ajouter)
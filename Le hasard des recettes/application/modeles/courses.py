@@ -0,0 +1,176 @@
+import numpy
+
+from ..app import db
+from .donnees import Plat, Ingredient, Composition
+from .quantites import analyser_quantite
+
+
+def remplir_quantites(taille_lot: int = 10000, tout: bool = False, rapport=None) -> int:
+    """permet d'analyser les quantités des compositions existantes et d'enregistrer leur valeur et leur unité,
+    par lots (une transaction par lot).
+
+            Paramètres
+            ----------
+            taille_lot :
+                nombre de compositions par transaction.
+
+            tout :
+                analyse à nouveau toutes les compositions, et pas seulement celles qui n'ont pas encore été
+                analysées (celles que l'analyse n'a pas su lire sont marquées NON_QUANTIFIABLE et ne sont pas
+                reprises).
+
+            rapport :
+                fonction appelée après chaque lot avec le nombre de compositions traitées.
+
+            Returns
+            -------
+            int
+                nombre de compositions traitées
+            """
+    traitees = 0
+    dernier = 0
+    while True:
+        requete = db.select(Composition.composition_id, Composition.quantite)\
+            .filter(Composition.composition_id > dernier)
+        if not tout:
+            requete = requete.filter(Composition.quantite_valeur.is_(None), Composition.quantite_unite.is_(None))
+        lot = db.session.execute(requete.order_by(Composition.composition_id).limit(taille_lot)).all()
+        if not lot:
+            return traitees
+
+        valeurs = []
+        for composition_id, quantite in lot:
+            valeur, unite = analyser_quantite(quantite)
+            valeurs.append({"composition_id": composition_id, "quantite_valeur": valeur, "quantite_unite": unite})
+        try:
+            db.session.execute(db.update(Composition), valeurs)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        traitees += len(lot)
+        dernier = lot[-1][0]
+        if rapport:
+            rapport(traitees)
+
+
+def lire_menu(menu: str) -> tuple:
+    """permet de lire un menu de la forme "1:4,7:2" (id du plat : nombre de convives). Le nombre de convives peut
+    être omis ("1,7:2") : la recette est alors prise telle quelle.
+
+            Paramètres
+            ----------
+            menu :
+                valeur du paramètre plats de la requête.
+
+            Returns
+            -------
+            Booleen
+                en fonction du if qui précède les "returns"
+
+            list
+                liste de tuples (id du plat, nombre de convives ou None), ou une liste d'erreurs
+            """
+    demandes, erreurs = [], []
+    for element in (menu or "").split(","):
+        element = element.strip()
+        if not element:
+            continue
+        plat_id, _, convives = element.partition(":")
+        if not plat_id.strip().isdigit() or (convives and not convives.strip().isdigit()):
+            erreurs.append("L'élément \"{}\" du menu n'est pas de la forme id:convives".format(element))
+            continue
+        demandes.append((int(plat_id), int(convives) if convives else None))
+    if not demandes and not erreurs:
+        erreurs.append("Aucun plat n'a été indiqué")
+    if len(erreurs) > 0:
+        return False, erreurs
+    return True, demandes
+
+
+def liste_courses(demandes: list) -> tuple:
+    """permet de calculer la liste de courses d'un menu : la composition de chaque plat est mise à l'échelle du
+    nombre de convives demandé, puis les quantités sont additionnées par ingrédient et par unité. Le calcul est
+    vectorisé avec NumPy ; les quantités qui n'ont pas pu être analysées ("Selon la convenance") sont rendues à part.
+
+            Paramètres
+            ----------
+            demandes :
+                liste de tuples (id du plat, nombre de convives ou None), fournie par lire_menu(). Un plat peut
+                apparaître plusieurs fois.
+
+            Returns
+            -------
+            Booleen
+                en fonction du if qui précède les "returns"
+
+            dict
+                "ingredients" : liste de dictionnaires (id, nom, quantité, unité) ;
+                "non_quantifies" : liste de dictionnaires (id, nom, id du plat, quantité saisie)
+
+            list
+                une liste d'erreurs s'il y a eu une erreur plus haut dans la fonction
+            """
+    ids = sorted({plat_id for plat_id, convives in demandes})
+    lots = [ids[debut:debut + 500] for debut in range(0, len(ids), 500)]
+
+    convives_base = {}
+    lignes = []
+    for lot in lots:
+        convives_base.update(db.session.execute(
+            db.select(Plat.plat_id, Plat.plat_nombre_convives).filter(Plat.plat_id.in_(lot))).all())
+        lignes.extend(db.session.execute(
+            db.select(Composition.composition_plat_id, Composition.composition_ingredient_id,
+                      Composition.quantite_valeur, Composition.quantite_unite, Composition.quantite)
+            .filter(Composition.composition_plat_id.in_(lot))).all())
+
+    manquants = [plat_id for plat_id in ids if plat_id not in convives_base]
+    if manquants:
+        return False, ["La recette {} n'existe pas".format(plat_id) for plat_id in manquants]
+
+    # La composition étant linéaire en nombre de convives, un plat demandé plusieurs fois est compté une fois avec
+    # la somme de ses facteurs d'échelle.
+    facteurs = {}
+    for plat_id, convives in demandes:
+        base = convives_base[plat_id] or 1
+        facteurs[plat_id] = facteurs.get(plat_id, 0) + (convives / base if convives is not None else 1)
+
+    quantifiees = [ligne for ligne in lignes if ligne[2] is not None]
+    non_quantifiees = [ligne for ligne in lignes if ligne[2] is None]
+
+    resultats = []
+    if quantifiees:
+        unites = sorted({ligne[3] or "" for ligne in quantifiees})
+        code_unite = {unite: code for code, unite in enumerate(unites)}
+        plats = numpy.fromiter((ligne[0] for ligne in quantifiees), dtype=numpy.int64, count=len(quantifiees))
+        ingredients = numpy.fromiter((ligne[1] for ligne in quantifiees), dtype=numpy.int64,
+                                     count=len(quantifiees))
+        valeurs = numpy.fromiter((ligne[2] for ligne in quantifiees), dtype=numpy.float64, count=len(quantifiees))
+        codes = numpy.fromiter((code_unite[ligne[3] or ""] for ligne in quantifiees), dtype=numpy.int64,
+                               count=len(quantifiees))
+
+        ids_plats = numpy.array(sorted(facteurs), dtype=numpy.int64)
+        facteurs_plats = numpy.array([facteurs[plat_id] for plat_id in ids_plats.tolist()], dtype=numpy.float64)
+        valeurs = valeurs * facteurs_plats[numpy.searchsorted(ids_plats, plats)]
+
+        clefs, inverse = numpy.unique(ingredients * len(unites) + codes, return_inverse=True)
+        sommes = numpy.bincount(inverse, weights=valeurs)
+        for clef, somme in zip(clefs.tolist(), sommes.tolist()):
+            resultats.append({"id": clef // len(unites), "unite": unites[clef % len(unites)],
+                              "quantite": round(somme, 3)})
+
+    noms = {}
+    identifiants = sorted({resultat["id"] for resultat in resultats} | {ligne[1] for ligne in non_quantifiees})
+    for debut in range(0, len(identifiants), 500):
+        noms.update(db.session.execute(db.select(Ingredient.ingredient_id, Ingredient.ingredient_nom)
+                                       .filter(Ingredient.ingredient_id.in_(identifiants[debut:debut + 500]))).all())
+    for resultat in resultats:
+        resultat["nom"] = noms.get(resultat["id"])
+
+    return True, {
+        "ingredients": sorted(resultats, key=lambda resultat: ((resultat["nom"] or "").lower(), resultat["unite"])),
+        "non_quantifies": [
+            {"id": ingredient_id, "nom": noms.get(ingredient_id), "plat": plat_id, "quantite": quantite}
+            for plat_id, ingredient_id, valeur, unite, quantite in non_quantifiees
+        ]
+    }
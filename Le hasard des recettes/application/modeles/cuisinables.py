@@ -0,0 +1,222 @@
+from collections import defaultdict
+import logging
+import threading
+import time
+
+from ..app import app, db
+from ..constantes import INDEX_DUREE
+from .donnees import Plat, Composition
+from .evenements import abonner, COMPOSITION_AJOUTEE, PLAT_SUPPRIME
+
+
+journal = logging.getLogger("application.cuisinables")
+
+
+class IndexComposition:
+    """
+        C'est une classe qui garde en mémoire un index inversé de la composition des plats (ingrédient -> plats), pour
+        trouver les plats que l'on peut cuisiner avec un ensemble d'ingrédients sans jointure SQL à chaque requête.
+        ...
+
+        L'index est construit en une requête au premier appel, puis mis à jour par les événements publiés par
+        Composition.ajout_compo, Composition.ajout_bulk et supprimer. Pour rattraper les écritures des autres
+        processus, il est reconstruit en arrière-plan INDEX_DUREE secondes après sa construction : l'ancien index
+        répond aux requêtes jusqu'à ce que le nouveau le remplace, et les événements reçus entre-temps sont appliqués
+        aux deux.
+
+        Méthodes
+        -------
+        contient(plat_id, ingredients)
+            permet de savoir si un plat contient au moins un ingrédient d'un ensemble.
+
+        cuisinables(ingredients, manquants)
+            permet de trouver les plats dont la composition est couverte par des ingrédients.
+        """
+
+    def __init__(self):
+        self._plats_par_ingredient = None
+        self._ingredients_par_plat = None
+        self._expiration = 0
+        self._verrou = threading.RLock()
+        self._reconstruction = None
+        self._en_attente = None
+
+    def _construire(self):
+        """permet de (re)construire l'index en une seule requête, puis de remplacer l'ancien.
+        """
+        with self._verrou:
+            self._en_attente = []
+        plats_par_ingredient, ingredients_par_plat = defaultdict(set), defaultdict(set)
+        try:
+            lignes = db.session.query(Composition.composition_plat_id,
+                                      Composition.composition_ingredient_id).distinct()
+            for plat_id, ingredient_id in lignes:
+                self._ranger(plat_id, [ingredient_id], plats_par_ingredient, ingredients_par_plat)
+        except Exception:
+            with self._verrou:
+                self._en_attente = None
+            raise
+
+        with self._verrou:
+            self._plats_par_ingredient, self._ingredients_par_plat = plats_par_ingredient, ingredients_par_plat
+            self._expiration = time.monotonic() + INDEX_DUREE
+            en_attente, self._en_attente = self._en_attente, None
+            for methode, arguments in en_attente:
+                methode(**arguments)
+
+    def _reconstruire_en_arriere_plan(self):
+        with app.app_context():
+            try:
+                self._construire()
+            except Exception:
+                journal.exception("La reconstruction de l'index de la composition a échoué")
+                with self._verrou:
+                    self._expiration = time.monotonic() + INDEX_DUREE
+            finally:
+                self._reconstruction = None
+
+    def _tables(self) -> tuple:
+        """permet d'obtenir les deux tables de l'index, en le construisant au premier appel et en lançant sa
+        reconstruction en arrière-plan lorsqu'il est périmé.
+
+                Returns
+                -------
+                tuple
+                    (plats par ingrédient, ingrédients par plat), toujours issus de la même construction
+                """
+        if self._ingredients_par_plat is None:
+            self._construire()
+        with self._verrou:
+            if time.monotonic() >= self._expiration and self._reconstruction is None:
+                self._reconstruction = threading.Thread(target=self._reconstruire_en_arriere_plan, daemon=True,
+                                                        name="index-composition")
+                self._reconstruction.start()
+            return self._plats_par_ingredient, self._ingredients_par_plat
+
+    @staticmethod
+    def _ranger(plat_id: int, ingredients: list, plats_par_ingredient: dict, ingredients_par_plat: dict):
+        """permet d'ajouter des ingrédients à la composition d'un plat dans l'index.
+        """
+        for ingredient_id in ingredients:
+            plats_par_ingredient[ingredient_id].add(plat_id)
+            ingredients_par_plat[plat_id].add(ingredient_id)
+
+    def preparer(self):
+        """permet de construire l'index s'il ne l'est pas encore, par exemple au démarrage de l'application.
+        """
+        if self._ingredients_par_plat is None:
+            self._construire()
+
+    def ajouter(self, plat_id: int, ingredients: list, **autres):
+        """permet d'ajouter à l'index des lignes de composition qui viennent d'être enregistrées.
+        """
+        with self._verrou:
+            if self._en_attente is not None:
+                self._en_attente.append((self.ajouter, {"plat_id": plat_id, "ingredients": ingredients}))
+            if self._ingredients_par_plat is not None:
+                self._ranger(plat_id, ingredients, self._plats_par_ingredient, self._ingredients_par_plat)
+
+    def retirer(self, plat_id: int, **autres):
+        """permet de retirer de l'index un plat qui vient d'être supprimé.
+        """
+        with self._verrou:
+            if self._en_attente is not None:
+                self._en_attente.append((self.retirer, {"plat_id": plat_id}))
+            if self._ingredients_par_plat is not None:
+                for ingredient_id in self._ingredients_par_plat.pop(plat_id, set()):
+                    self._plats_par_ingredient[ingredient_id].discard(plat_id)
+
+    def invalider(self, **autres):
+        """permet de forcer la reconstruction de l'index au prochain appel.
+        """
+        with self._verrou:
+            self._plats_par_ingredient = None
+            self._ingredients_par_plat = None
+
+    def ingredients(self, plat_id: int) -> set:
+        """permet de connaître les ingrédients d'un plat.
+
+                Returns
+                -------
+                set
+                    id des ingrédients du plat
+                """
+        return self._tables()[1].get(plat_id, set())
+
+    def contient(self, plat_id: int, ingredients: set) -> bool:
+        """permet de savoir si un plat contient au moins un ingrédient d'un ensemble, en autant d'accès à l'index
+        inversé qu'il y a d'ingrédients.
+
+                Returns
+                -------
+                Booleen
+                    indique si l'un des ingrédients entre dans la composition du plat
+                """
+        plats_par_ingredient = self._tables()[0]
+        return any(plat_id in plats_par_ingredient.get(ingredient_id, ()) for ingredient_id in ingredients)
+
+    def cuisinables(self, ingredients: list, manquants: int = 0) -> list:
+        """permet de trouver les plats dont la composition est entièrement couverte par des ingrédients, ou à
+        laquelle il ne manque qu'un nombre donné d'ingrédients.
+
+                Paramètres
+                ----------
+                ingredients :
+                    id des ingrédients disponibles.
+
+                manquants :
+                    nombre maximal d'ingrédients manquants.
+
+                Returns
+                -------
+                list
+                    tuples (id du plat, couverture entre 0 et 1, id des ingrédients manquants), du plat le mieux
+                    couvert au moins bien couvert
+                """
+        plats_par_ingredient, ingredients_par_plat = self._tables()
+        disponibles = set(ingredients)
+
+        couverts = defaultdict(int)
+        for ingredient_id in disponibles:
+            for plat_id in plats_par_ingredient.get(ingredient_id, ()):
+                couverts[plat_id] += 1
+
+        resultats = []
+        for plat_id, nombre in couverts.items():
+            composition = ingredients_par_plat[plat_id]
+            if len(composition) - nombre <= manquants:
+                resultats.append((plat_id, nombre / len(composition), sorted(composition - disponibles)))
+        resultats.sort(key=lambda resultat: (-resultat[1], len(resultat[2]), resultat[0]))
+        return resultats
+
+
+index_composition = IndexComposition()
+abonner(COMPOSITION_AJOUTEE, index_composition.ajouter)
+abonner(PLAT_SUPPRIME, index_composition.retirer)
+
+
+def plats_cuisinables(ingredients: list, manquants: int = 0, limite: int = None, options: list = None) -> list:
+    """permet de trouver les plats que l'on peut cuisiner avec des ingrédients.
+
+            Paramètres
+            ----------
+            ingredients, manquants :
+                voir IndexComposition.cuisinables().
+
+            limite :
+                nombre maximal de plats renvoyés.
+
+            options :
+                stratégies de chargement à appliquer à la requête des plats.
+
+            Returns
+            -------
+            list
+                tuples (plat, couverture, id des ingrédients manquants), du plat le mieux couvert au moins bien couvert
+            """
+    resultats = index_composition.cuisinables(ingredients, manquants)[:limite]
+    if not resultats:
+        return []
+    plats = {plat.plat_id: plat for plat in Plat.query.options(*(options or []))
+             .filter(Plat.plat_id.in_([resultat[0] for resultat in resultats]))}
+    return [(plats[plat_id], couverture, absents) for plat_id, couverture, absents in resultats if plat_id in plats]
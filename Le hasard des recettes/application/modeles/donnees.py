@@ -1,7 +1,10 @@
 from flask import url_for
+from sqlalchemy.exc import IntegrityError
 import datetime
 
 from .. app import db
+from .quantites import analyser_quantite
+from .evenements import publier, PLAT_AJOUTE, PLAT_MODIFIE, PLAT_SUPPRIME, COMPOSITION_AJOUTEE, INGREDIENT_AJOUTE
 
 
 class Authorship(db.Model):
@@ -18,8 +21,15 @@ class Authorship(db.Model):
         -------
         author_to_json(self)
             permet d'intégrer à l'api les informations sur la paternité des actions d'un utilisateur sur l'application
+
+        to_jsonapi_dict(self)
+            permet de décrire une édition comme ressource incluse (include=editions) de l'api
         """
     __tablename__ = "authorship"
+    __table_args__ = (
+        db.Index("ix_authorship_plat", "authorship_plat_id"),
+        db.Index("ix_authorship_user", "authorship_user_id")
+    )
     authorship_id = db.Column(db.Integer, nullable=True, autoincrement=True, primary_key=True, unique=True)
     authorship_plat_id = db.Column(db.Integer, db.ForeignKey('plat.plat_id'))
     authorship_user_id = db.Column(db.Integer, db.ForeignKey('user.user_id'))
@@ -40,6 +50,27 @@ class Authorship(db.Model):
             "on": self.authorship_date
         }
 
+    def to_jsonapi_dict(self):
+        """permet de décrire une édition comme ressource incluse de l'api : son auteur n'y figure que par son id.
+
+                Returns
+                -------
+                json
+                    ressource "edition"
+                """
+        return {
+            "type": "edition",
+            "id": self.authorship_id,
+            "attributes": {
+                "on": self.authorship_date
+            },
+            "relationships": {
+                "author": {
+                    "data": {"type": "people", "id": self.authorship_user_id}
+                }
+            }
+        }
+
 
 class Composition(db.Model):
     """
@@ -55,14 +86,50 @@ class Composition(db.Model):
         -------
         ajout_compo(ingredient, plat, dosage)
             permet d'intégrer à la base de données les informations sur la composition des recettes.
+
+        ajout_bulk(plat, lignes)
+            permet d'intégrer en une seule transaction plusieurs ingrédients à la composition d'une recette.
+
+        to_jsonapi_dict(self)
+            permet de décrire une ligne de composition comme ressource incluse (include=composition) de l'api
         """
     __tablename__ = "composition"
+    __table_args__ = (
+        db.Index("ix_composition_plat", "composition_plat_id", "composition_ingredient_id"),
+        db.Index("ix_composition_ingredient", "composition_ingredient_id", "composition_plat_id")
+    )
     composition_id = db.Column(db.Integer, nullable=True, autoincrement=True, primary_key=True)
     composition_plat_id = db.Column(db.Integer, db.ForeignKey('plat.plat_id'))
     composition_ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredient.ingredient_id'))
     composition_ingredient = db.relationship('Ingredient', back_populates="composition")
     composition_plat = db.relationship('Plat', back_populates="composition")
     quantite = db.Column(db.String)
+    quantite_valeur = db.Column(db.Float)
+    quantite_unite = db.Column(db.String(40))
+
+    def to_jsonapi_dict(self):
+        """permet de décrire une ligne de composition comme ressource incluse de l'api : l'ingrédient n'y figure que
+        par son id, et n'est décrit que s'il est lui aussi inclus (include=composition.ingredient).
+
+                Returns
+                -------
+                json
+                    ressource "composition"
+                """
+        return {
+            "type": "composition",
+            "id": self.composition_id,
+            "attributes": {
+                "quantite": self.quantite,
+                "valeur": self.quantite_valeur,
+                "unite": self.quantite_unite if self.quantite_valeur is not None else None
+            },
+            "relationships": {
+                "ingredient": {
+                    "data": {"type": "ingredient", "id": self.composition_ingredient_id}
+                }
+            }
+        }
 
     @staticmethod
     def ajout_compo(ingredient: int, plat: int, dosage: str) -> bool:
@@ -101,17 +168,97 @@ class Composition(db.Model):
         if len(erreurs) > 0:
             return False, erreurs
 
+        valeur, unite = analyser_quantite(dosage)
         composition = Composition(
             composition_ingredient_id=ingredient,
             composition_plat_id=plat,
-            quantite=dosage
+            quantite=dosage,
+            quantite_valeur=valeur,
+            quantite_unite=unite
         )
 
         try:
             db.session.add(composition)
             db.session.commit()
+            publier(COMPOSITION_AJOUTEE, plat_id=composition.composition_plat_id,
+                    ingredients=[composition.composition_ingredient_id])
             return True, composition
         except Exception as erreur:
+            db.session.rollback()
+            return False, [str(erreur)]
+
+    @staticmethod
+    def ajout_bulk(plat: int, lignes: list) -> bool:
+        """permet d'intégrer en une seule transaction plusieurs ingrédients à la composition d'une recette. Toutes
+        les lignes sont vérifiées avant l'écriture : si l'une d'elles est invalide, rien n'est enregistré.
+
+                Paramètres
+                ----------
+                plat :
+                    récupère l'id du plat qui a été récupéré au préalable dans ./routes/generic.py dans
+                    la fonction add_ingredients ou dans ./routes/api.py.
+
+                lignes :
+                    liste de tuples (id de l'ingrédient, dosage).
+
+                Returns
+                -------
+                Booleen
+                    en fonction du if qui précède les "returns"
+
+                int
+                    le nombre de lignes enregistrées
+
+                list
+                    une liste d'erreurs s'il y a eu une erreur plus haut dans la fonction
+                """
+        erreurs = []
+        if not plat:
+            erreurs.append("L'id de la recette est manquant")
+        elif not str(plat).isdigit() or not Plat.query.filter(Plat.plat_id == int(plat)).count():
+            erreurs.append("La recette {} n'existe pas".format(plat))
+        if not lignes:
+            erreurs.append("Aucun ingrédient n'a été indiqué")
+
+        valeurs = []
+        for numero, (ingredient, dosage) in enumerate(lignes, start=1):
+            if not ingredient:
+                erreurs.append("L'ingrédient de la ligne {} est manquant".format(numero))
+            elif not str(ingredient).isdigit():
+                erreurs.append("L'ingrédient de la ligne {} n'est pas valide".format(numero))
+            if not dosage:
+                erreurs.append("La quantité de l'ingrédient de la ligne {} est manquante".format(numero))
+            if ingredient and str(ingredient).isdigit() and dosage:
+                valeur, unite = analyser_quantite(dosage)
+                valeurs.append({
+                    "composition_ingredient_id": int(ingredient),
+                    "composition_plat_id": plat,
+                    "quantite": dosage,
+                    "quantite_valeur": valeur,
+                    "quantite_unite": unite
+                })
+
+        identifiants = {valeur["composition_ingredient_id"] for valeur in valeurs}
+        if identifiants:
+            existants = {ligne[0] for ligne in db.session.query(Ingredient.ingredient_id)
+                         .filter(Ingredient.ingredient_id.in_(identifiants))}
+            for manquant in sorted(identifiants - existants):
+                erreurs.append("L'ingrédient {} n'existe pas".format(manquant))
+
+        if len(erreurs) > 0:
+            return False, erreurs
+
+        for valeur in valeurs:
+            valeur["composition_plat_id"] = int(plat)
+
+        try:
+            db.session.execute(db.insert(Composition), valeurs)
+            db.session.commit()
+            publier(COMPOSITION_AJOUTEE, plat_id=int(plat),
+                    ingredients=[valeur["composition_ingredient_id"] for valeur in valeurs])
+            return True, len(valeurs)
+        except Exception as erreur:
+            db.session.rollback()
             return False, [str(erreur)]
 
 
@@ -127,12 +274,23 @@ class Plat(db.Model):
 
         Méthodes
         -------
-        to_jsonapi_dict(self)
+        to_jsonapi_dict(self, gabarits, composition, champs, inclusions)
             permet d'intégrer à l'api les informations sur la paternité des actions d'un utilisateur sur l'application
 
+        gabarits_liens()
+            permet de construire une seule fois les gabarits des liens de to_jsonapi_dict()
+
         ajout(nom, recette, typologie, nombre)
             permet d'intégrer à la base de données les informations sur une recette.
+
+        modifier(plat_id, colonne, valeur)
+            permet de modifier une information d'une recette.
         """
+    __table_args__ = (
+        db.Index("ix_plat_type", "plat_type", "plat_nom"),
+        db.Index("ux_plat_nom", "plat_nom", unique=True),
+        db.Index("ux_plat_recette", "plat_recette", unique=True)
+    )
     plat_id = db.Column(db.Integer, unique=True, nullable=False, primary_key=True, autoincrement=True)
     plat_nom = db.Column(db.Text)
     plat_recette = db.Column(db.VARCHAR(100))
@@ -141,7 +299,16 @@ class Plat(db.Model):
     authorships = db.relationship("Authorship", back_populates="plat")
     composition = db.relationship("Composition", back_populates="composition_plat")
 
-    def to_jsonapi_dict(self):
+    # Attributs json de l'api et colonnes qui les portent, dans l'ordre où ils sont produits.
+    ATTRIBUTS_JSONAPI = {
+        "name": "plat_nom",
+        "type": "plat_type",
+        "nombre_convives": "plat_nombre_convives",
+        "lien_recette": "plat_recette"
+    }
+
+    def to_jsonapi_dict(self, gabarits: dict = None, composition: bool = False, champs: set = None,
+                        inclusions: set = None):
         """permet d'intégrer à la base de données les informations sur la composition des recettes.
 
                 Paramètres
@@ -149,30 +316,93 @@ class Plat(db.Model):
                 self :
                     récupère la ligne qui vient d'être créée dans la table.
 
+                gabarits :
+                    gabarits des liens produits par gabarits_liens(), pour éviter deux appels à url_for par plat
+                    lorsque l'on sérialise beaucoup de plats.
+
+                composition :
+                    ajoute aux relations la composition du plat (ingrédients et quantités).
+
+                champs :
+                    noms des attributs et des relations à produire (fields[plat]), tous par défaut. Les colonnes
+                    des attributs absents n'ont pas à être chargées.
+
+                inclusions :
+                    relations incluses (include) : elles ne contiennent alors que les types et les id des ressources,
+                    décrites dans le tableau "included" du document.
+
                 Returns
                 -------
                 json
                     json rempli en fonction des informations fournies dans la classe.
                 """
-        return {
+        inclusions = inclusions or set()
+        if gabarits:
+            liens = {cle: gabarit.format(self.plat_id) for cle, gabarit in gabarits.items()}
+        else:
+            liens = {
+                "self": url_for("plat_info", plat_id=self.plat_id, _external=True),
+                "json": url_for("api_places_single", plat_id=self.plat_id, _external=True)
+            }
+        dictionnaire = {
             "type": "place",
-            "id": self.plat_id,
-            "attributes": {
-                "name": self.plat_nom,
-                "type": self.plat_type,
-                "nombre_convives": self.plat_nombre_convives,
-                "lien_recette": self.plat_recette
-            },
-            "links": {
-                "self": url_for("plat", plat_id=self.plat_id, _external=True),
-                "json": url_for("api_plats_single", plat_id=self.plat_id, _external=True)
-            },
-            "relationships": {
-                "editions": [
+            "id": self.plat_id
+        }
+        attributs = {
+            nom: getattr(self, colonne)
+            for nom, colonne in Plat.ATTRIBUTS_JSONAPI.items()
+            if champs is None or nom in champs
+        }
+        if attributs:
+            dictionnaire["attributes"] = attributs
+        dictionnaire["links"] = liens
+
+        relations = {}
+        if champs is None or "editions" in champs:
+            if "editions" in inclusions:
+                relations["editions"] = {
+                    "data": [{"type": "edition", "id": author.authorship_id} for author in self.authorships]
+                }
+            else:
+                relations["editions"] = [
                     author.author_to_json()
                     for author in self.authorships
                 ]
-            }
+        if (composition or "composition" in inclusions) if champs is None else "composition" in champs:
+            if "composition" in inclusions:
+                relations["composition"] = {
+                    "data": [{"type": "composition", "id": element.composition_id} for element in self.composition]
+                }
+            else:
+                relations["composition"] = [
+                    {
+                        "ingredient": {
+                            "type": "ingredient",
+                            "id": element.composition_ingredient_id,
+                            "name": element.composition_ingredient.ingredient_nom if element.composition_ingredient
+                            else None
+                        },
+                        "quantite": element.quantite
+                    }
+                    for element in self.composition
+                ]
+        if relations:
+            dictionnaire["relationships"] = relations
+        return dictionnaire
+
+    @staticmethod
+    def gabarits_liens() -> dict:
+        """permet de construire une seule fois les gabarits des liens de to_jsonapi_dict().
+
+                Returns
+                -------
+                dict
+                    gabarits des liens "self" et "json", où l'id du plat est remplacé par {}
+                """
+        sentinelle = 987654321
+        return {
+            "self": url_for("plat_info", plat_id=sentinelle, _external=True).replace(str(sentinelle), "{}"),
+            "json": url_for("api_places_single", plat_id=sentinelle, _external=True).replace(str(sentinelle), "{}")
         }
 
     @staticmethod
@@ -211,11 +441,6 @@ class Plat(db.Model):
         if not nombre:
             erreurs.append("L'indication du nombre de convives est manquant")
 
-        uniques = Plat.query.filter(db.or_(Plat.plat_recette == recette, Plat.plat_nom == nom)).count()
-        if uniques > 0:
-            erreurs.append("Le lien vers cette recette ou cette recette est déjà inscrit dans "
-                           "notre base de données.")
-
         if len(erreurs) > 0:
             return False, erreurs
 
@@ -229,10 +454,102 @@ class Plat(db.Model):
         try:
             db.session.add(plat)
             db.session.commit()
+            publier(PLAT_AJOUTE, plat=plat)
             return True, plat
+        except IntegrityError:
+            db.session.rollback()
+            return False, ["Le lien vers cette recette ou cette recette est déjà inscrit dans "
+                           "notre base de données."]
         except Exception as erreur:
+            db.session.rollback()
             return False, [str(erreur)]
 
+    @staticmethod
+    def modifier(plat_id: int, colonne: str, valeur) -> bool:
+        """permet de modifier une information d'une recette. Un nom ou un lien déjà utilisé par une autre recette
+        est refusé par les index uniques de la base de données.
+
+                Paramètres
+                ----------
+                plat_id :
+                    id de la recette à modifier.
+
+                colonne :
+                    colonne à modifier : plat_nom, plat_recette, plat_type ou plat_nombre_convives.
+
+                valeur :
+                    nouvelle valeur de la colonne.
+
+                Returns
+                -------
+                Booleen
+                    en fonction du if qui précède les "returns"
+
+                list
+                    une liste d'erreurs s'il y a eu une erreur plus haut dans la fonction
+                """
+        plat = Plat.query.filter(Plat.plat_id == plat_id).first()
+        if plat is None:
+            return False, ["Cette recette n'existe pas"]
+
+        setattr(plat, colonne, valeur)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return False, ["Le lien vers cette recette ou cette recette est déjà inscrit dans "
+                           "notre base de données."]
+        except Exception as erreur:
+            db.session.rollback()
+            return False, [str(erreur)]
+        publier(PLAT_MODIFIE, plat_id=plat.plat_id)
+        return True, plat
+
+    @staticmethod
+    def supprimer(ids: list) -> bool:
+        """permet de supprimer des plats avec leur composition et leurs éditions, en une seule transaction et par
+        ensembles (DELETE ... WHERE ... IN (...)) plutôt que ligne à ligne.
+
+                Paramètres
+                ----------
+                ids :
+                    liste des id des plats à supprimer.
+
+                Returns
+                -------
+                Booleen
+                    en fonction du if qui précède les "returns"
+
+                list
+                    la liste des id des plats supprimés, ou une liste d'erreurs
+                """
+        erreurs = []
+        if not ids:
+            erreurs.append("Aucun plat à supprimer n'a été indiqué")
+        elif not all(str(plat_id).isdigit() for plat_id in ids):
+            erreurs.append("Les id des plats doivent être des nombres entiers")
+        if len(erreurs) > 0:
+            return False, erreurs
+
+        ids = sorted({int(plat_id) for plat_id in ids})
+        # Les listes d'id sont découpées pour rester sous la limite du nombre de paramètres d'une requête SQLite.
+        lots = [ids[debut:debut + 500] for debut in range(0, len(ids), 500)]
+        try:
+            supprimes = []
+            for lot in lots:
+                supprimes.extend(db.session.scalars(db.select(Plat.plat_id).filter(Plat.plat_id.in_(lot))))
+                db.session.execute(db.delete(Composition).filter(Composition.composition_plat_id.in_(lot)))
+                db.session.execute(db.delete(Authorship).filter(Authorship.authorship_plat_id.in_(lot)))
+                db.session.execute(db.delete(Plat).filter(Plat.plat_id.in_(lot)))
+            db.session.commit()
+        except Exception as erreur:
+            db.session.rollback()
+            return False, [str(erreur)]
+
+        for plat_id in supprimes:
+            publier(PLAT_SUPPRIME, plat_id=plat_id)
+        return True, supprimes
+
 
 class Ingredient(db.Model):
     """
@@ -248,12 +565,36 @@ class Ingredient(db.Model):
         -------
         ajout_ingr(ingredient, t)
             permet d'intégrer à la base de données les informations sur un ingrédient.
+
+        to_jsonapi_dict(self)
+            permet de décrire un ingrédient comme ressource de l'api
         """
+    __table_args__ = (
+        db.Index("ix_ingredient_type", "ingredient_type", "ingredient_nom"),
+        db.Index("ux_ingredient_nom", "ingredient_nom", unique=True)
+    )
     ingredient_id = db.Column(db.Integer, unique=True, primary_key=True, autoincrement=True, nullable=False)
     ingredient_nom = db.Column(db.Text)
     ingredient_type = db.Column(db.Text)
     composition = db.relationship("Composition", back_populates="composition_ingredient")
 
+    def to_jsonapi_dict(self):
+        """permet de décrire un ingrédient comme ressource de l'api.
+
+                Returns
+                -------
+                json
+                    ressource "ingredient"
+                """
+        return {
+            "type": "ingredient",
+            "id": self.ingredient_id,
+            "attributes": {
+                "name": self.ingredient_nom,
+                "type": self.ingredient_type
+            }
+        }
+
     @staticmethod
     def ajout_ingr(ingredient: str, t: str) -> bool:
         """permet d'intégrer à la base de données les informations sur la composition des recettes.
@@ -282,10 +623,6 @@ class Ingredient(db.Model):
         if not t:
             erreurs.append("Le type de l'ingrédient est manquant")
 
-        uniques = Ingredient.query.filter(Ingredient.ingredient_nom == ingredient).count()
-        if uniques > 0:
-            erreurs.append("Cet ingrédient est déjà inscrit dans notre base de données.")
-
         if len(erreurs) > 0:
             return False, erreurs
 
@@ -297,6 +634,87 @@ class Ingredient(db.Model):
         try:
             db.session.add(ingredient)
             db.session.commit()
+            publier(INGREDIENT_AJOUTE, ingredient=ingredient)
             return True, ingredient
+        except IntegrityError:
+            db.session.rollback()
+            return False, ["Cet ingrédient est déjà inscrit dans notre base de données."]
         except Exception as erreur:
+            db.session.rollback()
             return False, [str(erreur)]
+
+
+
+def purger_orphelins(simulation: bool = False) -> dict:
+    """permet de retrouver et de supprimer les compositions dont le plat ou l'ingrédient n'existe plus, et les
+    éditions dont le plat n'existe plus, laissées par les anciennes suppressions ligne à ligne.
+
+            Paramètres
+            ----------
+            simulation :
+                compte les lignes orphelines sans les supprimer.
+
+            Returns
+            -------
+            dict
+                nombre de compositions et d'éditions orphelines
+            """
+    conditions = {
+        "compositions": (Composition, db.or_(
+            Composition.composition_plat_id.is_(None),
+            Composition.composition_ingredient_id.is_(None),
+            Composition.composition_plat_id.not_in(db.select(Plat.plat_id)),
+            Composition.composition_ingredient_id.not_in(db.select(Ingredient.ingredient_id))
+        )),
+        "editions": (Authorship, db.or_(
+            Authorship.authorship_plat_id.is_(None),
+            Authorship.authorship_plat_id.not_in(db.select(Plat.plat_id))
+        ))
+    }
+    orphelins = {}
+    try:
+        for nom, (modele, condition) in conditions.items():
+            if simulation:
+                orphelins[nom] = db.session.scalar(db.select(db.func.count()).select_from(modele).filter(condition))
+            else:
+                orphelins[nom] = db.session.execute(db.delete(modele).filter(condition)).rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return orphelins
+
+
+def chargement_composition_plat():
+    """permet de charger en une requête supplémentaire la composition d'un plat et ses ingrédients, au lieu de
+    charger chaque ingrédient un par un.
+
+            Returns
+            -------
+            Load
+                stratégie de chargement à passer à Query.options()
+            """
+    return db.selectinload(Plat.composition).joinedload(Composition.composition_ingredient)
+
+
+def chargement_composition_ingredient():
+    """permet de charger en une requête supplémentaire les plats dans lesquels entre un ingrédient.
+
+            Returns
+            -------
+            Load
+                stratégie de chargement à passer à Query.options()
+            """
+    return db.selectinload(Ingredient.composition).joinedload(Composition.composition_plat)
+
+
+def chargement_auteurs():
+    """permet de charger en une requête supplémentaire les éditions d'un ou plusieurs plats et leurs auteurs,
+    utilisés par Plat.to_jsonapi_dict().
+
+            Returns
+            -------
+            Load
+                stratégie de chargement à passer à Query.options()
+            """
+    return db.selectinload(Plat.authorships).joinedload(Authorship.user)
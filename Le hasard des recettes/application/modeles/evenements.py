@@ -0,0 +1,41 @@
+from collections import defaultdict
+
+
+# Les méthodes d'écriture des modèles publient un événement après chaque modification enregistrée ; les index et
+# caches gardés en mémoire s'y abonnent pour rester à jour sans que les modèles aient à les connaître.
+PLAT_AJOUTE = "plat_ajoute"
+PLAT_MODIFIE = "plat_modifie"
+PLAT_SUPPRIME = "plat_supprime"
+COMPOSITION_AJOUTEE = "composition_ajoutee"
+INGREDIENT_AJOUTE = "ingredient_ajoute"
+
+_abonnes = defaultdict(list)
+
+
+def abonner(evenement: str, fonction) -> None:
+    """permet d'appeler une fonction à chaque fois qu'un événement est publié.
+
+            Paramètres
+            ----------
+            evenement :
+                nom de l'événement (PLAT_AJOUTE, PLAT_MODIFIE...).
+
+            fonction :
+                fonction appelée avec les arguments nommés de l'événement.
+            """
+    _abonnes[evenement].append(fonction)
+
+
+def publier(evenement: str, **donnees) -> None:
+    """permet de prévenir les abonnés qu'une modification a été enregistrée dans la base de données.
+
+            Paramètres
+            ----------
+            evenement :
+                nom de l'événement (PLAT_AJOUTE, PLAT_MODIFIE...).
+
+            donnees :
+                arguments nommés transmis aux abonnés.
+            """
+    for fonction in _abonnes[evenement]:
+        fonction(**donnees)
@@ -0,0 +1,96 @@
+from itertools import groupby
+
+from ..app import db
+from .donnees import Plat, Ingredient
+
+
+# Ordre du menu dans lequel les types de plats sont présentés ; un type absent de la liste est placé après, par
+# ordre alphabétique.
+ORDRE_TYPES_PLAT = ("Entrée", "Plat principal", "Accompagnement", "Dessert", "Autre")
+
+
+def _tri(colonne_facette, ordre: tuple) -> list:
+    """permet de traduire un ordre explicite des valeurs d'une colonne en expressions à passer à ORDER BY : le rang
+    de la valeur dans l'ordre, puis la valeur elle-même.
+    """
+    if not ordre:
+        return [colonne_facette]
+    rang = db.case({valeur: rang for rang, valeur in enumerate(ordre)}, value=colonne_facette, else_=len(ordre))
+    return [rang, colonne_facette]
+
+
+def partitionner(modele, colonne_facette, colonne_tri, ordre: tuple = ()) -> list:
+    """permet de répartir toutes les lignes d'une table selon les valeurs d'une colonne (les facettes), en une
+    seule requête triée que l'on découpe ensuite en Python.
+
+            Paramètres
+            ----------
+            modele :
+                classe du modèle à interroger (Plat, Ingredient).
+
+            colonne_facette :
+                colonne dont les valeurs distinctes forment les facettes.
+
+            colonne_tri :
+                colonne selon laquelle les éléments de chaque facette sont triés.
+
+            ordre :
+                valeurs de la facette dans l'ordre où elles doivent être présentées ; par défaut, ordre alphabétique.
+
+            Returns
+            -------
+            list
+                liste de dictionnaires (valeur, nombre, elements), une par valeur présente dans les données
+            """
+    lignes = modele.query.filter(colonne_facette.isnot(None))\
+        .order_by(*_tri(colonne_facette, ordre), colonne_tri).all()
+    facettes = []
+    for valeur, elements in groupby(lignes, key=lambda ligne: getattr(ligne, colonne_facette.key)):
+        elements = list(elements)
+        facettes.append({"valeur": valeur, "nombre": len(elements), "elements": elements})
+    return facettes
+
+
+def compter(colonne_facette, ordre: tuple = ()) -> list:
+    """permet de compter, en une seule requête groupée, le nombre de lignes par valeur d'une colonne.
+
+            Paramètres
+            ----------
+            colonne_facette :
+                colonne dont les valeurs distinctes forment les facettes.
+
+            ordre :
+                valeurs de la facette dans l'ordre où elles doivent être présentées ; par défaut, ordre alphabétique.
+
+            Returns
+            -------
+            list
+                liste de tuples (valeur, nombre), triée selon l'ordre demandé puis par valeur
+            """
+    return db.session.query(colonne_facette, db.func.count())\
+        .filter(colonne_facette.isnot(None))\
+        .group_by(colonne_facette)\
+        .order_by(*_tri(colonne_facette, ordre))\
+        .all()
+
+
+def facettes_plats() -> list:
+    """permet de répartir les plats selon leur type, dans l'ordre du menu (ORDRE_TYPES_PLAT).
+
+            Returns
+            -------
+            list
+                liste de facettes, voir partitionner()
+            """
+    return partitionner(Plat, Plat.plat_type, Plat.plat_nom, ORDRE_TYPES_PLAT)
+
+
+def facettes_ingredients() -> list:
+    """permet de répartir les ingrédients selon leur type.
+
+            Returns
+            -------
+            list
+                liste de facettes, voir partitionner()
+            """
+    return partitionner(Ingredient, Ingredient.ingredient_type, Ingredient.ingredient_nom)
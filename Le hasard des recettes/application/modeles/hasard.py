@@ -0,0 +1,172 @@
+import random
+
+from ..app import db
+from .donnees import Plat
+from .cuisinables import index_composition
+from .evenements import abonner, PLAT_AJOUTE, PLAT_MODIFIE, PLAT_SUPPRIME
+
+
+class IndexHasard:
+    """
+        C'est une classe qui garde en mémoire les id des plats, regroupés par type et par nombre de convives, pour en
+        tirer au hasard sans ORDER BY RANDOM() : un tirage ne coûte que quelques accès à une liste, quelle que soit
+        la taille de la table.
+        ...
+
+        L'index est construit en une requête au premier tirage, puis mis à jour par les événements publiés par
+        Plat.ajout, Plat.modifier et supprimer. Les plats qui contiennent un ingrédient exclu (sans) sont
+        reconnus par l'index inversé ingrédient -> plats de cuisinables.index_composition, tenu à jour par
+        COMPOSITION_AJOUTEE : chaque plat tiré est vérifié sans requête SQL.
+
+        Méthodes
+        -------
+        tirer(nombre, typologie, convives, sans)
+            permet de tirer au hasard des id de plats qui respectent les filtres.
+        """
+
+    def __init__(self):
+        self._groupes = None
+        self._positions = None
+
+    def _construire(self):
+        """permet de (re)construire l'index en une seule requête.
+        """
+        groupes, positions = {}, {}
+        for plat_id, typologie, convives in db.session.query(Plat.plat_id, Plat.plat_type,
+                                                             Plat.plat_nombre_convives):
+            self._ranger(groupes, positions, plat_id, typologie, convives)
+        self._groupes, self._positions = groupes, positions
+
+    @staticmethod
+    def _clefs(typologie: str, convives: int) -> list:
+        """permet de lister les groupes dans lesquels un plat est rangé.
+
+                Returns
+                -------
+                list
+                    clefs (type, nombre de convives), None valant "tous"
+                """
+        convives = int(convives) if str(convives).isdigit() else None
+        return [(None, None), (typologie, None), (None, convives), (typologie, convives)]
+
+    def _ranger(self, groupes: dict, positions: dict, plat_id: int, typologie: str, convives: int):
+        """permet d'ajouter un plat aux groupes auxquels il appartient, en notant sa position dans chacun.
+        """
+        for clef in self._clefs(typologie, convives):
+            groupe = groupes.setdefault(clef, [])
+            places = positions.setdefault(clef, {})
+            if plat_id not in places:
+                places[plat_id] = len(groupe)
+                groupe.append(plat_id)
+
+    def ajouter(self, plat: Plat, **autres):
+        """permet d'ajouter à l'index un plat qui vient d'être enregistré.
+        """
+        if self._groupes is not None:
+            self._ranger(self._groupes, self._positions, plat.plat_id, plat.plat_type, plat.plat_nombre_convives)
+
+    def retirer(self, plat_id: int, **autres):
+        """permet de retirer de l'index un plat qui vient d'être supprimé. Dans chaque groupe, le dernier id prend la
+        place du plat retiré : le retrait ne parcourt pas la liste, quelle que soit la taille de la table.
+        """
+        if self._groupes is None:
+            return
+        for clef, places in self._positions.items():
+            position = places.pop(plat_id, None)
+            if position is None:
+                continue
+            groupe = self._groupes[clef]
+            dernier = groupe.pop()
+            if position < len(groupe):
+                groupe[position] = dernier
+                places[dernier] = position
+
+    def invalider(self, **autres):
+        """permet de forcer la reconstruction de l'index au prochain tirage.
+        """
+        self._groupes = None
+        self._positions = None
+
+    def tirer(self, nombre: int = 1, typologie: str = None, convives: int = None, sans: list = None) -> list:
+        """permet de tirer au hasard des id de plats qui respectent les filtres.
+
+                Paramètres
+                ----------
+                nombre :
+                    nombre de plats à tirer.
+
+                typologie :
+                    type des plats (Dessert, Entrée...).
+
+                convives :
+                    nombre de convives des plats.
+
+                sans :
+                    liste d'id d'ingrédients qui ne doivent pas entrer dans la composition des plats.
+
+                Returns
+                -------
+                list
+                    id des plats tirés, sans doublon ; la liste est plus courte que demandé s'il n'y a pas assez
+                    de plats qui respectent les filtres
+                """
+        if self._groupes is None:
+            self._construire()
+        candidats = self._groupes.get((typologie or None, convives or None), [])
+        if not candidats or nombre < 1:
+            return []
+
+        exclus = set(sans or [])
+
+        def accepte(plat_id):
+            return not exclus or not index_composition.contient(plat_id, exclus)
+
+        # Tirage par rejet : on tire au hasard des positions jusqu'à avoir assez de plats. Si les filtres
+        # excluent trop de candidats pour y arriver en quelques essais, on se rabat sur un tirage parmi tous les
+        # candidats restants, ce qui garantit d'en renvoyer autant qu'il en existe.
+        tires = []
+        deja_vus = set()
+        essais = 8 * nombre
+        while len(tires) < nombre and essais > 0 and len(deja_vus) < len(candidats):
+            essais -= 1
+            plat_id = candidats[random.randrange(len(candidats))]
+            if plat_id in deja_vus:
+                continue
+            deja_vus.add(plat_id)
+            if accepte(plat_id):
+                tires.append(plat_id)
+        if len(tires) < nombre:
+            restants = [plat_id for plat_id in candidats if plat_id not in deja_vus and accepte(plat_id)]
+            tires += random.sample(restants, min(nombre - len(tires), len(restants)))
+        return tires
+
+
+index_hasard = IndexHasard()
+abonner(PLAT_AJOUTE, index_hasard.ajouter)
+abonner(PLAT_MODIFIE, index_hasard.invalider)
+abonner(PLAT_SUPPRIME, index_hasard.retirer)
+
+
+def plats_au_hasard(nombre: int = 1, typologie: str = None, convives: int = None, sans: list = None,
+                    options: list = None) -> list:
+    """permet de tirer au hasard des plats qui respectent les filtres.
+
+            Paramètres
+            ----------
+            nombre, typologie, convives, sans :
+                voir IndexHasard.tirer().
+
+            options :
+                stratégies de chargement à appliquer à la requête des plats tirés.
+
+            Returns
+            -------
+            list
+                plats tirés, dans l'ordre du tirage
+            """
+    identifiants = index_hasard.tirer(nombre, typologie, convives, sans)
+    if not identifiants:
+        return []
+    plats = {plat.plat_id: plat for plat in Plat.query.options(*(options or []))
+             .filter(Plat.plat_id.in_(identifiants))}
+    return [plats[plat_id] for plat_id in identifiants if plat_id in plats]
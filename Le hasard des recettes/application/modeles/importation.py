@@ -0,0 +1,248 @@
+import csv
+import json
+import time
+
+from ..app import db
+from .donnees import Plat, Ingredient, Composition
+from .quantites import analyser_quantite
+
+
+COLONNES_PLAT = ["plat_nom", "plat_recette", "plat_type", "plat_nombre_convives"]
+COLONNES_INGREDIENT = ["ingredient_nom", "ingredient_type", "quantite"]
+
+
+def lire_csv(fichier):
+    """permet de lire un fichier CSV ligne à ligne. Chaque ligne décrit un ingrédient d'un plat, avec les colonnes
+    plat_nom, plat_recette, plat_type, plat_nombre_convives, ingredient_nom, ingredient_type et quantite ; les
+    lignes d'un même plat portent les mêmes colonnes plat_*.
+
+            Paramètres
+            ----------
+            fichier :
+                fichier texte ouvert en lecture.
+
+            Returns
+            -------
+            generator
+                tuples (informations sur le plat, informations sur l'ingrédient ou None)
+            """
+    for ligne in csv.DictReader(fichier):
+        plat = {colonne: (ligne.get(colonne) or "").strip() for colonne in COLONNES_PLAT}
+        ingredient = {colonne: (ligne.get(colonne) or "").strip() for colonne in COLONNES_INGREDIENT}
+        yield plat, ingredient if ingredient["ingredient_nom"] else None
+
+
+def lire_jsonl(fichier):
+    """permet de lire un fichier JSON Lines ligne à ligne. Chaque ligne décrit un plat avec les clefs plat_nom,
+    plat_recette, plat_type, plat_nombre_convives et composition, liste d'objets portant les clefs ingredient_nom,
+    ingredient_type et quantite.
+
+            Paramètres
+            ----------
+            fichier :
+                fichier texte ouvert en lecture.
+
+            Returns
+            -------
+            generator
+                tuples (informations sur le plat, informations sur l'ingrédient ou None)
+            """
+    for ligne in fichier:
+        if not ligne.strip():
+            continue
+        objet = json.loads(ligne)
+        plat = {colonne: str(objet.get(colonne) or "").strip() for colonne in COLONNES_PLAT}
+        composition = objet.get("composition") or []
+        if not composition:
+            yield plat, None
+        for element in composition:
+            yield plat, {colonne: str(element.get(colonne) or "").strip() for colonne in COLONNES_INGREDIENT}
+
+
+LECTEURS = {
+    "csv": lire_csv,
+    "jsonl": lire_jsonl
+}
+
+
+class Importation:
+    """
+        C'est une classe qui importe en flux un catalogue de recettes dans la base de données.
+        ...
+
+        Les plats et les ingrédients sont retrouvés grâce à des dictionnaires nom -> id gardés en mémoire, et les
+        nouvelles lignes sont insérées par lots (un executemany et une transaction par lot). La mémoire utilisée
+        dépend du nombre de plats et d'ingrédients, pas de la taille du fichier.
+
+        Un lot n'est écrit qu'entre deux plats : un plat est enregistré dans la même transaction que les lignes de sa
+        composition qui le suivent dans le fichier, et un import interrompu ne laisse pas de plat incomplet. Les id
+        sont attribués par la base de données au moment de l'écriture (INSERT ... RETURNING), pour ne pas entrer en
+        conflit avec les écritures faites par d'autres processus pendant l'import.
+
+        Les plats déjà présents dans la base de données avant l'import (même nom ou même lien) sont ignorés.
+
+        Méthodes
+        -------
+        importer(lignes)
+            permet d'importer les lignes fournies par lire_csv() ou lire_jsonl().
+        """
+
+    def __init__(self, taille_lot: int = 10000, rapport=None):
+        """
+                Paramètres
+                ----------
+                taille_lot :
+                    nombre de lignes (plats et compositions) à partir duquel le lot est écrit, au début du plat
+                    suivant.
+
+                rapport :
+                    fonction appelée après chaque lot avec les statistiques de l'import.
+                """
+        self.taille_lot = taille_lot
+        self.rapport = rapport
+        self.statistiques = {"lignes": 0, "plats": 0, "ingredients": 0, "compositions": 0, "ignorees": 0,
+                             "secondes": 0.0}
+        self._debut = None
+        self._plats_existants = set()
+        self._plats = {}
+        self._ingredients = {}
+        self._plat_courant = None
+        self._lot_plats = []
+        self._lot_ingredients = []
+        self._lot_compositions = []
+
+    def _charger(self):
+        """permet de charger en mémoire les noms et liens des plats existants et les ingrédients existants.
+        """
+        for nom, recette in db.session.query(Plat.plat_nom, Plat.plat_recette):
+            self._plats_existants.add(nom)
+            self._plats_existants.add(recette)
+        for ingredient_id, nom in db.session.query(Ingredient.ingredient_id, Ingredient.ingredient_nom):
+            self._ingredients[nom] = ingredient_id
+
+    def _plat(self, plat: dict) -> bool:
+        """permet de savoir si un plat est créé par l'import, et de le préparer pour le prochain lot la première
+        fois qu'il est rencontré.
+
+                Returns
+                -------
+                Booleen
+                    indique si le plat est créé par l'import ; False si le plat est incomplet ou existait déjà
+                    avant l'import
+                """
+        nom = plat["plat_nom"]
+        if nom in self._plats:
+            return True
+        if not all(plat.values()) or not plat["plat_nombre_convives"].isdigit():
+            return False
+        if nom in self._plats_existants or plat["plat_recette"] in self._plats_existants:
+            return False
+
+        # L'id sera connu à l'écriture du lot.
+        self._plats[nom] = None
+        self._plats_existants.add(plat["plat_recette"])
+        self._lot_plats.append({
+            "plat_nom": nom,
+            "plat_recette": plat["plat_recette"],
+            "plat_type": plat["plat_type"],
+            "plat_nombre_convives": int(plat["plat_nombre_convives"])
+        })
+        return True
+
+    def _ingredient(self, ingredient: dict) -> bool:
+        """permet de savoir si un ingrédient est connu, et de le préparer pour le prochain lot s'il est nouveau.
+
+                Returns
+                -------
+                Booleen
+                    indique si l'ingrédient peut être utilisé ; False s'il est inconnu et que son type n'est pas
+                    indiqué
+                """
+        nom = ingredient["ingredient_nom"]
+        if nom in self._ingredients:
+            return True
+        if not ingredient["ingredient_type"]:
+            return False
+
+        self._ingredients[nom] = None
+        self._lot_ingredients.append({
+            "ingredient_nom": nom,
+            "ingredient_type": ingredient["ingredient_type"]
+        })
+        return True
+
+    @staticmethod
+    def _inserer(modele, colonne_id, colonne_nom: str, lignes: list, ids: dict):
+        """permet d'insérer des lignes en laissant la base de données attribuer leurs id, et de les noter dans le
+        dictionnaire nom -> id.
+        """
+        if not lignes:
+            return
+        resultat = db.session.execute(db.insert(modele).returning(colonne_id, sort_by_parameter_order=True), lignes)
+        for ligne, identifiant in zip(lignes, resultat.scalars()):
+            ids[ligne[colonne_nom]] = identifiant
+
+    def _ecrire(self):
+        """permet d'écrire le lot en cours en une seule transaction.
+        """
+        try:
+            self._inserer(Plat, Plat.plat_id, "plat_nom", self._lot_plats, self._plats)
+            self._inserer(Ingredient, Ingredient.ingredient_id, "ingredient_nom", self._lot_ingredients,
+                          self._ingredients)
+            if self._lot_compositions:
+                db.session.execute(db.insert(Composition), [
+                    dict(composition, composition_plat_id=self._plats[plat_nom],
+                         composition_ingredient_id=self._ingredients[ingredient_nom])
+                    for plat_nom, ingredient_nom, composition in self._lot_compositions
+                ])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        self.statistiques["plats"] += len(self._lot_plats)
+        self.statistiques["ingredients"] += len(self._lot_ingredients)
+        self.statistiques["compositions"] += len(self._lot_compositions)
+        self.statistiques["secondes"] = time.perf_counter() - self._debut
+        self._lot_plats, self._lot_ingredients, self._lot_compositions = [], [], []
+        if self.rapport:
+            self.rapport(self.statistiques)
+
+    def importer(self, lignes) -> dict:
+        """permet d'importer les lignes fournies par lire_csv() ou lire_jsonl().
+
+                Paramètres
+                ----------
+                lignes :
+                    itérable de tuples (informations sur le plat, informations sur l'ingrédient ou None).
+
+                Returns
+                -------
+                dict
+                    statistiques de l'import
+                """
+        self._debut = time.perf_counter()
+        self._charger()
+        for plat, ingredient in lignes:
+            self.statistiques["lignes"] += 1
+            if plat["plat_nom"] != self._plat_courant:
+                # Début d'un autre plat : le lot ne contient que des plats complets, il peut être écrit.
+                self._plat_courant = plat["plat_nom"]
+                if len(self._lot_compositions) + len(self._lot_plats) >= self.taille_lot:
+                    self._ecrire()
+            if not self._plat(plat):
+                self.statistiques["ignorees"] += 1
+                continue
+            if ingredient is None:
+                continue
+            if not self._ingredient(ingredient) or not ingredient["quantite"]:
+                self.statistiques["ignorees"] += 1
+                continue
+            valeur, unite = analyser_quantite(ingredient["quantite"])
+            self._lot_compositions.append((plat["plat_nom"], ingredient["ingredient_nom"], {
+                "quantite": ingredient["quantite"],
+                "quantite_valeur": valeur,
+                "quantite_unite": unite
+            }))
+        self._ecrire()
+        return self.statistiques
@@ -0,0 +1,154 @@
+from ..app import db
+from .donnees import Plat, Composition, Authorship, chargement_auteurs, chargement_composition_plat
+
+
+# Noms acceptés pour le type des plats dans fields[...] : celui de la demande et celui des ressources ("place").
+TYPES_PLAT = ("plat", "place")
+
+# Relations des plats qui peuvent être demandées dans fields[plat], en plus des attributs.
+RELATIONS_PLAT = ("editions", "composition")
+
+# Chemins acceptés par include ; un chemin inclut aussi les ressources intermédiaires (composition.ingredient
+# inclut la composition).
+INCLUSIONS = ("composition", "composition.ingredient", "editions", "editions.author")
+
+
+def lire_parametres(arguments) -> tuple:
+    """permet de lire les paramètres JSON:API fields[plat] (champs creux) et include (documents composés) d'une
+    requête sur les plats.
+
+            Paramètres
+            ----------
+            arguments :
+                paramètres de la requête (request.args ou dictionnaire).
+
+            Returns
+            -------
+            tuple
+                (True, (champs, inclusions)) : champs vaut None si fields[plat] est absent (tous les champs),
+                inclusions est un ensemble de chemins, éventuellement vide
+
+                (False, erreurs) si un champ ou un chemin n'est pas connu
+            """
+    erreurs = []
+    champs = None
+    for type_plat in TYPES_PLAT:
+        valeur = arguments.get("fields[{}]".format(type_plat), None)
+        if valeur is not None:
+            champs = {nom.strip() for nom in valeur.split(",") if nom.strip()}
+    if champs is not None:
+        for nom in sorted(champs - set(Plat.ATTRIBUTS_JSONAPI) - set(RELATIONS_PLAT)):
+            erreurs.append("Le champ {} n'existe pas".format(nom))
+
+    inclusions = set()
+    for chemin in (arguments.get("include", None) or "").split(","):
+        chemin = chemin.strip()
+        if not chemin:
+            continue
+        if chemin not in INCLUSIONS:
+            erreurs.append("La relation {} ne peut pas être incluse".format(chemin))
+            continue
+        inclusions.add(chemin)
+        inclusions.add(chemin.split(".")[0])
+
+    if erreurs:
+        return False, erreurs
+    return True, (champs, inclusions)
+
+
+def parametres_a_reporter(arguments) -> dict:
+    """permet de retrouver les paramètres fields[...] et include d'une requête, pour les reporter dans les liens
+    vers les pages suivante et précédente.
+
+            Returns
+            -------
+            dict
+                paramètres à ajouter aux liens
+            """
+    return {
+        clef: arguments.get(clef)
+        for clef in arguments
+        if clef == "include" or (clef.startswith("fields[") and clef.endswith("]"))
+    }
+
+
+def options_plats(champs: set = None, inclusions: set = None) -> list:
+    """permet de choisir les stratégies de chargement d'une requête sur les plats d'après les champs demandés et
+    les relations incluses : seules les colonnes des attributs demandés sont lues (load_only), et les éditions ou
+    la composition ne sont chargées que si la réponse en a besoin.
+
+            Paramètres
+            ----------
+            champs :
+                champs demandés, renvoyés par lire_parametres() ; None pour tous les champs.
+
+            inclusions :
+                relations incluses, renvoyées par lire_parametres().
+
+            Returns
+            -------
+            list
+                stratégies de chargement à passer à Query.options()
+            """
+    inclusions = inclusions or set()
+    options = []
+    if champs is not None:
+        colonnes = [getattr(Plat, colonne) for nom, colonne in Plat.ATTRIBUTS_JSONAPI.items() if nom in champs]
+        options.append(db.load_only(*colonnes or [Plat.plat_id]))
+
+    if "editions" in inclusions:
+        chargement = db.selectinload(Plat.authorships)
+        options.append(chargement.joinedload(Authorship.user) if "editions.author" in inclusions else chargement)
+    elif champs is None or "editions" in champs:
+        options.append(chargement_auteurs())
+
+    if "composition" in inclusions:
+        chargement = db.selectinload(Plat.composition)
+        options.append(chargement.joinedload(Composition.composition_ingredient)
+                       if "composition.ingredient" in inclusions else chargement)
+    elif champs is not None and "composition" in champs:
+        options.append(chargement_composition_plat())
+    return options
+
+
+def inclure(plats: list, inclusions: set = None) -> list:
+    """permet de construire le tableau "included" d'un document composé : chaque ressource liée n'y figure qu'une
+    fois, même si elle est liée à plusieurs plats (un ingrédient commun, un même auteur).
+
+            Paramètres
+            ----------
+            plats :
+                plats du document, chargés avec options_plats().
+
+            inclusions :
+                relations incluses, renvoyées par lire_parametres().
+
+            Returns
+            -------
+            list
+                ressources incluses, dans l'ordre où elles sont rencontrées
+            """
+    inclusions = inclusions or set()
+    ressources = {}
+
+    def ajouter(type_ressource, identifiant, description):
+        if (type_ressource, identifiant) not in ressources:
+            ressources[(type_ressource, identifiant)] = description()
+
+    for plat in plats:
+        if "composition" in inclusions:
+            for element in plat.composition:
+                ajouter("composition", element.composition_id, element.to_jsonapi_dict)
+                if "composition.ingredient" in inclusions and element.composition_ingredient is not None:
+                    ajouter("ingredient", element.composition_ingredient_id,
+                            element.composition_ingredient.to_jsonapi_dict)
+        if "editions" in inclusions:
+            for author in plat.authorships:
+                ajouter("edition", author.authorship_id, author.to_jsonapi_dict)
+                if "editions.author" in inclusions and author.user is not None:
+                    ajouter("people", author.authorship_user_id, lambda: {
+                        "type": "people",
+                        "id": author.authorship_user_id,
+                        "attributes": author.user.to_jsonapi_dict()["attributes"]
+                    })
+    return list(ressources.values())
@@ -0,0 +1,124 @@
+import string
+import unicodedata
+
+from ..app import db
+from ..constantes import LISTE_PAR_LOT
+
+
+LETTRES = list(string.ascii_uppercase)
+
+# Initiale des noms qui ne commencent pas par une lettre de A à Z (chiffres, ponctuation, lettres d'autres alphabets).
+AUTRES = "#"
+
+# Ligatures que la décomposition NFKD ne sépare pas, mais que l'on range avec leur première lettre ("Œuf" à O).
+LIGATURES = {"Æ": "A", "æ": "A", "Œ": "O", "œ": "O"}
+
+
+def _initiale(caractere: str) -> str:
+    """permet de trouver la lettre de A à Z sous laquelle ranger un nom qui commence par un caractère.
+    """
+    if caractere in LIGATURES:
+        return LIGATURES[caractere]
+    base = unicodedata.normalize("NFKD", caractere)[:1].upper()
+    return base if base in LETTRES else AUTRES
+
+
+def _intervalles(caracteres: list) -> list:
+    """permet de regrouper des caractères en intervalles de points de code consécutifs [début, fin[.
+    """
+    intervalles = []
+    for caractere in sorted(caracteres):
+        if intervalles and ord(intervalles[-1][1]) == ord(caractere):
+            intervalles[-1] = (intervalles[-1][0], chr(ord(caractere) + 1))
+        else:
+            intervalles.append((caractere, chr(ord(caractere) + 1)))
+    return intervalles
+
+
+def _construire_tranches() -> dict:
+    """permet de calculer, pour chaque lettre, les intervalles de noms (en ordre binaire, celui de l'index sur la
+    colonne du nom) qui commencent par cette lettre en majuscule, en minuscule ou accentuée. Les noms rangés sous
+    AUTRES occupent les intervalles restants ; None signifie qu'il n'y a pas de borne. Seuls les alphabets latins
+    d'Europe de l'Ouest et centrale (jusqu'à U+017F) sont rapprochés de A à Z.
+    """
+    initiales = {}
+    for point in range(ord("A"), 0x180):
+        lettre = _initiale(chr(point))
+        if lettre != AUTRES:
+            initiales.setdefault(lettre, []).append(chr(point))
+    tranches = {lettre: _intervalles(caracteres) for lettre, caracteres in initiales.items()}
+
+    autres, debut = [], None
+    lettres = sorted(intervalle for intervalles in tranches.values() for intervalle in intervalles)
+    for borne_basse, borne_haute in lettres:
+        if debut is None or debut < borne_basse:
+            autres.append((debut, borne_basse))
+        debut = borne_haute
+    autres.append((debut, None))
+    tranches[AUTRES] = autres
+    return tranches
+
+
+TRANCHES = _construire_tranches()
+
+
+def lire_lettre(valeur: str) -> str:
+    """permet de lire la lettre demandée dans les paramètres de la requête.
+
+            Paramètres
+            ----------
+            valeur :
+                valeur du paramètre lettre de la requête.
+
+            Returns
+            -------
+            str
+                une lettre de A à Z, AUTRES, ou None si aucune lettre valide n'a été demandée (liste complète)
+            """
+    valeur = (valeur or "").strip().upper()
+    return valeur if valeur in TRANCHES else None
+
+
+def _conditions(colonne, lettre: str) -> list:
+    """permet de traduire une lettre en conditions sur la colonne du nom, une par intervalle.
+    """
+    if lettre is None:
+        return [None]
+    conditions = []
+    for debut, fin in TRANCHES[lettre]:
+        bornes = []
+        if debut is not None:
+            bornes.append(colonne >= debut)
+        if fin is not None:
+            bornes.append(colonne < fin)
+        conditions.append(db.and_(*bornes))
+    return conditions
+
+
+def lister(colonnes: list, colonne_nom, lettre: str = None):
+    """permet de lire, par ordre alphabétique et par lots (yield_per), les lignes d'une table, éventuellement
+    limitées aux noms qui commencent par une lettre. Chaque intervalle de la lettre est lu par sa propre requête,
+    dans l'ordre de l'index sur la colonne du nom : les premières lignes arrivent sans attendre les suivantes, et
+    les intervalles mis bout à bout gardent l'ordre d'un seul ORDER BY.
+
+            Paramètres
+            ----------
+            colonnes :
+                colonnes à lire, par exemple [Plat.plat_id, Plat.plat_nom].
+
+            colonne_nom :
+                colonne du nom, couverte par un index, qui sert à trier et à découper par lettre.
+
+            lettre :
+                lettre renvoyée par lire_lettre(), ou None pour toutes les lignes.
+
+            Returns
+            -------
+            generator
+                lignes de la table, dont les colonnes sont accessibles par leur nom
+            """
+    for condition in _conditions(colonne_nom, lettre):
+        requete = db.select(*colonnes)
+        if condition is not None:
+            requete = requete.filter(condition)
+        yield from db.session.execute(requete.order_by(colonne_nom).execution_options(yield_per=LISTE_PAR_LOT))
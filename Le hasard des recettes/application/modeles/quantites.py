@@ -0,0 +1,114 @@
+import re
+
+
+# Unités reconnues : motif, unité normalisée et facteur de conversion vers cette unité. Les masses sont ramenées
+# en grammes et les volumes en millilitres pour pouvoir être additionnés ; l'ordre compte ("kg" avant "g",
+# "cuillère à soupe" avant "cuillère"). Tout autre texte après le nombre ("1 filet", "1 tour de moulin") est gardé
+# tel quel comme unité : ces quantités ne sont additionnées qu'entre elles, jamais avec un nombre de pièces.
+UNITES = [
+    (r"kg|kilos?|kilogrammes?", "g", 1000),
+    (r"mg|milligrammes?", "g", 0.001),
+    (r"g|gr|grammes?", "g", 1),
+    (r"ml|millilitres?", "ml", 1),
+    (r"cl|centilitres?", "ml", 10),
+    (r"dl|décilitres?", "ml", 100),
+    (r"l|litres?", "ml", 1000),
+    (r"cuill[eè]res? à soupe|c\.? ?à ?s\.?|cas", "cuillère à soupe", 1),
+    (r"cuill[eè]res? à café|c\.? ?à ?c\.?|cac", "cuillère à café", 1),
+    (r"cuill[eè]res?", "cuillère", 1),
+    (r"pinc[ée]es?", "pincée", 1),
+    (r"gouttes?", "goutte", 1),
+    (r"poign[ée]es?", "poignée", 1),
+    (r"tranches?", "tranche", 1),
+    (r"rondelles?", "rondelle", 1),
+    (r"morceaux|morceau", "morceau", 1),
+    (r"gousses?", "gousse", 1),
+    (r"feuilles?", "feuille", 1),
+    (r"branches?", "branche", 1),
+    (r"brins?", "brin", 1),
+    (r"tiges?", "tige", 1),
+    (r"bottes?", "botte", 1),
+    (r"bouquets?", "bouquet", 1),
+    (r"zestes?", "zeste", 1),
+    (r"noix", "noix", 1),
+    (r"sachets?", "sachet", 1),
+    (r"paquets?", "paquet", 1),
+    (r"bo[iî]tes?", "boîte", 1),
+    (r"pots?", "pot", 1),
+    (r"verres?", "verre", 1),
+    (r"tasses?", "tasse", 1),
+    (r"bols?", "bol", 1)
+]
+
+_UNITES = [(re.compile(r"(?:{})(?=[\s.,;)]|$)".format(motif), re.IGNORECASE), unite, facteur)
+           for motif, unite, facteur in UNITES]
+
+# Unité enregistrée pour une quantité analysée sans succès, pour qu'elle ne soit pas analysée à nouveau à chaque
+# remplissage (une quantité pas encore analysée a une valeur et une unité NULL).
+NON_QUANTIFIABLE = "?"
+
+# Longueur de la colonne quantite_unite : un texte plus long après le nombre n'est pas gardé comme unité.
+UNITE_LONGUEUR_MAX = 40
+
+_NOMBRE = r"\d+(?:[.,]\d+)?"
+
+_QUANTITE = re.compile(
+    r"^\s*(?:(?P<entier>\d+)\s+(?P<numerateur>\d+)/(?P<denominateur>\d+)|(?P<fraction>\d+/\d+)|(?P<nombre>{nombre}))"
+    r"(?:\s*(?:à|-)\s*(?P<maximum>{nombre}))?\s*(?P<reste>.*)$".format(nombre=_NOMBRE)
+)
+
+def _valeur(texte: str) -> float:
+    if "/" in texte:
+        numerateur, denominateur = texte.split("/")
+        return int(numerateur) / int(denominateur) if int(denominateur) else None
+    return float(texte.replace(",", "."))
+
+
+def analyser_quantite(quantite: str) -> tuple:
+    """permet de transformer une quantité saisie librement ("1 kg", "1/2 cuillère à café", "6 morceaux") en une
+    valeur numérique et une unité normalisée. Les masses sont converties en grammes et les volumes en millilitres ;
+    pour un intervalle ("4 à 6"), la borne haute est gardée, puisqu'il s'agit de savoir quoi acheter.
+
+            Paramètres
+            ----------
+            quantite :
+                quantité telle qu'elle est enregistrée dans la composition d'un plat.
+
+            Returns
+            -------
+            tuple
+                (valeur, unité) ; l'unité est une chaîne vide pour un nombre de pièces ("3") et le texte qui suit le
+                nombre, en minuscules, s'il ne s'agit pas d'une unité connue ("1 filet"). La valeur est None, et
+                l'unité NON_QUANTIFIABLE, si la quantité ne commence pas par un nombre ("Selon la convenance") ou si
+                elle en contient plusieurs ("50 g et 1 cuillère à café")
+            """
+    correspondance = _QUANTITE.match(quantite or "")
+    if correspondance is None:
+        return None, NON_QUANTIFIABLE
+
+    if correspondance.group("entier"):
+        denominateur = int(correspondance.group("denominateur"))
+        if not denominateur:
+            return None, NON_QUANTIFIABLE
+        valeur = int(correspondance.group("entier")) + int(correspondance.group("numerateur")) / denominateur
+    else:
+        valeur = _valeur(correspondance.group("fraction") or correspondance.group("nombre"))
+    if correspondance.group("maximum"):
+        valeur = max(valeur or 0, _valeur(correspondance.group("maximum")))
+    if valeur is None:
+        return None, NON_QUANTIFIABLE
+
+    reste = correspondance.group("reste").strip()
+    # Quantité composée ("50 g et 1 cuillère à café", "1 kg 500") : en garder une partie serait faux.
+    if re.search(r"\d", reste):
+        return None, NON_QUANTIFIABLE
+    if not reste:
+        return valeur, ""
+    for motif, unite, facteur in _UNITES:
+        if motif.match(reste):
+            return valeur * facteur, unite
+    # Unité inconnue : gardée telle quelle, pour ne pas être additionnée à des pièces ou à une autre unité.
+    unite = " ".join(reste.lower().rstrip(".,;").split())
+    if not unite or len(unite) > UNITE_LONGUEUR_MAX:
+        return None, NON_QUANTIFIABLE
+    return valeur, unite
@@ -0,0 +1,170 @@
+import re
+
+from ..app import db
+from .donnees import Plat, Ingredient
+
+
+# Index plein texte des plats et des ingrédients, créés avec leurs déclencheurs par migrations/0005_recherche.sql.
+INDEX_PLEIN_TEXTE = ["plat_fts", "ingredient_fts"]
+
+# None tant que la présence des index n'a pas été vérifiée ; le résultat est ensuite gardé pour toute la durée du
+# processus, pour ne pas interroger sqlite_master à chaque recherche.
+_index_installes = None
+
+
+def index_disponible() -> bool:
+    """permet de savoir si les index plein texte sont en place. La vérification n'est faite qu'une fois par processus :
+    sans FTS5 ou sans la migration 0005, toutes les recherches se rabattent sur un LIKE.
+
+            Returns
+            -------
+            Booleen
+                indique si les index plein texte des plats et des ingrédients existent
+            """
+    global _index_installes
+    if _index_installes is None:
+        try:
+            existants = {ligne[0] for ligne in db.session.execute(
+                db.text("SELECT name FROM sqlite_master WHERE type = 'table'"))}
+        except Exception:
+            db.session.rollback()
+            return False
+        _index_installes = all(nom in existants for nom in INDEX_PLEIN_TEXTE)
+    return _index_installes
+
+
+def reconstruire_index() -> bool:
+    """permet de reconstruire les index plein texte des plats et des ingrédients à partir des données existantes.
+
+            Returns
+            -------
+            Booleen
+                indique si les index sont en place et ont été reconstruits
+            """
+    global _index_installes
+    _index_installes = None
+    if not index_disponible():
+        return False
+    try:
+        for nom in INDEX_PLEIN_TEXTE:
+            db.session.execute(db.text("INSERT INTO {nom}({nom}) VALUES ('rebuild')".format(nom=nom)))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        return False
+    return True
+
+
+def _expression(motclef: str) -> str:
+    """permet de transformer un mot-clef saisi par l'utilisateur en expression de recherche FTS5 : chaque mot est
+    cherché comme préfixe, et tous les mots doivent être présents.
+
+            Paramètres
+            ----------
+            motclef :
+                mot-clef saisi par l'utilisateur.
+
+            Returns
+            -------
+            str
+                expression FTS5, vide si le mot-clef ne contient aucun mot
+            """
+    return " ".join('"{}"*'.format(mot) for mot in re.findall(r"\w+", motclef))
+
+
+def _correspondances(nom: str, motclef: str):
+    """permet de construire la sous-requête des lignes d'un index plein texte qui correspondent à un mot-clef, avec
+    leur score de pertinence (bm25).
+
+            Returns
+            -------
+            Subquery
+                sous-requête (id, score)
+
+            None
+                si le mot-clef ne contient aucun mot
+            """
+    expression = _expression(motclef)
+    if not expression:
+        return None
+    return db.text(
+        "SELECT rowid AS id, bm25({nom}) AS score FROM {nom} WHERE {nom} MATCH :expression".format(nom=nom)
+    ).bindparams(expression=expression).columns(id=db.Integer, score=db.Float).subquery()
+
+
+def _rechercher(modele, nom: str, colonne_id, colonne_nom, motclef: str):
+    """permet de chercher un mot-clef dans un index plein texte et de classer les résultats par pertinence (bm25).
+    Si les index ne sont pas en place, la recherche se rabat sur un LIKE.
+
+            Returns
+            -------
+            Query
+                requête sur le modèle, classée par pertinence, que l'on peut paginer
+            """
+    if not index_disponible():
+        return modele.query.filter(colonne_nom.like("%{}%".format(motclef))).order_by(colonne_nom)
+
+    correspondances = _correspondances(nom, motclef)
+    if correspondances is None:
+        return modele.query.filter(db.false())
+
+    return modele.query.join(correspondances, colonne_id == correspondances.c.id)\
+        .order_by(correspondances.c.score, colonne_nom)
+
+
+def rechercher_plats(motclef: str):
+    """permet de chercher des plats par leur nom.
+
+            Paramètres
+            ----------
+            motclef :
+                récupère le mot-clef qui a été récupéré au préalable dans ./routes/generic.py ou ./routes/api.py.
+
+            Returns
+            -------
+            Query
+                requête sur les plats, classée par pertinence
+            """
+    return _rechercher(Plat, "plat_fts", Plat.plat_id, Plat.plat_nom, motclef)
+
+
+def rechercher_ingredients(motclef: str):
+    """permet de chercher des ingrédients par leur nom.
+
+            Paramètres
+            ----------
+            motclef :
+                récupère le mot-clef qui a été récupéré au préalable dans ./routes/generic.py.
+
+            Returns
+            -------
+            Query
+                requête sur les ingrédients, classée par pertinence
+            """
+    return _rechercher(Ingredient, "ingredient_fts", Ingredient.ingredient_id, Ingredient.ingredient_nom, motclef)
+
+
+def selection_plats(motclef: str):
+    """permet de chercher des plats par leur nom sous la forme d'un select(), exécutable par une session asynchrone.
+    index_disponible() utilise la session synchrone : elle doit avoir été appelée au préalable, hors de la boucle
+    d'événements, sinon la recherche se rabat sur un LIKE.
+
+            Paramètres
+            ----------
+            motclef :
+                récupère le mot-clef qui a été récupéré au préalable dans ./asgi.py.
+
+            Returns
+            -------
+            Select
+                sélection des plats, classée par pertinence
+            """
+    if not _index_installes:
+        return db.select(Plat).filter(Plat.plat_nom.like("%{}%".format(motclef))).order_by(Plat.plat_nom)
+
+    correspondances = _correspondances("plat_fts", motclef)
+    if correspondances is None:
+        return db.select(Plat).filter(db.false())
+
+    return db.select(Plat).join(correspondances, Plat.plat_id == correspondances.c.id)\
+        .order_by(correspondances.c.score, Plat.plat_nom)
@@ -0,0 +1,296 @@
+import logging
+import threading
+import time
+
+import numpy
+
+from ..app import app, db
+from ..constantes import SIMILAIRES_PERMUTATIONS, SIMILAIRES_BANDES, INDEX_DUREE
+from .donnees import Plat, Composition
+from .cuisinables import index_composition
+from .evenements import abonner, COMPOSITION_AJOUTEE, PLAT_SUPPRIME
+
+
+# Nombre premier de Mersenne 2^31 - 1 : les hachages (a * x + b) mod P restent sous 2^62 et tiennent en int64.
+PREMIER = 2 ** 31 - 1
+
+LIGNES_PAR_LOT = 50000
+
+journal = logging.getLogger("application.similaires")
+
+
+class IndexSimilarites:
+    """
+        C'est une classe qui garde en mémoire une signature MinHash de l'ensemble des ingrédients de chaque plat, et
+        un index LSH ("locality-sensitive hashing") par bandes de ces signatures, pour trouver les plats dont la
+        composition ressemble à celle d'un plat sans les comparer tous deux à deux.
+        ...
+
+        Deux plats dont les ensembles d'ingrédients ont une similarité de Jaccard s partagent chaque valeur de leur
+        signature avec une probabilité s ; ils tombent dans le même seau d'au moins une bande avec une probabilité
+        1 - (1 - s^r)^b (b bandes de r valeurs). Les candidats ainsi trouvés sont ensuite classés par leur
+        similarité de Jaccard exacte.
+
+        Les signatures sont calculées au démarrage de l'application (construire(), appelé par run.py), en lisant
+        la composition en flux et par lots (yield_per) : la mémoire utilisée dépend du nombre de plats, pas du
+        nombre de lignes de composition. Si l'index n'est pas prêt au moment d'une requête, sa construction est
+        lancée en arrière-plan (preparer()) et la requête n'attend pas. Il est ensuite mis à jour par les événements
+        publiés par Composition.ajout_compo, Composition.ajout_bulk et Plat.supprimer : la signature d'un ensemble
+        agrandi est le minimum, valeur par valeur, de l'ancienne signature et de celle des ajouts. Pour rattraper les
+        écritures des autres processus, l'index est reconstruit en arrière-plan INDEX_DUREE secondes après sa
+        construction ; l'ancien répond aux requêtes jusqu'à ce que le nouveau le remplace.
+
+        Méthodes
+        -------
+        construire()
+            permet de calculer les signatures de tous les plats.
+
+        preparer()
+            permet de lancer la construction en arrière-plan si l'index n'est pas prêt.
+
+        similaires(plat_id, limite)
+            permet de trouver les plats dont la composition ressemble le plus à celle d'un plat.
+        """
+
+    def __init__(self, permutations: int = SIMILAIRES_PERMUTATIONS, bandes: int = SIMILAIRES_BANDES,
+                 graine: int = 1):
+        if permutations % bandes:
+            raise ValueError("Le nombre de permutations doit être un multiple du nombre de bandes")
+        hasard = numpy.random.default_rng(graine)
+        self._a = hasard.integers(1, PREMIER, size=(permutations, 1), dtype=numpy.int64)
+        self._b = hasard.integers(0, PREMIER, size=(permutations, 1), dtype=numpy.int64)
+        self.bandes = bandes
+        self.lignes = permutations // bandes
+        self._signatures = None
+        self._seaux = None
+        self._verrou = threading.RLock()
+        self._construction = None
+        self._en_attente = None
+        self._expiration = 0
+
+    def _hacher(self, ingredients) -> numpy.ndarray:
+        """permet de calculer les valeurs de hachage d'un tableau d'id d'ingrédients pour chaque permutation.
+
+                Returns
+                -------
+                numpy.ndarray
+                    tableau (permutations, nombre d'ingrédients)
+                """
+        return (self._a * numpy.asarray(ingredients, dtype=numpy.int64)[numpy.newaxis, :] + self._b) % PREMIER
+
+    def _clefs(self, signature: numpy.ndarray) -> list:
+        """permet de découper une signature en bandes, chaque bande servant de clef de seau.
+        """
+        return [signature[bande * self.lignes:(bande + 1) * self.lignes].tobytes() for bande in range(self.bandes)]
+
+    def _ranger(self, plat_id: int, signature: numpy.ndarray, signatures: dict = None, seaux: list = None):
+        signatures = self._signatures if signatures is None else signatures
+        seaux_bandes = self._seaux if seaux is None else seaux
+        signatures[plat_id] = signature
+        for seaux, clef in zip(seaux_bandes, self._clefs(signature)):
+            seaux.setdefault(clef, set()).add(plat_id)
+
+    def _deranger(self, plat_id: int):
+        signature = self._signatures.pop(plat_id, None)
+        if signature is None:
+            return
+        for seaux, clef in zip(self._seaux, self._clefs(signature)):
+            seau = seaux.get(clef)
+            if seau is not None:
+                seau.discard(plat_id)
+                if not seau:
+                    del seaux[clef]
+
+    def _signer(self, lignes: list, signatures: dict, seaux: list):
+        """permet de calculer les signatures d'un lot de lignes de composition, triées par plat et contenant des
+        plats entiers : la matrice des hachages (permutations x lignes) est réduite par plat avec
+        numpy.minimum.reduceat.
+        """
+        if not lignes:
+            return
+        plats = numpy.fromiter((ligne[0] for ligne in lignes), dtype=numpy.int64, count=len(lignes))
+        ingredients = numpy.fromiter((ligne[1] for ligne in lignes), dtype=numpy.int64, count=len(lignes))
+        debuts = numpy.flatnonzero(numpy.r_[True, plats[1:] != plats[:-1]])
+        minimums = numpy.minimum.reduceat(self._hacher(ingredients), debuts, axis=1).astype(numpy.uint32)
+        for colonne, plat_id in enumerate(plats[debuts].tolist()):
+            self._ranger(plat_id, numpy.ascontiguousarray(minimums[:, colonne]), signatures, seaux)
+
+    def construire(self):
+        """permet de calculer les signatures de tous les plats. La composition est lue en flux, triée par plat
+        (index ix_composition_plat), par lots de LIGNES_PAR_LOT lignes ; les lignes du dernier plat d'un lot sont
+        gardées pour le lot suivant, pour qu'aucune composition ne soit coupée. Une ligne en double ne change pas
+        le minimum : la requête n'a pas besoin de DISTINCT. Les événements reçus pendant la construction sont
+        appliqués à la fin.
+        """
+        with self._verrou:
+            self._en_attente = []
+        signatures, seaux = {}, [{} for _ in range(self.bandes)]
+        try:
+            resultat = db.session.execute(
+                db.select(Composition.composition_plat_id, Composition.composition_ingredient_id)
+                .filter(Composition.composition_plat_id.is_not(None),
+                        Composition.composition_ingredient_id.is_not(None))
+                .order_by(Composition.composition_plat_id)
+                .execution_options(yield_per=LIGNES_PAR_LOT)
+            )
+            reste = []
+            for lot in resultat.partitions():
+                lignes = reste + lot
+                coupure = len(lignes) - 1
+                while coupure > 0 and lignes[coupure - 1][0] == lignes[-1][0]:
+                    coupure -= 1
+                self._signer(lignes[:coupure], signatures, seaux)
+                reste = lignes[coupure:]
+            self._signer(reste, signatures, seaux)
+        except Exception:
+            with self._verrou:
+                self._en_attente = None
+            raise
+
+        with self._verrou:
+            self._signatures, self._seaux = signatures, seaux
+            self._expiration = time.monotonic() + INDEX_DUREE
+            en_attente, self._en_attente = self._en_attente, None
+            for methode, arguments in en_attente:
+                methode(**arguments)
+
+    def _construire_en_arriere_plan(self):
+        with app.app_context():
+            try:
+                self.construire()
+            except Exception:
+                journal.exception("La construction de l'index des plats similaires a échoué")
+                with self._verrou:
+                    self._expiration = time.monotonic() + INDEX_DUREE
+            finally:
+                self._construction = None
+
+    def preparer(self) -> bool:
+        """permet de lancer en arrière-plan la construction de l'index, s'il n'est pas prêt ou s'il est périmé, et
+        qu'elle n'est pas déjà en cours.
+
+                Returns
+                -------
+                Booleen
+                    indique si l'index est prêt ; un index périmé reste prêt pendant sa reconstruction
+                """
+        with self._verrou:
+            pret = self._signatures is not None
+            if (not pret or time.monotonic() >= self._expiration) and self._construction is None:
+                self._construction = threading.Thread(target=self._construire_en_arriere_plan, daemon=True,
+                                                      name="index-similarites")
+                self._construction.start()
+        return pret
+
+    def ajouter(self, plat_id: int, ingredients: list, **autres):
+        """permet de mettre à jour la signature d'un plat dont la composition vient d'être complétée.
+        """
+        with self._verrou:
+            if self._en_attente is not None:
+                self._en_attente.append((self.ajouter, {"plat_id": plat_id, "ingredients": ingredients}))
+            if self._signatures is None or not ingredients:
+                return
+            signature = self._hacher(ingredients).min(axis=1).astype(numpy.uint32)
+            ancienne = self._signatures.get(plat_id)
+            if ancienne is not None:
+                signature = numpy.minimum(ancienne, signature)
+                if numpy.array_equal(signature, ancienne):
+                    return
+                self._deranger(plat_id)
+            self._ranger(plat_id, signature)
+
+    def retirer(self, plat_id: int, **autres):
+        """permet de retirer de l'index un plat qui vient d'être supprimé.
+        """
+        with self._verrou:
+            if self._en_attente is not None:
+                self._en_attente.append((self.retirer, {"plat_id": plat_id}))
+            if self._signatures is not None:
+                self._deranger(plat_id)
+
+    def invalider(self, **autres):
+        """permet de forcer le recalcul des signatures.
+        """
+        with self._verrou:
+            self._signatures = None
+            self._seaux = None
+
+    def similaires(self, plat_id: int, limite: int = 10) -> list:
+        """permet de trouver les plats dont la composition ressemble le plus à celle d'un plat.
+
+                Paramètres
+                ----------
+                plat_id :
+                    id du plat de référence.
+
+                limite :
+                    nombre maximal de plats renvoyés.
+
+                Returns
+                -------
+                list
+                    tuples (id du plat, similarité de Jaccard entre 0 et 1), du plus semblable au moins semblable
+
+                None
+                    si l'index n'est pas encore prêt (sa construction est alors lancée en arrière-plan)
+                """
+        if not self.preparer():
+            return None
+        with self._verrou:
+            signature = self._signatures.get(plat_id)
+            if signature is None:
+                return []
+            candidats = set()
+            for seaux, clef in zip(self._seaux, self._clefs(signature)):
+                candidats.update(seaux.get(clef, ()))
+        candidats.discard(plat_id)
+
+        reference = index_composition.ingredients(plat_id)
+        resultats = []
+        for candidat in candidats:
+            composition = index_composition.ingredients(candidat)
+            union = len(reference | composition)
+            if union:
+                resultats.append((candidat, len(reference & composition) / union))
+        resultats.sort(key=lambda resultat: (-resultat[1], resultat[0]))
+        return resultats[:limite]
+
+
+index_similarites = IndexSimilarites()
+abonner(COMPOSITION_AJOUTEE, index_similarites.ajouter)
+abonner(PLAT_SUPPRIME, index_similarites.retirer)
+
+
+def plats_similaires(plat_id: int, limite: int = 10, options: list = None) -> list:
+    """permet de trouver les plats dont la composition ressemble le plus à celle d'un plat.
+
+            Paramètres
+            ----------
+            plat_id, limite :
+                voir IndexSimilarites.similaires().
+
+            options :
+                stratégies de chargement à appliquer à la requête des plats.
+
+            Returns
+            -------
+            list
+                tuples (plat, similarité de Jaccard), du plus semblable au moins semblable
+
+            None
+                si l'index n'est pas encore prêt
+            """
+    resultats = index_similarites.similaires(plat_id, limite)
+    if not resultats:
+        return resultats
+    plats = {plat.plat_id: plat for plat in Plat.query.options(*(options or []))
+             .filter(Plat.plat_id.in_([resultat[0] for resultat in resultats]))}
+    return [(plats[identifiant], similarite) for identifiant, similarite in resultats if identifiant in plats]
+
+
+def construire_index_similarites():
+    """permet de construire au démarrage de l'application l'index des plats similaires et l'index de la composition
+    qu'il utilise, pour que les premières requêtes n'aient pas à les attendre.
+    """
+    index_composition.preparer()
+    index_similarites.construire()
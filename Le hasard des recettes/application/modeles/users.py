@@ -1,7 +1,12 @@
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import make_transient_to_detached
+import threading
+import time
 
 from ..app import db, login
+from ..constantes import UTILISATEUR_CACHE_DUREE
+from ..hachage import hacher, verifier, HachageSurcharge
 
 
 class User(UserMixin, db.Model):
@@ -22,6 +27,10 @@ class User(UserMixin, db.Model):
         creer(log, nom, prenom, email, motdepasse)
             permet de créer un nouvel utilisateur sur l'application
         """
+    __table_args__ = (
+        db.Index("ux_user_login", "user_login", unique=True),
+        db.Index("ux_user_email", "user_email", unique=True)
+    )
     user_id = db.Column(db.Integer, unique=True, nullable=False, primary_key=True, autoincrement=True)
     user_nom = db.Column(db.Text, nullable=False)
     user_prenom = db.Column(db.String, nullable=False)
@@ -53,7 +62,7 @@ class User(UserMixin, db.Model):
                     correspondant aux informations sur l'utilisateur qui ont été récupérées
                 """
         utilisateur = User.query.filter(User.user_login == log).first()
-        if utilisateur and check_password_hash(utilisateur.user_password, motdepasse):
+        if utilisateur and verifier(utilisateur.user_password, motdepasse):
             return utilisateur
         return None
 
@@ -100,54 +109,82 @@ class User(UserMixin, db.Model):
         if not motdepasse:
             erreurs.append("Le mot de passe est manquant")
 
-        uniques = User.query.filter(db.or_(User.user_email == email, User.user_login == log)).count()
-        if uniques > 0:
-            erreurs.append("L'email et/ou le login sont déjà inscrits dans notre base de données.")
-
         if len(erreurs) > 0:
             return False, erreurs
 
+        try:
+            empreinte = hacher(motdepasse)
+        except HachageSurcharge as erreur:
+            return False, [str(erreur)]
+
         utilisateur = User(
             user_nom=nom,
             user_prenom=prenom,
             user_login=log,
             user_email=email,
-            user_password=generate_password_hash(motdepasse)
+            user_password=empreinte
         )
 
         try:
             db.session.add(utilisateur)
             db.session.commit()
             return True, utilisateur
+        except IntegrityError:
+            db.session.rollback()
+            return False, ["L'email et/ou le login sont déjà inscrits dans notre base de données."]
         except Exception as erreur:
+            db.session.rollback()
             return False, [str(erreur)]
 
+    def get_id(self) -> int:
+        """permet de récupérer un id d'utilisateur.
+
+                Returns
+                -------
+                Int :
+                    id de l'utilisateur en cours
+                """
+        return self.user_id
 
-def get_id(self) -> int:
-    """permet de récupérer un id d'utilisateur.
+    def to_jsonapi_dict(self):
+        """permet de récupérer des informations sur l'utilisateur en cours.
 
-            Returns
-            -------
-            Int :
-                id de l'utilisateur en cours
-       """
-    return self.user_id
+                Returns
+                -------
+                json :
+                    informations sur l'utilisateur en cours
+                """
+        return {
+            "type": "people",
+            "attributes": {
+                "name": self.user_nom
+            }
+        }
 
 
-def to_jsonapi_dict(self):
-    """permet de récupérer des informations sur l'utilisateur en cours.
+# Cache des utilisateurs connectés : le chargeur de flask_login est appelé à chaque requête authentifiée. On garde
+# pendant UTILISATEUR_CACHE_DUREE secondes les valeurs des colonnes de chaque utilisateur, et l'on reconstruit
+# l'objet dans la session en cours sans requête SQL. Toute modification ou suppression d'un utilisateur l'en retire.
+_utilisateurs = {}
+_verrou_utilisateurs = threading.Lock()
 
-            Returns
-            -------
-            json :
-                informations sur l'utilisateur en cours
-           """
-    return {
-        "type": "people",
-        "attributes": {
-            "name": self.user_nom
-        }
-    }
+
+def oublier_utilisateur(identifiant: int) -> None:
+    """permet de retirer un utilisateur du cache du chargeur de flask_login.
+
+            Paramètres
+            ----------
+            identifiant :
+                correspond à un id de User
+            """
+    with _verrou_utilisateurs:
+        _utilisateurs.pop(int(identifiant), None)
+
+
+@db.event.listens_for(User, "after_update")
+@db.event.listens_for(User, "after_delete")
+def _utilisateur_modifie(mapper, connexion, utilisateur):
+    oublier_utilisateur(utilisateur.user_id)
 
 
 @login.user_loader
@@ -164,4 +201,17 @@ def trouver_utilisateur_via_id(identifiant):
             Int :
                 id de l'utilisateur en cours
            """
-    return User.query.get(int(identifiant))
+    identifiant = int(identifiant)
+    with _verrou_utilisateurs:
+        entree = _utilisateurs.get(identifiant)
+    if entree is not None and time.time() < entree[0]:
+        utilisateur = User(**entree[1])
+        make_transient_to_detached(utilisateur)
+        return db.session.merge(utilisateur, load=False)
+
+    utilisateur = User.query.get(identifiant)
+    if utilisateur is not None:
+        valeurs = {colonne.key: getattr(utilisateur, colonne.key) for colonne in User.__table__.columns}
+        with _verrou_utilisateurs:
+            _utilisateurs[identifiant] = (time.time() + UTILISATEUR_CACHE_DUREE, valeurs)
+    return utilisateur
@@ -0,0 +1,46 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def installer_pragmas(pragmas: dict) -> None:
+    """permet d'appliquer des pragmas à chaque nouvelle connexion SQLite ouverte par SQLAlchemy.
+
+            Paramètres
+            ----------
+            pragmas :
+                dictionnaire nom du pragma -> valeur, par exemple {"journal_mode": "WAL"}.
+            """
+    @event.listens_for(Engine, "connect")
+    def appliquer_pragmas(connexion_dbapi, enregistrement):
+        # Les connexions aiosqlite (mode asynchrone, voir asgi.py) sont adaptées par SQLAlchemy en interface DBAPI.
+        module = type(connexion_dbapi).__module__
+        if module.split(".")[0] not in ("sqlite3", "pysqlite2") and not module.endswith("aiosqlite"):
+            return
+        curseur = connexion_dbapi.cursor()
+        try:
+            for nom, valeur in pragmas.items():
+                curseur.execute("PRAGMA {} = {}".format(nom, valeur))
+        finally:
+            curseur.close()
+
+
+def options_moteur(profil: dict) -> dict:
+    """permet de construire les options de create_engine() d'un profil.
+
+            Paramètres
+            ----------
+            profil :
+                profil du moteur, voir PROFILS_MOTEUR dans constantes.py.
+
+            Returns
+            -------
+            dict
+                options à placer dans SQLALCHEMY_ENGINE_OPTIONS
+            """
+    options = dict(profil.get("options", {}))
+    # Le délai d'attente du module sqlite3 (en secondes) est aligné sur busy_timeout (en millisecondes).
+    options["connect_args"] = {
+        "timeout": profil.get("pragmas", {}).get("busy_timeout", 5000) / 1000,
+        "check_same_thread": False
+    }
+    return options
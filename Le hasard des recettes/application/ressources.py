@@ -0,0 +1,190 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+import brotli
+from flask import request, send_from_directory
+import rcssmin
+import rjsmin
+
+from .app import app
+from .constantes import RESSOURCES_DOSSIER, RESSOURCES_DUREE
+
+
+MANIFESTE = "manifeste.json"
+
+# Fonctions de minification par extension ; les autres fichiers (images) sont seulement recopiés.
+MINIFICATIONS = {
+    ".css": rcssmin.cssmin,
+    ".js": rjsmin.jsmin
+}
+
+# Extensions des fichiers dont on écrit aussi une version compressée ; les images le sont déjà.
+COMPRESSIBLES = {".css", ".js", ".svg", ".json", ".txt"}
+
+# Encodages proposés au navigateur, du plus efficace au moins efficace, avec l'extension du fichier correspondant.
+ENCODAGES = [("br", ".br"), ("gzip", ".gz")]
+
+
+def _sources(dossier: str):
+    """permet de parcourir les fichiers statiques d'origine, en laissant de côté le dossier des fichiers construits
+    et les fichiers Python.
+    """
+    for racine, dossiers, fichiers in os.walk(dossier):
+        dossiers[:] = sorted(nom for nom in dossiers if nom not in (RESSOURCES_DOSSIER, "__pycache__"))
+        for fichier in sorted(fichiers):
+            if not fichier.endswith((".py", ".pyc")):
+                chemin = os.path.join(racine, fichier)
+                yield os.path.relpath(chemin, dossier).replace(os.sep, "/"), chemin
+
+
+def construire(dossier: str = None, rapport=None) -> dict:
+    """permet de préparer les fichiers statiques pour la production : chaque fichier est minifié (CSS et JS), reçoit
+    dans son nom l'empreinte de son contenu (css/bootstrap.css devient css/bootstrap.1a2b3c4d5e6f.css) et, s'il
+    s'y prête, est accompagné de versions compressées .gz et .br. Les fichiers sont écrits dans le sous-dossier
+    RESSOURCES_DOSSIER, avec un manifeste qui fait correspondre les noms d'origine aux noms construits.
+
+            Paramètres
+            ----------
+            dossier :
+                dossier des fichiers statiques, par défaut celui de l'application.
+
+            rapport :
+                fonction appelée pour chaque fichier avec son nom d'origine, son nom construit et les tailles
+                (origine, minifié, gzip, brotli).
+
+            Returns
+            -------
+            dict
+                manifeste : nom d'origine -> nom construit
+            """
+    dossier = dossier or app.static_folder
+    sortie = os.path.join(dossier, RESSOURCES_DOSSIER)
+    manifeste = {}
+    for nom, chemin in _sources(dossier):
+        with open(chemin, "rb") as fichier:
+            contenu = fichier.read()
+        base, extension = os.path.splitext(nom)
+        minification = MINIFICATIONS.get(extension.lower())
+        construit = minification(contenu.decode("utf-8")).encode("utf-8") if minification else contenu
+
+        empreinte = hashlib.sha256(construit).hexdigest()[:12]
+        nom_construit = "{}.{}{}".format(base, empreinte, extension)
+        destination = os.path.join(sortie, nom_construit)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        tailles = [len(contenu), len(construit), None, None]
+        with open(destination, "wb") as fichier:
+            fichier.write(construit)
+        if extension.lower() in COMPRESSIBLES:
+            # mtime=0 : deux constructions du même contenu donnent des fichiers identiques.
+            compresse = gzip.compress(construit, compresslevel=9, mtime=0)
+            with open(destination + ".gz", "wb") as fichier:
+                fichier.write(compresse)
+            tailles[2] = len(compresse)
+            compresse = brotli.compress(construit, quality=11)
+            with open(destination + ".br", "wb") as fichier:
+                fichier.write(compresse)
+            tailles[3] = len(compresse)
+
+        manifeste[nom] = nom_construit
+        if rapport:
+            rapport(nom, nom_construit, tailles)
+
+    with open(os.path.join(sortie, MANIFESTE), "w", encoding="utf-8") as fichier:
+        json.dump(manifeste, fichier, indent=2, sort_keys=True)
+    ressources.charger(dossier)
+    return manifeste
+
+
+class Ressources:
+    """
+        C'est une classe qui garde en mémoire le manifeste des fichiers statiques construits par construire(), pour
+        que url_for("static", filename=...) renvoie vers les noms avec empreinte et que ces fichiers soient servis
+        compressés et avec une durée de cache très longue : leur nom changeant avec leur contenu, le navigateur n'a
+        jamais besoin de les redemander.
+        ...
+
+        Sans manifeste (fichiers non construits), les fichiers d'origine sont servis comme avant.
+
+        Méthodes
+        -------
+        charger(dossier)
+            permet de lire le manifeste.
+
+        servir(filename)
+            vue qui remplace celle des fichiers statiques de Flask.
+        """
+
+    def __init__(self):
+        self.manifeste = {}
+        self._construits = set()
+
+    def charger(self, dossier: str = None):
+        """permet de lire le manifeste des fichiers construits, s'il existe.
+        """
+        chemin = os.path.join(dossier or app.static_folder, RESSOURCES_DOSSIER, MANIFESTE)
+        try:
+            with open(chemin, encoding="utf-8") as fichier:
+                self.manifeste = json.load(fichier)
+        except (OSError, ValueError):
+            self.manifeste = {}
+        self._construits = {RESSOURCES_DOSSIER + "/" + nom for nom in self.manifeste.values()}
+
+    def adresse(self, endpoint: str, valeurs: dict):
+        """permet de remplacer, dans url_for("static", filename=...), le nom d'un fichier par son nom construit.
+        """
+        if endpoint == "static" and valeurs.get("filename") in self.manifeste:
+            valeurs["filename"] = RESSOURCES_DOSSIER + "/" + self.manifeste[valeurs["filename"]]
+
+    def servir(self, filename: str):
+        """permet de servir un fichier statique. Un fichier construit est envoyé dans la version compressée la plus
+        efficace acceptée par le navigateur (Accept-Encoding), avec un Cache-Control immuable.
+
+                Paramètres
+                ----------
+                filename :
+                    chemin du fichier dans le dossier des fichiers statiques.
+
+                Returns
+                -------
+                Response
+                    contenu du fichier
+                """
+        if filename not in self._construits:
+            return app.send_static_file(filename)
+
+        acceptes = request.accept_encodings
+        for encodage, suffixe in ENCODAGES:
+            if acceptes[encodage] and os.path.isfile(os.path.join(app.static_folder, filename + suffixe)):
+                response = send_from_directory(app.static_folder, filename + suffixe,
+                                               mimetype=_type_mime(filename), etag=True, conditional=True)
+                response.content_encoding = encodage
+                break
+        else:
+            response = send_from_directory(app.static_folder, filename, etag=True, conditional=True)
+        response.vary.add("Accept-Encoding")
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = RESSOURCES_DUREE
+        response.cache_control.immutable = True
+        return response
+
+
+def _type_mime(nom: str) -> str:
+    """permet de deviner le type MIME d'un fichier d'après son nom d'origine (sans .gz ni .br).
+    """
+    return mimetypes.guess_type(nom)[0] or "application/octet-stream"
+
+
+ressources = Ressources()
+
+
+def installer_ressources():
+    """permet de brancher les fichiers statiques construits sur l'application : url_for("static") renvoie vers les
+    noms avec empreinte, et la vue des fichiers statiques négocie leur encodage.
+    """
+    ressources.charger()
+    app.url_defaults(ressources.adresse)
+    app.view_functions["static"] = ressources.servir
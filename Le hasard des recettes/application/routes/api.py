@@ -1,9 +1,26 @@
-from flask import render_template, request, url_for, jsonify
+from flask import render_template, request, url_for, jsonify, Response, stream_with_context
+from flask_login import current_user
+from functools import wraps
 from urllib.parse import urlencode
+import base64
+import csv
+import io
+import json
 
-from ..app import app
-from ..constantes import PLAT_PAR_PAGE, API_ROUTE
-from ..modeles.donnees import Plat
+from ..app import app, db
+from ..constantes import PLAT_PAR_PAGE, PLAT_PAR_PAGE_MAX, PLAT_PAR_LOT_EXPORT, PLAT_PAR_SUPPRESSION_MAX, API_ROUTE, \
+    AUTOCOMPLETION_NOMBRE
+from ..modeles.donnees import Plat, Ingredient, Composition, chargement_auteurs, chargement_composition_plat
+from ..modeles.recherche import rechercher_plats
+from ..modeles.facettes import compter, ORDRE_TYPES_PLAT
+from ..modeles.importation import COLONNES_PLAT, COLONNES_INGREDIENT
+from ..modeles.hasard import plats_au_hasard
+from ..modeles.cuisinables import plats_cuisinables
+from ..modeles.courses import lire_menu, liste_courses
+from ..modeles.similaires import plats_similaires
+from ..modeles.autocompletion import index_noms
+from ..modeles.jsonapi import lire_parametres, parametres_a_reporter, options_plats, inclure
+from ..cache import cache_reponses, cache_fragments
 
 
 def json_404():
@@ -12,60 +29,758 @@ def json_404():
     return response
 
 
+def connexion_requise(route):
+    """décorateur qui réserve une route de l'API aux utilisateurs connectés. Les autres reçoivent une erreur 401 en
+    json, plutôt que la redirection vers la page de connexion de flask_login.login_required.
+
+            Paramètres
+            ----------
+            route :
+                route à protéger.
+
+            Returns
+            -------
+            function
+                route décorée
+            """
+    @wraps(route)
+    def route_protegee(*args, **kwargs):
+        if not current_user.is_authenticated:
+            response = jsonify({"erreur": "Vous devez être connecté(e) pour effectuer cette action"})
+            response.status_code = 401
+            return response
+        return route(*args, **kwargs)
+    return route_protegee
+
+
+def encoder_curseur(plat_id: int) -> str:
+    """permet de transformer l'id d'un plat en curseur opaque pour la pagination par curseur.
+
+            Paramètres
+            ----------
+            plat_id :
+                id du plat à partir duquel reprendre la lecture.
+
+            Returns
+            -------
+            str
+                curseur encodé en base64
+            """
+    return base64.urlsafe_b64encode(json.dumps({"plat_id": plat_id}).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decoder_curseur(curseur: str) -> int:
+    """permet de retrouver l'id d'un plat à partir d'un curseur opaque ou d'un id donné directement.
+
+            Paramètres
+            ----------
+            curseur :
+                curseur récupéré dans les paramètres after ou before de la requête.
+
+            Returns
+            -------
+            int
+                id du plat
+
+            None
+                si le curseur n'est pas valide
+            """
+    if curseur.isdigit():
+        return int(curseur)
+    try:
+        remplissage = "=" * (-len(curseur) % 4)
+        plat_id = json.loads(base64.urlsafe_b64decode(curseur + remplissage))["plat_id"]
+        return int(plat_id)
+    except Exception:
+        return None
+
+
+def exporter_ndjson(requete, gabarits):
+    """permet de produire, plat par plat, une ligne json par plat (NDJSON).
+
+            Paramètres
+            ----------
+            requete :
+                requête select des plats à exporter, exécutée au moment où l'on commence à envoyer la réponse.
+
+            gabarits :
+                gabarits des liens produits par Plat.gabarits_liens().
+
+            Returns
+            -------
+            generator
+                lignes json
+            """
+    for plat in db.session.scalars(requete):
+        yield json.dumps(plat.to_jsonapi_dict(gabarits=gabarits, composition=True), ensure_ascii=False,
+                         default=str) + "\n"
+
+
+def exporter_csv(requete):
+    """permet de produire, plat par plat, des lignes CSV : une ligne par ingrédient de chaque plat, avec les
+    colonnes acceptées par la commande "flask import", suivies des auteurs des éditions du plat.
+
+            Paramètres
+            ----------
+            requete :
+                requête select des plats à exporter, exécutée au moment où l'on commence à envoyer la réponse.
+
+            Returns
+            -------
+            generator
+                lignes CSV
+            """
+    tampon = io.StringIO()
+    ecrivain = csv.writer(tampon)
+    ecrivain.writerow(["plat_id"] + COLONNES_PLAT + COLONNES_INGREDIENT + ["editions"])
+    for plat in db.session.scalars(requete):
+        debut = [plat.plat_id, plat.plat_nom, plat.plat_recette, plat.plat_type, plat.plat_nombre_convives]
+        editions = "|".join(author.user.user_nom for author in plat.authorships if author.user)
+        for element in plat.composition or [None]:
+            if element is not None and element.composition_ingredient is not None:
+                ingredient = [element.composition_ingredient.ingredient_nom,
+                              element.composition_ingredient.ingredient_type, element.quantite]
+            else:
+                ingredient = ["", "", ""]
+            ecrivain.writerow(debut + ingredient + [editions])
+        yield tampon.getvalue()
+        tampon.seek(0)
+        tampon.truncate()
+
+
+def liens_pages(motclef: str, limite: int, page: int, suivante: bool, precedente: bool,
+                autres: dict = None) -> dict:
+    """permet de construire les liens vers les pages suivante et précédente de /api/plats.
+
+            Paramètres
+            ----------
+            motclef :
+                mot-clef de la recherche, à reporter dans les liens.
+
+            limite :
+                nombre de plats par page.
+
+            page :
+                numéro de la page courante.
+
+            suivante :
+                indique s'il existe une page suivante.
+
+            precedente :
+                indique s'il existe une page précédente.
+
+            autres :
+                autres paramètres à reporter dans les liens (fields[...], include).
+
+            Returns
+            -------
+            dict
+                liens "next" et "prev" existants
+            """
+    liens = {}
+    for lien, numero, actif in [("next", page + 1, suivante), ("prev", page - 1, precedente)]:
+        if actif:
+            arguments = {
+                "page": numero
+            }
+            if motclef:
+                arguments["q"] = motclef
+            if limite != PLAT_PAR_PAGE:
+                arguments["limit"] = limite
+            arguments.update(autres or {})
+            liens[lien] = url_for("api_plats_browse", _external=True)+"?"+urlencode(arguments)
+    return liens
+
+
+def liens_curseurs(motclef: str, limite: int, plats: list, suivante: bool, precedente: bool,
+                   autres: dict = None) -> dict:
+    """permet de construire les liens vers les pages suivante et précédente de /api/plats en pagination par curseur.
+
+            Paramètres
+            ----------
+            motclef :
+                mot-clef de la recherche, à reporter dans les liens.
+
+            limite :
+                nombre de plats par page.
+
+            plats :
+                plats de la page courante, dans l'ordre des id.
+
+            suivante :
+                indique s'il existe une page suivante.
+
+            precedente :
+                indique s'il existe une page précédente.
+
+            autres :
+                autres paramètres à reporter dans les liens (fields[...], include).
+
+            Returns
+            -------
+            dict
+                liens "next" et "prev" existants
+            """
+    liens = {}
+    for lien, parametre, actif, plat in [("next", "after", suivante, plats[-1] if plats else None),
+                                         ("prev", "before", precedente, plats[0] if plats else None)]:
+        if actif and plat is not None:
+            arguments = {
+                parametre: encoder_curseur(plat.plat_id),
+                "limit": limite
+            }
+            if motclef:
+                arguments["q"] = motclef
+            arguments.update(autres or {})
+            liens[lien] = url_for("api_plats_browse", _external=True)+"?"+urlencode(arguments)
+    return liens
+
+
+def lire_limite(limite: str) -> int:
+    """permet de lire le nombre de plats par page demandé, borné par PLAT_PAR_PAGE_MAX.
+
+            Paramètres
+            ----------
+            limite :
+                valeur du paramètre limit de la requête.
+
+            Returns
+            -------
+            int
+                nombre de plats par page
+            """
+    if isinstance(limite, str) and limite.isdigit() and int(limite) > 0:
+        return min(int(limite), PLAT_PAR_PAGE_MAX)
+    return PLAT_PAR_PAGE
+
+
+@app.route(API_ROUTE+"/plats/export")
+def api_plats_export():
+    """permet d'exporter en flux tous les plats, avec leur composition et leurs éditions, au format NDJSON
+    (par défaut) ou CSV. Les plats sont lus par lots (yield_per) : la mémoire utilisée ne dépend pas de la taille
+    de la table.
+
+            Returns
+            -------
+            Response
+                réponse envoyée au fur et à mesure de la lecture des plats
+            """
+    format_export = request.args.get("format", "ndjson")
+    if format_export not in ("ndjson", "csv"):
+        return json_404()
+
+    requete = db.select(Plat)\
+        .options(chargement_auteurs(), chargement_composition_plat())\
+        .order_by(Plat.plat_id)\
+        .execution_options(yield_per=PLAT_PAR_LOT_EXPORT)
+
+    if format_export == "csv":
+        response = Response(stream_with_context(exporter_csv(requete)), mimetype="text/csv")
+        response.headers["Content-Disposition"] = "attachment; filename=plats.csv"
+    else:
+        response = Response(stream_with_context(exporter_ndjson(requete, Plat.gabarits_liens())),
+                            mimetype="application/x-ndjson")
+    return response
+
+
+@app.route(API_ROUTE+"/plats/random")
+def api_plats_hasard():
+    """permet de tirer au hasard des plats, filtrés par type (type=), nombre de convives (convives=) et
+    ingrédients exclus (sans=, id séparés par des virgules ou paramètre répété).
+
+            Returns
+            -------
+            Response
+                json des plats tirés
+            """
+    nombre = request.args.get("n", "1")
+    nombre = min(int(nombre), PLAT_PAR_PAGE_MAX) if nombre.isdigit() else 1
+    convives = request.args.get("convives", "")
+    sans = [
+        int(identifiant)
+        for valeur in request.args.getlist("sans")
+        for identifiant in valeur.split(",")
+        if identifiant.strip().isdigit()
+    ]
+
+    plats = plats_au_hasard(
+        nombre=nombre,
+        typologie=request.args.get("type", None),
+        convives=int(convives) if convives.isdigit() else None,
+        sans=sans,
+        options=[chargement_auteurs()]
+    )
+    gabarits = Plat.gabarits_liens()
+    return jsonify({
+        "links": {
+            "self": request.url
+        },
+        "data": [
+            plat.to_jsonapi_dict(gabarits=gabarits)
+            for plat in plats
+        ]
+    })
+
+
+@app.route(API_ROUTE+"/plats/cuisinables")
+def api_plats_cuisinables():
+    """permet de trouver les plats que l'on peut cuisiner avec des ingrédients (ingredients=, id séparés par des
+    virgules), en acceptant éventuellement quelques ingrédients manquants (manquants=).
+
+            Returns
+            -------
+            Response
+                json des plats, du mieux couvert au moins bien couvert
+            """
+    ingredients = [
+        int(identifiant)
+        for valeur in request.args.getlist("ingredients")
+        for identifiant in valeur.split(",")
+        if identifiant.strip().isdigit()
+    ]
+    manquants = request.args.get("manquants", "0")
+    manquants = int(manquants) if manquants.isdigit() else 0
+    limite = request.args.get("limit", "")
+    limite = min(int(limite), PLAT_PAR_PAGE_MAX) if limite.isdigit() and int(limite) > 0 else PLAT_PAR_PAGE
+
+    gabarits = Plat.gabarits_liens()
+    donnees = []
+    for plat, couverture, absents in plats_cuisinables(ingredients, manquants, limite,
+                                                       options=[chargement_auteurs()]):
+        dictionnaire = plat.to_jsonapi_dict(gabarits=gabarits)
+        dictionnaire["meta"] = {
+            "couverture": round(couverture, 3),
+            "manquants": absents
+        }
+        donnees.append(dictionnaire)
+
+    return jsonify({
+        "links": {
+            "self": request.url
+        },
+        "data": donnees
+    })
+
+
+@app.route(API_ROUTE+"/plats/<int:plat_id>/similaires")
+def api_plats_similaires(plat_id):
+    """permet de trouver les plats dont la composition ressemble le plus à celle d'un plat, classés par similarité
+    de Jaccard de leurs ensembles d'ingrédients.
+
+            Returns
+            -------
+            Response
+                json des plats, du plus semblable au moins semblable
+            """
+    if not Plat.query.filter(Plat.plat_id == plat_id).count():
+        return json_404()
+    limite = request.args.get("limit", "")
+    limite = min(int(limite), PLAT_PAR_PAGE_MAX) if limite.isdigit() and int(limite) > 0 else PLAT_PAR_PAGE
+
+    similaires = plats_similaires(plat_id, limite, options=[chargement_auteurs()])
+    if similaires is None:
+        response = jsonify({"erreur": "L'index des plats similaires est en cours de construction"})
+        response.status_code = 503
+        response.headers["Retry-After"] = "5"
+        return response
+
+    gabarits = Plat.gabarits_liens()
+    donnees = []
+    for plat, similarite in similaires:
+        dictionnaire = plat.to_jsonapi_dict(gabarits=gabarits)
+        dictionnaire["meta"] = {
+            "jaccard": round(similarite, 3)
+        }
+        donnees.append(dictionnaire)
+
+    return jsonify({
+        "links": {
+            "self": request.url
+        },
+        "data": donnees
+    })
+
+
+@app.route(API_ROUTE+"/ingredients/autocomplete")
+def api_ingredients_autocomplete():
+    """permet de compléter un début de nom d'ingrédient : /api/ingredients/autocomplete?prefix=crem renvoie
+    "Crème fraîche" comme "Crème de marrons". Les accents et les majuscules sont ignorés, et le préfixe peut
+    commencer n'importe quel mot du nom.
+
+            Returns
+            -------
+            Response
+                json des ingrédients, ceux dont le nom commence par le préfixe en premier
+            """
+    limite = request.args.get("limit", "")
+    limite = min(int(limite), PLAT_PAR_PAGE_MAX) if limite.isdigit() and int(limite) > 0 else AUTOCOMPLETION_NOMBRE
+
+    return jsonify({
+        "links": {
+            "self": request.url
+        },
+        "data": [
+            {
+                "type": "ingredient",
+                "id": ingredient_id,
+                "attributes": {
+                    "name": nom,
+                    "type": typologie
+                }
+            }
+            for ingredient_id, nom, typologie in index_noms.completer(request.args.get("prefix", ""), limite)
+        ]
+    })
+
+
+@app.route(API_ROUTE+"/liste_courses")
+def api_liste_courses():
+    """permet de calculer la liste de courses d'un menu : /api/liste_courses?plats=1:4,7:2 pour le plat 1 pour
+    4 convives et le plat 7 pour 2 convives. Les quantités sont additionnées par ingrédient et par unité (les masses
+    en grammes, les volumes en millilitres).
+
+            Returns
+            -------
+            Response
+                json des ingrédients à acheter (200) ou liste des erreurs rencontrées (400)
+            """
+    statut, demandes = lire_menu(request.args.get("plats", ""))
+    if statut is True:
+        statut, donnees = liste_courses(demandes)
+    else:
+        donnees = demandes
+    if statut is not True:
+        response = jsonify({"erreurs": donnees})
+        response.status_code = 400
+        return response
+
+    return jsonify({
+        "links": {
+            "self": request.url
+        },
+        "data": [
+            {
+                "type": "ingredient",
+                "id": ingredient["id"],
+                "attributes": {
+                    "name": ingredient["nom"],
+                    "quantite": ingredient["quantite"],
+                    "unite": ingredient["unite"]
+                }
+            }
+            for ingredient in donnees["ingredients"]
+        ],
+        "meta": {
+            "menu": [
+                {
+                    "plat": plat_id,
+                    "convives": convives
+                }
+                for plat_id, convives in demandes
+            ],
+            "non_quantifies": donnees["non_quantifies"]
+        }
+    })
+
+
 @app.route(API_ROUTE+"/plats/<plat_id>")
+@cache_reponses.reponse(etiquettes=lambda plat_id: [("plat", int(plat_id) if plat_id.isdigit() else plat_id)])
 def api_places_single(plat_id):
+    statut, donnees = lire_parametres(request.args)
+    if statut is not True:
+        response = jsonify({"erreurs": donnees})
+        response.status_code = 400
+        return response
+    champs, inclusions = donnees
+
     try:
-        query = Plat.query.get(plat_id)
-        return jsonify(query.to_jsonapi_dict())
+        query = Plat.query.options(*options_plats(champs, inclusions)).filter(Plat.plat_id == plat_id).first()
+        dict_resultats = query.to_jsonapi_dict(champs=champs, inclusions=inclusions)
+        if inclusions:
+            dict_resultats = {"data": dict_resultats, "included": inclure([query], inclusions)}
+        return jsonify(dict_resultats)
     except:
         return json_404()
 
 
+@app.route(API_ROUTE+"/plats/<int:plat_id>/composition", methods=["POST"])
+@connexion_requise
+def api_plats_composition(plat_id):
+    """permet d'ajouter en une seule transaction plusieurs ingrédients à la composition d'un plat. Le corps de la
+    requête est un json de la forme {"data": [{"ingredient": 3, "quantite": "1 kg"}, ...]}. La route est réservée
+    aux utilisateurs connectés.
+
+            Returns
+            -------
+            Response
+                json du plat (201), liste des erreurs rencontrées (400) ou erreur si l'utilisateur n'est pas
+                connecté (401)
+            """
+    corps = request.get_json(silent=True) or {}
+    lignes = corps.get("data", []) if isinstance(corps, dict) else []
+    if not isinstance(lignes, list) or not all(isinstance(ligne, dict) for ligne in lignes):
+        response = jsonify({"erreurs": ["Le corps de la requête n'est pas valide"]})
+        response.status_code = 400
+        return response
+
+    statut, donnees = Composition.ajout_bulk(
+        plat=plat_id,
+        lignes=[(ligne.get("ingredient"), ligne.get("quantite")) for ligne in lignes]
+    )
+    if statut is not True:
+        response = jsonify({"erreurs": donnees})
+        response.status_code = 400
+        return response
+
+    plat = Plat.query.options(chargement_auteurs()).filter(Plat.plat_id == plat_id).first()
+    response = jsonify(plat.to_jsonapi_dict())
+    response.status_code = 201
+    return response
+
+
 @app.route(API_ROUTE+"/plats")
 def api_plats_browse():
     motclef = request.args.get("q", None)
     page = request.args.get("page", 1)
+    limite = request.args.get("limit", None)
+    apres = request.args.get("after", None)
+    avant = request.args.get("before", None)
 
     if isinstance(page, str) and page.isdigit():
         page = int(page)
     else:
         page = 1
 
+    limite = lire_limite(limite)
+
+    statut, donnees = lire_parametres(request.args)
+    if statut is not True:
+        response = jsonify({"erreurs": donnees})
+        response.status_code = 400
+        return response
+    champs, inclusions = donnees
+
     if motclef:
-        query = Plat.query.filter(Plat.plat_nom.like("%{}%".format(motclef)))
+        query = rechercher_plats(motclef)
     else:
-        query = Plat.query
+        # Ordre explicite : sans lui, SQLite peut lire les plats par un autre index quand seules quelques colonnes
+        # sont demandées (fields[plat]), et l'ordre des pages changerait avec les champs.
+        query = Plat.query.order_by(Plat.plat_id)
+
+    if apres is not None or avant is not None:
+        return api_plats_curseur(query, motclef, limite, apres, avant, champs, inclusions)
+    query = query.options(*options_plats(champs, inclusions))
 
     try:
-        resultats = query.paginate(page=page, per_page=PLAT_PAR_PAGE)
+        resultats = query.paginate(page=page, per_page=limite)
     except Exception:
         return json_404()
 
+    gabarits = Plat.gabarits_liens()
     dict_resultats = {
         "links": {
             "self": request.url
         },
         "data": [
-            plat.to_jsonapi_dict()
+            plat.to_jsonapi_dict(gabarits=gabarits, champs=champs, inclusions=inclusions)
             for plat in resultats.items
         ]
     }
+    if inclusions:
+        dict_resultats["included"] = inclure(resultats.items, inclusions)
 
-    if resultats.has_next:
-        arguments = {
-            "page": resultats.next_num
-        }
-        if motclef:
-            arguments["q"] = motclef
-        dict_resultats["links"]["next"] = url_for("api_plats_browse", _external=True)+"?"+urlencode(arguments)
+    dict_resultats["links"].update(liens_pages(motclef, limite, page, resultats.has_next, resultats.has_prev,
+                                               parametres_a_reporter(request.args)))
 
-    if resultats.has_prev:
-        arguments = {
-            "page": resultats.prev_num
-        }
-        if motclef:
-            arguments["q"] = motclef
-        dict_resultats["links"]["prev"] = url_for("api_plats_browse", _external=True)+"?"+urlencode(arguments)
+    response = jsonify(dict_resultats)
+    return response
+
+
+@app.route(API_ROUTE+"/plats", methods=["DELETE"])
+@connexion_requise
+def api_plats_suppression():
+    """permet de supprimer en une seule transaction plusieurs plats, avec leur composition et leurs éditions. Les id
+    des plats sont donnés par le paramètre ids, séparés par des virgules : DELETE /api/plats?ids=1,2,3. La route est
+    réservée aux utilisateurs connectés.
+
+            Returns
+            -------
+            Response
+                json des id des plats supprimés (200), liste des erreurs rencontrées (400) ou erreur si l'utilisateur
+                n'est pas connecté (401)
+            """
+    ids = [plat_id.strip() for plat_id in request.args.get("ids", "").split(",") if plat_id.strip()]
+    if len(ids) > PLAT_PAR_SUPPRESSION_MAX:
+        statut, donnees = False, ["Impossible de supprimer plus de {} plats à la fois".format(
+            PLAT_PAR_SUPPRESSION_MAX)]
+    else:
+        statut, donnees = Plat.supprimer(ids)
+    if statut is not True:
+        response = jsonify({"erreurs": donnees})
+        response.status_code = 400
+        return response
+
+    return jsonify({
+        "meta": {
+            "demandes": len(set(ids)),
+            "supprimes": len(donnees)
+        },
+        "data": [
+            {
+                "type": "place",
+                "id": plat_id
+            }
+            for plat_id in donnees
+        ]
+    })
+
+
+def plat_au_dela(query, plat_id: int, apres: bool) -> bool:
+    """permet de savoir si une requête sur les plats renvoie au moins un plat après (ou avant) un id, en ne lisant
+    qu'un id par l'index de la clef primaire.
+
+            Paramètres
+            ----------
+            query :
+                requête sur les plats, sans stratégie de chargement.
+
+            plat_id :
+                id à partir duquel chercher.
+
+            apres :
+                True pour chercher un id plus grand, False pour un id plus petit.
+
+            Returns
+            -------
+            Booleen
+                indique si un tel plat existe
+            """
+    condition = Plat.plat_id > plat_id if apres else Plat.plat_id < plat_id
+    return query.order_by(None).filter(condition).with_entities(Plat.plat_id).limit(1).first() is not None
+
+
+def api_plats_curseur(query, motclef, limite, apres, avant, champs=None, inclusions=None):
+    """permet de parcourir les plats par curseur (pagination "keyset") : au lieu d'un OFFSET et d'un COUNT(*),
+    on lit les limite + 1 plats qui suivent (ou précèdent) l'id du curseur, dans l'ordre des id. Le plat de trop
+    indique s'il existe une page dans le sens de la lecture ; pour l'autre sens, plat_au_dela() vérifie qu'un plat
+    précède (ou suit) la page, pour ne pas renvoyer de lien vers une page vide.
+
+            Paramètres
+            ----------
+            query :
+                requête sur les plats, éventuellement filtrée par le mot-clef, sans stratégie de chargement.
+
+            motclef :
+                mot-clef de la recherche, à reporter dans les liens.
+
+            limite :
+                nombre de plats par page.
+
+            apres :
+                curseur (ou id) après lequel commencer la lecture.
+
+            avant :
+                curseur (ou id) avant lequel terminer la lecture.
+
+            champs :
+                champs demandés (fields[plat]), tous par défaut.
+
+            inclusions :
+                relations incluses (include).
+
+            Returns
+            -------
+            Response
+                json des plats et des liens vers les pages suivante et précédente
+            """
+    curseur = decoder_curseur(apres if apres is not None else avant)
+    if curseur is None:
+        return json_404()
+
+    query = query.order_by(None)
+    chargement = query.options(*options_plats(champs, inclusions))
+    if apres is not None:
+        plats = chargement.filter(Plat.plat_id > curseur).order_by(Plat.plat_id).limit(limite + 1).all()
+        suivante = len(plats) > limite
+        plats = plats[:limite]
+        precedente = bool(plats) and plat_au_dela(query, plats[0].plat_id, apres=False)
+    else:
+        plats = chargement.filter(Plat.plat_id < curseur).order_by(Plat.plat_id.desc()).limit(limite + 1).all()
+        precedente = len(plats) > limite
+        plats = list(reversed(plats[:limite]))
+        suivante = bool(plats) and plat_au_dela(query, plats[-1].plat_id, apres=True)
+
+    gabarits = Plat.gabarits_liens()
+    dict_resultats = {
+        "links": {
+            "self": request.url
+        },
+        "data": [
+            plat.to_jsonapi_dict(gabarits=gabarits, champs=champs, inclusions=inclusions)
+            for plat in plats
+        ]
+    }
+    if inclusions:
+        dict_resultats["included"] = inclure(plats, inclusions)
+
+    dict_resultats["links"].update(liens_curseurs(motclef, limite, plats, suivante, precedente,
+                                                  parametres_a_reporter(request.args)))
 
     response = jsonify(dict_resultats)
     return response
+
+
+def api_facettes(colonne_facette, ordre: tuple = ()):
+    """permet de produire le json des facettes d'une colonne et de leurs effectifs.
+
+            Paramètres
+            ----------
+            colonne_facette :
+                colonne dont les valeurs distinctes forment les facettes.
+
+            ordre :
+                valeurs de la facette dans l'ordre où elles doivent être présentées, voir compter().
+
+            Returns
+            -------
+            Response
+                json des facettes
+            """
+    return jsonify({
+        "links": {
+            "self": request.url
+        },
+        "data": [
+            {
+                "type": "facet",
+                "id": valeur,
+                "attributes": {
+                    "count": nombre
+                }
+            }
+            for valeur, nombre in compter(colonne_facette, ordre)
+        ]
+    })
+
+
+@app.route(API_ROUTE+"/facets/plats")
+def api_facettes_plats():
+    return api_facettes(Plat.plat_type, ORDRE_TYPES_PLAT)
+
+
+@app.route(API_ROUTE+"/facets/ingredients")
+def api_facettes_ingredients():
+    return api_facettes(Ingredient.ingredient_type)
+
+
+@app.route(API_ROUTE+"/cache")
+def api_cache():
+    """permet de consulter les compteurs du cache des réponses (hits, misses, évictions...), et sous "fragments"
+    ceux du cache des morceaux de gabarits.
+
+            Returns
+            -------
+            Response
+                json des compteurs
+            """
+    return jsonify(dict(cache_reponses.statistiques(), fragments=cache_fragments.statistiques()))
@@ -1,10 +1,52 @@
-from flask import render_template, request, flash, redirect
+from flask import render_template, stream_template, request, flash, redirect, url_for
 from flask_login import login_user, current_user, logout_user
 
 from ..app import app, login, db
-from ..modeles.donnees import Plat, Ingredient, Composition
+from ..modeles.donnees import Plat, Ingredient, Composition, chargement_composition_plat, \
+    chargement_composition_ingredient
 from ..modeles.users import User
-from ..constantes import PLAT_PAR_PAGE
+from ..modeles.recherche import rechercher_plats, rechercher_ingredients
+from ..modeles.facettes import facettes_plats, facettes_ingredients, compter, ORDRE_TYPES_PLAT
+from ..modeles.hasard import plats_au_hasard
+from ..modeles.similaires import plats_similaires
+from ..modeles.listes import LETTRES, AUTRES, lire_lettre, lister
+from ..cache import cache_reponses, etiqueter, ne_pas_garder
+from ..hachage import HachageSurcharge
+from ..constantes import PLAT_PAR_PAGE, SIMILAIRES_NOMBRE, FLUX_TAILLE_MORCEAU
+
+
+def rendu_en_flux(gabarit: str, **contexte):
+    """permet d'envoyer une page au navigateur au fur et à mesure de son rendu (stream_template), plutôt que de la
+    construire entièrement en mémoire. Les petits morceaux produits par Jinja sont regroupés en morceaux d'environ
+    FLUX_TAILLE_MORCEAU caractères avant d'être envoyés.
+
+            Paramètres
+            ----------
+            gabarit :
+                chemin du gabarit à rendre.
+
+            contexte :
+                variables passées au gabarit ; les générateurs qu'il parcourt sont lus pendant l'envoi.
+
+            Returns
+            -------
+            Response
+                réponse envoyée au fil du rendu
+            """
+    flux = stream_template(gabarit, **contexte)
+
+    def morceaux():
+        tampon, taille = [], 0
+        for morceau in flux:
+            tampon.append(morceau)
+            taille += len(morceau)
+            if taille >= FLUX_TAILLE_MORCEAU:
+                yield "".join(tampon)
+                tampon, taille = [], 0
+        if tampon:
+            yield "".join(tampon)
+
+    return app.response_class(morceaux(), mimetype="text/html")
 
 
 @app.route("/", methods=["GET", "POST"])
@@ -21,21 +63,23 @@ def accueil():
 
 @app.route("/plat", methods=["GET", "POST"])
 def plat() -> list:
-    """permet d'afficher la page avec la liste de tous les plats de la base de données.
+    """permet d'afficher la page avec la liste de tous les plats de la base de données, ou seulement de ceux dont le
+    nom commence par une lettre (/plat?lettre=A, "#" pour les autres initiales). Les plats sont lus par lots pendant
+    l'envoi de la page.
 
         Returns
         -------
-        Template
-            correspondant à la page des plats de l'application
-
-        List
-            correspondant aux informations sur les plats qui ont été récupérées
+        Response
+            correspondant à la page des plats de l'application, envoyée au fil du rendu
         """
-    plats = Plat.query.order_by(Plat.plat_nom).all()
-    return render_template("pages/plat/plat.html", plats=plats)
+    lettre = lire_lettre(request.args.get("lettre"))
+    return rendu_en_flux("pages/plat/plat.html",
+                         plats=lister([Plat.plat_id, Plat.plat_nom], Plat.plat_nom, lettre),
+                         lettre=lettre, lettres=LETTRES + [AUTRES])
 
 
 @app.route("/plats/<int:plat_id>", methods=["GET", "POST"])
+@cache_reponses.reponse(etiquettes=lambda plat_id: [("plat", plat_id)])
 def plat_info(plat_id: int) -> list:
     """permet d'intégrer à la base de données les informations sur la composition des recettes.
 
@@ -53,11 +97,40 @@ def plat_info(plat_id: int) -> list:
             list
                 correspondant aux informations sur le plat qui ont été récupérées
             """
-    unique_plat = Plat.query.get(plat_id)
+    unique_plat = Plat.query.options(chargement_composition_plat()).filter(Plat.plat_id == plat_id).first()
     i = []
-    for ingredien in Plat.query.get(plat_id).composition:
-        i.append([ingredien.quantite, ingredien.composition_ingredient])
-    return render_template("pages/plat/plat_info.html", plat=unique_plat, i=i)
+    similaires = []
+    if unique_plat:
+        for ingredien in unique_plat.composition:
+            i.append([ingredien.quantite, ingredien.composition_ingredient])
+            etiqueter(("ingredient", ingredien.composition_ingredient_id))
+        similaires = plats_similaires(plat_id, SIMILAIRES_NOMBRE)
+        if similaires is None:
+            # Index des plats similaires en construction : la page est envoyée sans eux, et n'est pas gardée.
+            similaires = []
+            ne_pas_garder()
+        etiqueter(*[("plat", plat.plat_id) for plat, similarite in similaires])
+    return render_template("pages/plat/plat_info.html", plat=unique_plat, i=i, similaires=similaires)
+
+
+@app.route("/hasard")
+def hasard() -> list:
+    """permet de proposer des plats tirés au hasard, éventuellement d'un type donné.
+
+            Returns
+            -------
+            Template
+                correspondant à la page du hasard des recettes
+
+            List
+                correspondant aux plats tirés au hasard et aux types de plats
+            """
+    typologie = request.args.get("type", None)
+    nombre = request.args.get("n", "1")
+    nombre = min(int(nombre), PLAT_PAR_PAGE) if nombre.isdigit() else 1
+    plats = plats_au_hasard(nombre=nombre, typologie=typologie)
+    types = [facette[0] for facette in compter(Plat.plat_type, ORDRE_TYPES_PLAT)]
+    return render_template("pages/plat/hasard.html", plats=plats, types=types, typologie=typologie)
 
 
 @app.route("/recherche_plat", methods=["GET", "POST"])
@@ -85,8 +158,7 @@ def recherche_plat() -> list:
     titre = "Recherche parmi les plats"
 
     if motclef:
-        resultats = Plat.query.filter(Plat.plat_nom.like("%{}%".format(motclef))
-                                      ).paginate(page=page, per_page=PLAT_PAR_PAGE)
+        resultats = rechercher_plats(motclef).paginate(page=page, per_page=PLAT_PAR_PAGE)
         titre = "Résultat pour la recherche '" + motclef + "'"
 
     return render_template("pages/plat/recherche_plat.html", resultats=resultats, titre=titre, keyword=motclef)
@@ -101,17 +173,11 @@ def recherche_plat_type() -> list:
             Template
                 correspondant à la page de résultat de recherche de plats de l'application
 
-            List
-                correspondant aux informations sur les différentes typologies de plats qui ont été récupérées
+            function
+                qui lit les différentes typologies de plats ; le gabarit ne l'appelle que si la liste n'est pas déjà
+                dans le cache des morceaux de gabarits
             """
-    resultats_plat_principal = Plat.query.filter(Plat.plat_type == "Plat principal").order_by(Plat.plat_nom).all()
-    resultats_dessert = Plat.query.filter(Plat.plat_type == "Dessert").order_by(Plat.plat_nom).all()
-    resultats_entree = Plat.query.filter(Plat.plat_type == "Entrée").order_by(Plat.plat_nom).all()
-    resultats_accompagnement = Plat.query.filter(Plat.plat_type == "Accompagnement").order_by(Plat.plat_nom).all()
-    resultats_autre = Plat.query.filter(Plat.plat_type == "Autre").order_by(Plat.plat_nom).all()
-    return render_template("pages/plat/recherche_plat_type.html", resultats_pp=resultats_plat_principal,
-                           resultats_dessert=resultats_dessert, resultats_entree=resultats_entree,
-                           resultats_accompagnement=resultats_accompagnement, resultats_autre=resultats_autre)
+    return render_template("pages/plat/recherche_plat_type.html", facettes=facettes_plats)
 
 
 @app.route("/recherche_plat_convives", methods=["GET", "POST"])
@@ -179,20 +245,20 @@ def ajout_recette():
 
 @app.route("/plats/<int:plat_id>/adding_ingredients", methods=["GET", "POST"])
 def adding_ingredient(plat_id: int) -> str:
-    """permet de afficher tous les ingrédients de la base de données pour préparer à la fonction add_ingredients() et
-    ainsi ajouter des ingrédients à une recette de la base de données.
+    """permet d'afficher le formulaire d'ajout d'ingrédients à une recette pour préparer à la fonction
+    add_ingredients(). Les noms d'ingrédients sont complétés au fil de la saisie par l'API
+    /api/ingredients/autocomplete, la liste complète n'est donc plus chargée.
 
         Returns (si cela n'a pas fonctionné)
         -------
         Template
             correspondant à la page d'add_ingredient de l'application pour préparer à la fonction add_ingredients()
 
-        list
-            correspond la liste complète des ingrédients de la base de données et au plat auquel on veut les ajouter
+        Plat
+            correspond au plat auquel on veut ajouter des ingrédients
                 """
-    ingredi = Ingredient.query.order_by(Ingredient.ingredient_nom).all()
     unique_plat = Plat.query.get(plat_id)
-    return render_template("pages/crud/add_ingredients.html", ingredients=ingredi, plat=unique_plat)
+    return render_template("pages/crud/add_ingredients.html", plat=unique_plat)
 
 
 @app.route("/add_ingredients", methods=["GET", "POST"])
@@ -207,32 +273,33 @@ def add_ingredients():
                 si besoin
             """
     if request.method == "POST":
-        quantity = []
-        for info in request.form.get("quantity", None):
-            quantity.append(info)
-
-        if quantity:
-            print(quantity)
-
-        n = 0
-
-        for ingred in request.form.get("ingredient", None):
-            statut, donnees = Composition.ajout_compo(
-                ingredient=ingred,
-                plat=request.form.get("keyword", None),
-                dosage=quantity[n]
-            )
-            n += 1
+        plat_id = request.form.get("keyword", None)
+        ingredients = request.form.getlist("ingredient")
+        quantites = request.form.getlist("quantity")
+
+        if len(ingredients) != len(quantites):
+            # zip() écarterait sans le dire les lignes en trop : le formulaire est refusé.
+            statut, donnees = False, ["Le formulaire contient {} ingrédients pour {} quantités".format(
+                len(ingredients), len(quantites))]
+        else:
+            lignes = [
+                (ingred.strip(), dosage.strip())
+                for ingred, dosage in zip(ingredients, quantites)
+                if ingred.strip() or dosage.strip()
+            ]
+            statut, donnees = Composition.ajout_bulk(plat=plat_id, lignes=lignes)
 
         if statut is True:
             flash("Enregistrement effectué.", "success")
             return redirect("/")
         else:
             flash("Les erreurs suivantes ont été rencontrées : " + ",".join(donnees), "error")
-            return redirect("//")
+            if plat_id and plat_id.isdigit():
+                return redirect(url_for("adding_ingredient", plat_id=int(plat_id)))
+            return redirect("/")
     else:
         flash("Ca ne fonctionne pas", "error")
-        return render_template("pages/crud/add_ingredients.html")
+        return redirect("/")
 
 
 @app.route("/editer_recette", methods=["GET", "POST"])
@@ -247,31 +314,22 @@ def editer_recette():
     id = request.form.get("keyword", None)
     if id:
         if request.method == "POST":
-            nouveau_nom = request.form.get("nom", None)
-            nouvelle_recette = request.form.get("recette", None)
-            nouvelle_typologie = request.form.get("type", None)
-            nouveau_nombre = request.form.get("nombre", None)
-            modifications = []
-            if request.form.get("nom", None):
-                update_nom = Plat.query.filter(Plat.plat_id == id).first()
-                update_nom.plat_nom = nouveau_nom
-                db.session.commit()
-                modifications.append("Le nom de la recette a bien été modifié. ")
-            elif request.form.get("recette", None):
-                update_recette = Plat.query.filter(Plat.plat_id == id).first()
-                update_recette.plat_recette = nouvelle_recette
-                db.session.commit()
-                modifications.append("Le lien vers la recette a bien été modifié. ")
-            elif request.form.get("type", None):
-                update_typologie = Plat.query.filter(Plat.plat_id == id).first()
-                update_typologie.plat_type = nouvelle_typologie
-                db.session.commit()
-                modifications.append("Le type de la recette a bien été modifié. ")
-            elif request.form.get("nombre", None):
-                update_nombre = Plat.query.filter(Plat.plat_id == id).first()
-                update_nombre.plat_nombre_convives = nouveau_nombre
-                db.session.commit()
-                modifications.append("Le nombre de convives de la recette a bien été modifié. ")
+            modifications = [
+                ("nom", "plat_nom", "Le nom de la recette a bien été modifié. "),
+                ("recette", "plat_recette", "Le lien vers la recette a bien été modifié. "),
+                ("type", "plat_type", "Le type de la recette a bien été modifié. "),
+                ("nombre", "plat_nombre_convives", "Le nombre de convives de la recette a bien été modifié. ")
+            ]
+            for champ, colonne, message in modifications:
+                if request.form.get(champ, None):
+                    statut, donnees = Plat.modifier(id, colonne, request.form.get(champ))
+                    if statut is not True:
+                        flash("Les erreurs suivantes ont été rencontrées : " + ",".join(donnees), "error")
+                        if id.isdigit():
+                            return redirect(url_for("edition_recette", plat_id=int(id)))
+                    else:
+                        flash(message, "success")
+                    break
             return redirect("/")
         else:
             flash("L'application n'a pas réussi à modifier la/les information(s) de ce plat", "error")
@@ -308,17 +366,12 @@ def supprimer():
             """
     motclef = request.args.get("keyword", None)
     if motclef:
-        id = Plat.query.filter(Plat.plat_id == motclef).first()
-        db.session.delete(id)
-        db.session.commit()
-        for each in Composition.query.filter(Composition.composition_plat_id == motclef).all():
-            db.session.delete(each)
-            db.session.commit()
-        flash("Le plat a bien été supprimé", "success")
-        return redirect("/")
-    else:
-        flash("L'application n'a pas réussi à supprimer ce plat", "error")
-        return redirect("/")
+        statut, donnees = Plat.supprimer([motclef])
+        if statut is True and donnees:
+            flash("Le plat a bien été supprimé", "success")
+            return redirect("/")
+    flash("L'application n'a pas réussi à supprimer ce plat", "error")
+    return redirect("/")
 
 
 @app.route("/supprimer/<int:ids>", methods=["GET", "POST"])
@@ -345,21 +398,25 @@ def suppression(ids: int) -> int:
 
 @app.route("/ingredients/all")
 def ingredients() -> list:
-    """permet de faire une liste de tous les ingrédients dans la base de données
+    """permet de faire une liste de tous les ingrédients dans la base de données, ou seulement de ceux dont le nom
+    commence par une lettre (/ingredients/all?lettre=A). Les ingrédients sont lus par lots pendant l'envoi de la
+    page.
 
             Returns
             -------
-            Template
-                correspondant à la page qui fait la liste des ingredients de la base de données
-
-            list
-                correspondant aux informations sur les ingrédients qui ont été récupérées
+            Response
+                correspondant à la page qui fait la liste des ingredients de la base de données, envoyée au fil du
+                rendu
             """
-    ingr = Ingredient.query.order_by(Ingredient.ingredient_nom).all()
-    return render_template("pages/ingredient/ingredient.html", ingredients=ingr)
+    lettre = lire_lettre(request.args.get("lettre"))
+    return rendu_en_flux("pages/ingredient/ingredient.html",
+                         ingredients=lister([Ingredient.ingredient_id, Ingredient.ingredient_nom],
+                                            Ingredient.ingredient_nom, lettre),
+                         lettre=lettre, lettres=LETTRES + [AUTRES])
 
 
 @app.route("/ingredients/<int:ingredient_id>")
+@cache_reponses.reponse(etiquettes=lambda ingredient_id: [("ingredient", ingredient_id)])
 def ingredient(ingredient_id: int) -> list:
     """permet de donner toutes les informations concernant un ingrédient de la base de données
 
@@ -377,10 +434,13 @@ def ingredient(ingredient_id: int) -> list:
             list
                 correspondant aux informations sur l'ingrédient qui ont été récupérées
             """
-    unique_ingredient = Ingredient.query.get(ingredient_id)
+    unique_ingredient = Ingredient.query.options(chargement_composition_ingredient())\
+        .filter(Ingredient.ingredient_id == ingredient_id).first()
     p = []
-    for pla in Ingredient.query.get(ingredient_id).composition:
-        p.append(pla.composition_plat)
+    if unique_ingredient:
+        for pla in unique_ingredient.composition:
+            p.append(pla.composition_plat)
+            etiqueter(("plat", pla.composition_plat_id))
     return render_template("pages/ingredient/ingredient_info.html", ingredient=unique_ingredient, p=p)
 
 
@@ -409,11 +469,11 @@ def recherche_ingredient() -> list:
     titre = "Recherche parmi les ingrédients"
 
     if motclef:
-        resultats = Ingredient.query.filter(Ingredient.ingredient_nom.like("%{}%".format(motclef))
-                                            ).paginate(page=page, per_page=PLAT_PAR_PAGE)
+        resultats = rechercher_ingredients(motclef).paginate(page=page, per_page=PLAT_PAR_PAGE)
         titre = "Résultat pour la recherche '" + motclef + "'"
 
-    return render_template("pages/ingredient/recherche_ingredient.html", resultats=resultats, titre=titre)
+    return render_template("pages/ingredient/recherche_ingredient.html", resultats=resultats, titre=titre,
+                           keyword=motclef)
 
 
 @app.route("/recherche_ingredient_type")
@@ -425,46 +485,11 @@ def recherche_ingredient_type() -> list:
             Template
                 correspondant aux résultats de la recherche parmi tous les ingrédients
 
-            list
-                correspondant aux informations sur les ingrédients qui ont été récupérées
+            function
+                qui lit les ingrédients par type ; le gabarit ne l'appelle que si la liste n'est pas déjà dans le cache
+                des morceaux de gabarits
             """
-    resultats_alcool = Ingredient.query.filter(Ingredient.ingredient_type == "Alcool"
-                                               ).order_by(Ingredient.ingredient_nom).all()
-    resultats_aromate = Ingredient.query.filter(Ingredient.ingredient_type == "Aromate"
-                                                ).order_by(Ingredient.ingredient_nom).all()
-    resultats_condiment = Ingredient.query.filter(Ingredient.ingredient_type == "Condiment"
-                                                  ).order_by(Ingredient.ingredient_nom).all()
-    resultats_eau = Ingredient.query.filter(Ingredient.ingredient_type == "Eau"
-                                            ).order_by(Ingredient.ingredient_nom).all()
-    resultats_epice = Ingredient.query.filter(Ingredient.ingredient_type == "Epice"
-                                              ).order_by(Ingredient.ingredient_nom).all()
-    resultats_fromage = Ingredient.query.filter(Ingredient.ingredient_type ==
-                                                "Fromage").order_by(Ingredient.ingredient_nom).all()
-    resultats_fruit = Ingredient.query.filter(Ingredient.ingredient_type == "Fruit"
-                                              ).order_by(Ingredient.ingredient_nom).all()
-    resultats_fruit_mer = Ingredient.query.filter(Ingredient.ingredient_type ==
-                                                  "Fruit de mer").order_by(Ingredient.ingredient_nom).all()
-    resultats_feculent = Ingredient.query.filter(Ingredient.ingredient_type ==
-                                                 "Féculent").order_by(Ingredient.ingredient_nom).all()
-    resultats_ingredient_prepare = Ingredient.query.filter(Ingredient.ingredient_type ==
-                                                           "Ingrédient préparé").order_by(
-        Ingredient.ingredient_nom).all()
-    resultats_laitage = Ingredient.query.filter(Ingredient.ingredient_type ==
-                                                "Laitage").order_by(Ingredient.ingredient_nom).all()
-    resultats_legume = Ingredient.query.filter(Ingredient.ingredient_type ==
-                                               "Légume").order_by(Ingredient.ingredient_nom).all()
-    resultats_oeuf = Ingredient.query.filter(Ingredient.ingredient_type ==
-                                             "Oeuf").order_by(Ingredient.ingredient_nom).all()
-    resultats_viande = Ingredient.query.filter(Ingredient.ingredient_type ==
-                                               "Viande").order_by(Ingredient.ingredient_nom).all()
-    return render_template("pages/ingredient/recherche_ingredient_type.html", resultats_alcool=resultats_alcool,
-                           resultats_aromate=resultats_aromate, resultats_condiment=resultats_condiment,
-                           resultats_eau=resultats_eau, resultats_epice=resultats_epice,
-                           resultats_fromage=resultats_fromage, resultats_fruit=resultats_fruit,
-                           resultats_fruit_mer=resultats_fruit_mer, resultats_feculent=resultats_feculent,
-                           resultats_ingredient_prepare=resultats_ingredient_prepare,
-                           resultats_laitage=resultats_laitage, resultats_legume=resultats_legume,
-                           resultats_oeuf=resultats_oeuf, resultats_viande=resultats_viande)
+    return render_template("pages/ingredient/recherche_ingredient_type.html", facettes=facettes_ingredients)
 
 
 @app.route("/vers_ajout_ingredient", methods=["GET", "POST"])
@@ -548,10 +573,14 @@ def connexion():
         flash("Vous êtes déjà connecté(e)", "info")
         return redirect("/")
     if request.method == "POST":
-        utilisateur = User.identification(
-            log=request.form.get("login", None),
-            motdepasse=request.form.get("motdepasse", None)
-        )
+        try:
+            utilisateur = User.identification(
+                log=request.form.get("login", None),
+                motdepasse=request.form.get("motdepasse", None)
+            )
+        except HachageSurcharge as erreur:
+            flash(str(erreur), "error")
+            return render_template("pages/connexion.html")
         if utilisateur:
             flash("Connexion effectuée", "success")
             login_user(utilisateur)
@@ -0,0 +1,239 @@
+"""Mesure la latence et le nombre de requêtes SQL de chaque route de l'application, à travers le client de test
+Flask, sur une base générée par benchmarks.generateur.
+
+    python -m benchmarks.chrono --base /tmp/recettes-100k.sqlite --iterations 200 --sortie resultats.json
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+
+# Pour chaque route : méthode HTTP, fonction qui fabrique l'url (et le corps) d'une requête à partir du générateur
+# aléatoire et du nombre de plats et d'ingrédients, et éventuellement "lourd" pour limiter le nombre d'itérations
+# ou "ecriture" pour les routes qui modifient la base de données (mesurées seulement avec --ecritures).
+SCENARIOS = {
+    "accueil": {"url": lambda h, n: "/"},
+    "plat": {"url": lambda h, n: "/plat?page={}".format(h.randint(1, 20))},
+    "plat_lettre": {"url": lambda h, n: "/plat?lettre={}".format(h.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))},
+    "plat_info": {"url": lambda h, n: "/plats/{}".format(h.randint(1, n["plat"]))},
+    "hasard": {"url": lambda h, n: "/hasard?n=5"},
+    "recherche_plat": {"url": lambda h, n: "/recherche_plat?keyword={}".format(h.choice(MOTS))},
+    "recherche_plat_type": {"url": lambda h, n: "/recherche_plat_type"},
+    "recherche_plat_convives": {"url": lambda h, n: "/recherche_plat_convives?keyword={}".format(h.randint(1, 8))},
+    "ajout_recette": {"url": lambda h, n: "/ajout_recette"},
+    "adding_ingredient": {"url": lambda h, n: "/plats/{}/adding_ingredients".format(h.randint(1, n["plat"]))},
+    "add_ingredients": {"url": lambda h, n: "/add_ingredients"},
+    "editer_recette": {"url": lambda h, n: "/editer_recette"},
+    "edition_recette": {"url": lambda h, n: "/edition_recette/{}".format(h.randint(1, n["plat"]))},
+    "supprimer": {"url": lambda h, n: "/supprimer"},
+    "suppression": {"url": lambda h, n: "/supprimer/{}".format(h.randint(1, n["plat"]))},
+    "ingredients": {"url": lambda h, n: "/ingredients/all", "lourd": True},
+    "ingredients_lettre": {"url": lambda h, n: "/ingredients/all?lettre={}".format(
+        h.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))},
+    "ingredient": {"url": lambda h, n: "/ingredients/{}".format(h.randint(1, n["ingredient"]))},
+    "recherche_ingredient": {"url": lambda h, n: "/recherche_ingredient?keyword={}".format(h.choice(MOTS))},
+    "recherche_ingredient_type": {"url": lambda h, n: "/recherche_ingredient_type"},
+    "vers_ajout_ingredient": {"url": lambda h, n: "/vers_ajout_ingredient"},
+    "ajout_ingredient": {"url": lambda h, n: "/ajout_ingredient"},
+    "inscription": {"url": lambda h, n: "/register"},
+    "connexion": {"url": lambda h, n: "/connexion"},
+    "deconnexion": {"url": lambda h, n: "/deconnexion"},
+    "api_plats_export": {"url": lambda h, n: "/api/plats/export", "lourd": True},
+    "api_plats_hasard": {"url": lambda h, n: "/api/plats/random?n=5"},
+    "api_plats_cuisinables": {"url": lambda h, n: "/api/plats/cuisinables?manquants=1&" + "&".join(
+        "ingredients={}".format(h.randint(1, n["ingredient"])) for _ in range(8))},
+    "api_ingredients_autocomplete": {"url": lambda h, n: "/api/ingredients/autocomplete?prefix={}".format(
+        h.choice(MOTS)[:h.randint(1, 4)])},
+    "api_plats_similaires": {"url": lambda h, n: "/api/plats/{}/similaires".format(h.randint(1, n["plat"]))},
+    "api_liste_courses": {"url": lambda h, n: "/api/liste_courses?plats=" + ",".join(
+        "{}:{}".format(h.randint(1, n["plat"]), h.randint(1, 8)) for _ in range(20))},
+    "api_places_single": {"url": lambda h, n: "/api/plats/{}".format(h.randint(1, n["plat"]))},
+    "api_plats_composition": {"methode": "POST", "ecriture": True,
+                              "url": lambda h, n: "/api/plats/{}/composition".format(h.randint(1, n["plat"])),
+                              "json": lambda h, n: {"data": [{"ingredient": h.randint(1, n["ingredient"]),
+                                                              "quantite": "100 g"}]}},
+    "api_plats_suppression": {"methode": "DELETE", "ecriture": True,
+                              "url": lambda h, n: "/api/plats?ids={}".format(h.randint(1, n["plat"]))},
+    "api_plats_browse": {"url": lambda h, n: "/api/plats?q={}&page={}".format(h.choice(MOTS), h.randint(1, 5))},
+    "api_plats_champs": {"url": lambda h, n: "/api/plats?fields[plat]=name,type&page={}".format(h.randint(1, 50))},
+    "api_plats_inclus": {"url": lambda h, n: "/api/plats?include=composition.ingredient,editions&page={}".format(
+        h.randint(1, 50))},
+    "api_facettes_plats": {"url": lambda h, n: "/api/facets/plats"},
+    "api_facettes_ingredients": {"url": lambda h, n: "/api/facets/ingredients"},
+    "api_cache": {"url": lambda h, n: "/api/cache"}
+}
+
+MOTS = ["gratin", "tarte", "soupe", "poulet", "choco", "pomme", "carot", "riz", "citron", "salade"]
+
+ITERATIONS_LOURDES = 3
+
+
+def centile(valeurs: list, rang: float) -> float:
+    """permet de calculer un centile par la méthode du rang le plus proche.
+
+            Paramètres
+            ----------
+            valeurs :
+                liste triée de mesures.
+
+            rang :
+                centile voulu, entre 0 et 100.
+
+            Returns
+            -------
+            float
+                valeur du centile
+            """
+    if not valeurs:
+        return None
+    return valeurs[max(0, math.ceil(rang / 100 * len(valeurs)) - 1)]
+
+
+def mesurer(client, compter_requetes, scenario: dict, iterations: int, hasard, nombres: dict,
+            vider_cache=None) -> dict:
+    """permet d'appeler une route plusieurs fois et de résumer les mesures.
+
+            Returns
+            -------
+            dict
+                centiles de latence (ms), nombre de requêtes SQL par appel et codes de réponse
+            """
+    durees, requetes, statuts, tailles = [], [], {}, []
+    for _ in range(iterations):
+        url = scenario["url"](hasard, nombres)
+        corps = scenario["json"](hasard, nombres) if "json" in scenario else None
+        if vider_cache:
+            vider_cache()
+        with compter_requetes() as executees:
+            debut = time.perf_counter()
+            response = client.open(url, method=scenario.get("methode", "GET"), json=corps, buffered=True)
+            taille = len(response.get_data())
+            durees.append((time.perf_counter() - debut) * 1000)
+        response.close()
+        requetes.append(len(executees))
+        tailles.append(taille)
+        statuts[response.status_code] = statuts.get(response.status_code, 0) + 1
+
+    durees.sort()
+    return {
+        "methode": scenario.get("methode", "GET"),
+        "exemple": url,
+        "iterations": iterations,
+        "statuts": statuts,
+        "latence_ms": {
+            "p50": round(centile(durees, 50), 3),
+            "p95": round(centile(durees, 95), 3),
+            "p99": round(centile(durees, 99), 3),
+            "moyenne": round(sum(durees) / len(durees), 3),
+            "max": round(durees[-1], 3)
+        },
+        "requetes_sql": {
+            "moyenne": round(sum(requetes) / len(requetes), 2),
+            "max": max(requetes)
+        },
+        "octets_moyens": round(sum(tailles) / len(tailles))
+    }
+
+
+def version_git() -> str:
+    """permet de retrouver le commit mesuré, pour comparer les résultats d'une version à l'autre.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(arguments=None):
+    parseur = argparse.ArgumentParser(description="Mesure la latence de chaque route de l'application.")
+    parseur.add_argument("--base", required=True, help="base SQLite générée par benchmarks.generateur")
+    parseur.add_argument("--iterations", type=int, default=100, help="nombre d'appels mesurés par route")
+    parseur.add_argument("--echauffement", type=int, default=5, help="nombre d'appels non mesurés par route")
+    parseur.add_argument("--routes", nargs="*", default=None, help="endpoints à mesurer (toutes par défaut)")
+    parseur.add_argument("--sans-cache", action="store_true",
+                         help="vide les caches des réponses et des morceaux de gabarits avant chaque appel")
+    parseur.add_argument("--ecritures", action="store_true", help="mesure aussi les routes qui écrivent en base")
+    parseur.add_argument("--graine", type=int, default=0, help="graine du générateur aléatoire")
+    parseur.add_argument("--sortie", default=None, help="fichier JSON de résultats (sortie standard par défaut)")
+    arguments = parseur.parse_args(arguments)
+
+    if not os.path.exists(arguments.base):
+        sys.exit("{} n'existe pas.".format(arguments.base))
+    os.environ["RECETTES_DB"] = os.path.abspath(arguments.base)
+
+    from application.app import app, db
+    from application.cache import cache_reponses, cache_fragments
+    from application.instrumentation import compter_requetes
+    from application.modeles.similaires import construire_index_similarites
+
+    def vider():
+        cache_reponses.vider()
+        cache_fragments.vider()
+
+    with app.app_context():
+        # Comme run.py : les index en mémoire sont construits au démarrage, hors des mesures.
+        construire_index_similarites()
+        nombres = {
+            "plat": db.session.execute(db.text("SELECT max(plat_id) FROM plat")).scalar() or 1,
+            "ingredient": db.session.execute(db.text("SELECT max(ingredient_id) FROM ingredient")).scalar() or 1
+        }
+
+    routes = {regle.endpoint for regle in app.url_map.iter_rules() if regle.endpoint != "static"}
+    demandees = set(arguments.routes) if arguments.routes else routes
+    hasard = random.Random(arguments.graine)
+    client = app.test_client()
+    # Les routes qui écrivent sont réservées aux utilisateurs connectés : elles sont mesurées avec un client
+    # connecté comme le premier utilisateur de benchmarks.generateur, pour ne pas mélanger les entrées du cache.
+    client_ecritures = app.test_client()
+    if arguments.ecritures:
+        client_ecritures.post("/connexion", data={"login": "utilisateur1", "motdepasse": "motdepasse"})
+    resultats = {}
+
+    for endpoint in sorted(demandees & set(SCENARIOS)):
+        scenario = SCENARIOS[endpoint]
+        if scenario.get("ecriture") and not arguments.ecritures:
+            continue
+        iterations = min(arguments.iterations, ITERATIONS_LOURDES) if scenario.get("lourd") else arguments.iterations
+        client_scenario = client_ecritures if scenario.get("ecriture") else client
+        mesurer(client_scenario, compter_requetes, scenario,
+                arguments.echauffement if not scenario.get("lourd") else 1, hasard, nombres)
+        resultats[endpoint] = mesurer(client_scenario, compter_requetes, scenario, iterations, hasard, nombres,
+                                      vider if arguments.sans_cache else None)
+        print("{:<28} p50 {:>9.2f} ms  p99 {:>9.2f} ms  {:>6} requêtes SQL".format(
+            endpoint, resultats[endpoint]["latence_ms"]["p50"], resultats[endpoint]["latence_ms"]["p99"],
+            resultats[endpoint]["requetes_sql"]["moyenne"]), file=sys.stderr)
+
+    rapport = {
+        "contexte": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": version_git(),
+            "python": platform.python_version(),
+            "base": os.path.abspath(arguments.base),
+            "plats": nombres["plat"],
+            "ingredients": nombres["ingredient"],
+            "iterations": arguments.iterations,
+            "sans_cache": arguments.sans_cache
+        },
+        "routes": resultats,
+        # Les routes sans scénario sont signalées pour que le banc d'essai suive l'ajout de nouvelles routes.
+        "non_mesurees": sorted(routes - set(SCENARIOS)),
+        "cache": dict(cache_reponses.statistiques(), fragments=cache_fragments.statistiques())
+    }
+    texte = json.dumps(rapport, indent=2, ensure_ascii=False)
+    if arguments.sortie:
+        with open(arguments.sortie, "w", encoding="utf-8") as fichier:
+            fichier.write(texte)
+    else:
+        print(texte)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Mesure, pour chaque route de l'application, les octets économisés par la compression des réponses (gzip et
+brotli, à plusieurs niveaux) et le temps processeur qu'elle coûte, sur une base générée par benchmarks.generateur.
+
+    python -m benchmarks.compression --base /tmp/recettes-100k.sqlite --gzip 1 6 9 --brotli 1 4 11
+
+Les corps des réponses sont d'abord obtenus sans compression, morceau par morceau pour les réponses en flux, puis
+compressés comme le fait application.compression : le temps mesuré est celui de la compression seule.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from .chrono import SCENARIOS, ITERATIONS_LOURDES
+
+
+def corps(client, scenario: dict, iterations: int, hasard, nombres: dict) -> list:
+    """permet d'obtenir les corps non compressés de plusieurs réponses d'une route.
+
+            Returns
+            -------
+            list
+                pour chaque réponse réussie, son type et la liste des morceaux envoyés (un seul si la réponse n'est
+                pas en flux)
+            """
+    reponses = []
+    for _ in range(iterations):
+        valeur = scenario["url"](hasard, nombres)
+        url, corps_json = valeur if isinstance(valeur, tuple) else (valeur, None)
+        response = client.open(url, method=scenario.get("methode", "GET"), json=corps_json)
+        morceaux = [morceau if isinstance(morceau, bytes) else morceau.encode("utf-8")
+                    for morceau in response.response] if response.is_streamed else [response.get_data()]
+        response.close()
+        if response.status_code == 200:
+            reponses.append((response.mimetype, morceaux))
+    return reponses
+
+
+def comprimer(reponses: list, encodage: str, niveau: int, compresseur) -> dict:
+    """permet de compresser des corps de réponses et de résumer les mesures.
+
+            Returns
+            -------
+            dict
+                octets moyens avant et après compression, économie en pourcentage et temps processeur moyen (ms)
+            """
+    brut, compresse, temps = 0, 0, 0.0
+    for mimetype, morceaux in reponses:
+        debut = time.process_time()
+        instance = compresseur(encodage, niveau)
+        if len(morceaux) == 1:
+            taille = len(instance.tout(morceaux[0]))
+        else:
+            taille = sum(len(instance.compresser(morceau)) for morceau in morceaux) + len(instance.terminer())
+        temps += time.process_time() - debut
+        brut += sum(len(morceau) for morceau in morceaux)
+        compresse += taille
+    nombre = max(len(reponses), 1)
+    return {
+        "octets_moyens": round(compresse / nombre),
+        "economie_pct": round(100 * (1 - compresse / brut), 1) if brut else 0.0,
+        "cpu_ms": round(temps / nombre * 1000, 3)
+    }
+
+
+def main(arguments=None):
+    parseur = argparse.ArgumentParser(description="Mesure le gain et le coût de la compression des réponses.")
+    parseur.add_argument("--base", required=True, help="base SQLite générée par benchmarks.generateur")
+    parseur.add_argument("--iterations", type=int, default=20, help="nombre de réponses par route")
+    parseur.add_argument("--routes", nargs="*", default=None, help="endpoints à mesurer (toutes par défaut)")
+    parseur.add_argument("--gzip", type=int, nargs="*", default=[1, 6, 9], help="niveaux gzip à mesurer")
+    parseur.add_argument("--brotli", type=int, nargs="*", default=[1, 4, 11], help="niveaux brotli à mesurer")
+    parseur.add_argument("--graine", type=int, default=0, help="graine du générateur aléatoire")
+    parseur.add_argument("--sortie", default=None, help="fichier JSON de résultats (sortie standard par défaut)")
+    arguments = parseur.parse_args(arguments)
+
+    if not os.path.exists(arguments.base):
+        sys.exit("{} n'existe pas.".format(arguments.base))
+    os.environ["RECETTES_DB"] = os.path.abspath(arguments.base)
+
+    from application.app import app, db
+    from application.compression import Compresseur, TYPES_COMPRESSES
+
+    with app.app_context():
+        nombres = {
+            "plat": db.session.execute(db.text("SELECT max(plat_id) FROM plat")).scalar() or 1,
+            "ingredient": db.session.execute(db.text("SELECT max(ingredient_id) FROM ingredient")).scalar() or 1
+        }
+
+    routes = {regle.endpoint for regle in app.url_map.iter_rules() if regle.endpoint != "static"}
+    demandees = set(arguments.routes) if arguments.routes else routes
+    hasard = random.Random(arguments.graine)
+    client = app.test_client()
+    encodages = [("gzip", niveau) for niveau in arguments.gzip] + [("br", niveau) for niveau in arguments.brotli]
+    resultats = {}
+
+    for endpoint in sorted(demandees & set(SCENARIOS)):
+        scenario = SCENARIOS[endpoint]
+        if scenario.get("ecriture"):
+            continue
+        iterations = min(arguments.iterations, ITERATIONS_LOURDES) if scenario.get("lourd") else arguments.iterations
+        reponses = [reponse for reponse in corps(client, scenario, iterations, hasard, nombres)
+                    if reponse[0] in TYPES_COMPRESSES]
+        if not reponses:
+            continue
+        brut = sum(len(morceau) for mimetype, morceaux in reponses for morceau in morceaux) / len(reponses)
+        resultats[endpoint] = {
+            "type": reponses[0][0],
+            "en_flux": any(len(morceaux) > 1 for mimetype, morceaux in reponses),
+            "octets_moyens": round(brut),
+            "compression": {
+                "{}-{}".format(encodage, niveau): comprimer(reponses, encodage, niveau, Compresseur)
+                for encodage, niveau in encodages
+            }
+        }
+        print("{:<28} {:>10} o  ".format(endpoint, round(brut)) + "  ".join(
+            "{} {:>5.1f} % {:>7.2f} ms".format(nom, mesure["economie_pct"], mesure["cpu_ms"])
+            for nom, mesure in resultats[endpoint]["compression"].items()), file=sys.stderr)
+
+    rapport = {
+        "contexte": {
+            "base": os.path.abspath(arguments.base),
+            "plats": nombres["plat"],
+            "iterations": arguments.iterations,
+            "seuil": app.config["COMPRESSION_SEUIL"]
+        },
+        "routes": resultats
+    }
+    texte = json.dumps(rapport, indent=2, ensure_ascii=False)
+    if arguments.sortie:
+        with open(arguments.sortie, "w", encoding="utf-8") as fichier:
+            fichier.write(texte)
+    else:
+        print(texte)
+
+
+if __name__ == "__main__":
+    main()
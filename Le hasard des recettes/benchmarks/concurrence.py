@@ -0,0 +1,191 @@
+"""Compare, sous charge concurrente, le service synchrone (Flask, WSGI) et le service asynchrone (application.asgi)
+de l'API des plats. Les deux serveurs sont lancés au préalable sur la même base, par exemple :
+
+    RECETTES_DB=/tmp/recettes-100k.sqlite flask --app application.app run --port 5000 --with-threads
+    RECETTES_DB=/tmp/recettes-100k.sqlite uvicorn application.asgi:application --port 8000
+
+    python -m benchmarks.concurrence --serveur synchrone=http://127.0.0.1:5000 \
+        --serveur asynchrone=http://127.0.0.1:8000 --concurrence 1 8 32 --requetes 1000
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .chrono import centile, MOTS
+
+
+def chemins(hasard, plats: int) -> str:
+    """permet de tirer au hasard le chemin d'une requête vers l'une des deux routes servies en asynchrone.
+    """
+    tirage = hasard.random()
+    if tirage < 0.5:
+        return "/api/plats/{}".format(hasard.randint(1, plats))
+    if tirage < 0.8:
+        return "/api/plats?page={}&limit=20".format(hasard.randint(1, 50))
+    return "/api/plats?q={}".format(hasard.choice(MOTS))
+
+
+class Client(threading.local):
+    """
+        C'est une classe qui garde une connexion HTTP persistante par processus léger.
+        """
+
+    def __init__(self, adresse: str):
+        decoupage = urlsplit(adresse)
+        self.hote, self.port = decoupage.hostname, decoupage.port or 80
+        self.connexion = None
+
+    def get(self, chemin: str) -> tuple:
+        if self.connexion is None:
+            self.connexion = http.client.HTTPConnection(self.hote, self.port, timeout=60)
+        try:
+            self.connexion.request("GET", chemin)
+            response = self.connexion.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            self.connexion.close()
+            self.connexion = None
+            raise
+
+
+def charger(adresse: str, concurrence: int, requetes: int, plats: int, graine: int) -> dict:
+    """permet d'envoyer un nombre fixe de requêtes à un serveur avec un nombre donné de clients simultanés.
+
+            Paramètres
+            ----------
+            adresse :
+                adresse du serveur, par exemple "http://127.0.0.1:8000".
+
+            concurrence :
+                nombre de clients simultanés.
+
+            requetes :
+                nombre total de requêtes.
+
+            plats :
+                nombre de plats de la base, pour tirer des id existants.
+
+            graine :
+                graine du générateur aléatoire, pour que les serveurs reçoivent les mêmes requêtes.
+
+            Returns
+            -------
+            dict
+                débit (requêtes par seconde), centiles de latence (ms) et nombre d'erreurs
+            """
+    hasard = random.Random(graine)
+    liste = [chemins(hasard, plats) for _ in range(requetes)]
+    client = Client(adresse)
+    durees, erreurs = [], [0]
+
+    def appeler(chemin):
+        debut = time.perf_counter()
+        try:
+            statut, corps = client.get(chemin)
+        except (http.client.HTTPException, OSError):
+            erreurs[0] += 1
+            return
+        if statut >= 500:
+            erreurs[0] += 1
+        durees.append((time.perf_counter() - debut) * 1000)
+
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrence) as executeur:
+        list(executeur.map(appeler, liste))
+    total = time.perf_counter() - debut
+
+    durees.sort()
+    return {
+        "concurrence": concurrence,
+        "requetes": requetes,
+        "erreurs": erreurs[0],
+        "debit": round(len(durees) / total, 1),
+        "latence_ms": {
+            "p50": round(centile(durees, 50), 3) if durees else None,
+            "p95": round(centile(durees, 95), 3) if durees else None,
+            "p99": round(centile(durees, 99), 3) if durees else None
+        }
+    }
+
+
+# Chemins toujours comparés, en plus des chemins tirés au hasard : paramètres vides ou répétés, que les deux
+# serveurs doivent lire de la même façon.
+CAS_LIMITES = [
+    "/api/plats?fields[plat]=",
+    "/api/plats?include=",
+    "/api/plats?after=",
+    "/api/plats?before=",
+    "/api/plats?q=",
+    "/api/plats?page=&limit=",
+    "/api/plats?limit=3&limit=7",
+    "/api/plats/1?fields[plat]=&include="
+]
+
+
+def comparer(serveurs: dict, plats: int, graine: int, nombre: int = 20) -> list:
+    """permet de vérifier que les serveurs renvoient exactement le même json pour les mêmes requêtes, à l'adresse du
+    serveur près dans les liens : les CAS_LIMITES, puis nombre chemins tirés au hasard.
+
+            Returns
+            -------
+            list
+                chemins pour lesquels les réponses diffèrent
+            """
+    hasard = random.Random(graine)
+    clients = {nom: Client(adresse) for nom, adresse in serveurs.items()}
+    differences = []
+    for chemin in CAS_LIMITES + [chemins(hasard, plats) for _ in range(nombre)]:
+        reponses = set()
+        for nom, client in clients.items():
+            statut, corps = client.get(chemin)
+            reponses.add((statut, corps.replace(urlsplit(serveurs[nom]).netloc.encode("ascii"), b"serveur")))
+        if len(reponses) > 1:
+            differences.append(chemin)
+    return differences
+
+
+def main(arguments=None):
+    parseur = argparse.ArgumentParser(description="Compare les serveurs synchrone et asynchrone sous charge.")
+    parseur.add_argument("--serveur", action="append", required=True, metavar="NOM=ADRESSE",
+                         help="serveur à mesurer, par exemple asynchrone=http://127.0.0.1:8000")
+    parseur.add_argument("--concurrence", type=int, nargs="+", default=[1, 8, 32], help="clients simultanés")
+    parseur.add_argument("--requetes", type=int, default=1000, help="nombre de requêtes par mesure")
+    parseur.add_argument("--plats", type=int, default=1000, help="nombre de plats de la base")
+    parseur.add_argument("--graine", type=int, default=0, help="graine du générateur aléatoire")
+    parseur.add_argument("--sortie", default=None, help="fichier JSON de résultats (sortie standard par défaut)")
+    arguments = parseur.parse_args(arguments)
+
+    serveurs = dict(serveur.split("=", 1) for serveur in arguments.serveur)
+    rapport = {
+        "contexte": {
+            "serveurs": serveurs,
+            "requetes": arguments.requetes,
+            "plats": arguments.plats
+        },
+        "differences": comparer(serveurs, arguments.plats, arguments.graine) if len(serveurs) > 1 else [],
+        "resultats": {nom: [] for nom in serveurs}
+    }
+    for concurrence in arguments.concurrence:
+        for nom, adresse in serveurs.items():
+            mesure = charger(adresse, concurrence, arguments.requetes, arguments.plats, arguments.graine)
+            rapport["resultats"][nom].append(mesure)
+            print("{:<12} {:>4} clients : {:>8.1f} requêtes/s, p99 {:>9.2f} ms, {} erreurs".format(
+                nom, concurrence, mesure["debit"], mesure["latence_ms"]["p99"] or 0, mesure["erreurs"]),
+                file=sys.stderr)
+
+    texte = json.dumps(rapport, indent=2, ensure_ascii=False)
+    if arguments.sortie:
+        with open(arguments.sortie, "w", encoding="utf-8") as fichier:
+            fichier.write(texte)
+    else:
+        print(texte)
+
+
+if __name__ == "__main__":
+    main()
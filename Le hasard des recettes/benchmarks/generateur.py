@@ -0,0 +1,153 @@
+"""Génère un catalogue synthétique (plats, ingrédients, compositions, utilisateurs, éditions) dans une base SQLite,
+pour mesurer l'application à différentes échelles.
+
+    python -m benchmarks.generateur --echelle 100k --sortie /tmp/recettes-100k.sqlite
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from application.modeles.quantites import analyser_quantite
+
+ECHELLES = {
+    "1k": 1000,
+    "100k": 100000,
+    "1m": 1000000
+}
+
+TYPES_PLAT = ["Entrée", "Plat principal", "Accompagnement", "Dessert", "Autre"]
+
+TYPES_INGREDIENT = ["Alcool", "Aromate", "Condiment", "Eau", "Epice", "Fromage", "Fruit", "Fruit de mer", "Féculent",
+                    "Ingrédient préparé", "Laitage", "Légume", "Oeuf", "Viande"]
+
+PREPARATIONS = ["Gratin", "Tarte", "Salade", "Soupe", "Velouté", "Risotto", "Curry", "Quiche", "Crumble", "Poêlée",
+                "Blanquette", "Tajine", "Gâteau", "Mousse", "Clafoutis", "Galettes", "Brochettes", "Purée"]
+
+ALIMENTS = ["poulet", "chou-fleur", "champignons", "pommes de terre", "saumon", "lentilles", "courgettes", "chocolat",
+            "pommes", "poireaux", "carottes", "boeuf", "tomates", "fromage", "riz", "épinards", "citron", "poires"]
+
+UNITES = ["g", "kg", "cl", "cuillères à soupe", "pincée", "morceaux", ""]
+
+TAILLE_LOT = 50000
+
+
+def lots(lignes, taille: int = TAILLE_LOT):
+    """permet de découper un itérable en listes de taille bornée.
+    """
+    lot = []
+    for ligne in lignes:
+        lot.append(ligne)
+        if len(lot) >= taille:
+            yield lot
+            lot = []
+    if lot:
+        yield lot
+
+
+def generer(connexion, plats: int, graine: int = 0, rapport=print) -> dict:
+    """permet de remplir une base de données migrée avec un catalogue synthétique.
+
+            Paramètres
+            ----------
+            connexion :
+                connexion sqlite3 vers une base de données vide dont le schéma est à jour.
+
+            plats :
+                nombre de plats à générer.
+
+            graine :
+                graine du générateur aléatoire, pour obtenir toujours le même catalogue.
+
+            rapport :
+                fonction appelée avec un message après chaque table.
+
+            Returns
+            -------
+            dict
+                nombre de lignes générées par table
+            """
+    hasard = random.Random(graine)
+    ingredients = max(100, plats // 10)
+    utilisateurs = max(10, plats // 100)
+    nombres = {"plat": plats, "ingredient": ingredients, "user": utilisateurs, "composition": 0, "authorship": 0}
+    connexion.execute("PRAGMA synchronous = OFF")
+
+    def inserer(table, instruction, lignes):
+        debut = time.perf_counter()
+        total = 0
+        for lot in lots(lignes):
+            connexion.executemany(instruction, lot)
+            connexion.commit()
+            total += len(lot)
+        nombres[table] = total
+        rapport("{} : {} lignes en {:.1f} s".format(table, total, time.perf_counter() - debut))
+
+    inserer("ingredient", "INSERT INTO ingredient (ingredient_id, ingredient_nom, ingredient_type) VALUES (?, ?, ?)", (
+        (i, "{} {}".format(hasard.choice(ALIMENTS).capitalize(), i), hasard.choice(TYPES_INGREDIENT))
+        for i in range(1, ingredients + 1)
+    ))
+    inserer("plat", "INSERT INTO plat (plat_id, plat_nom, plat_recette, plat_type, plat_nombre_convives) "
+                    "VALUES (?, ?, ?, ?, ?)", (
+        (i, "{} de {} n°{}".format(hasard.choice(PREPARATIONS), hasard.choice(ALIMENTS), i),
+         "https://exemple.org/recettes/{}".format(i), hasard.choice(TYPES_PLAT), hasard.randint(1, 8))
+        for i in range(1, plats + 1)
+    ))
+    inserer("composition", "INSERT INTO composition (composition_plat_id, composition_ingredient_id, quantite, "
+                           "quantite_valeur, quantite_unite) VALUES (?, ?, ?, ?, ?)", (
+        (plat_id, ingredient_id, quantite) + analyser_quantite(quantite)
+        for plat_id in range(1, plats + 1)
+        for ingredient_id, quantite in (
+            (ingredient_id, "{} {}".format(hasard.randint(1, 500), hasard.choice(UNITES)).strip())
+            for ingredient_id in hasard.sample(range(1, ingredients + 1), hasard.randint(3, 12))
+        )
+    ))
+    # Le même mot de passe ("motdepasse", haché en pbkdf2 peu coûteux) pour tous les utilisateurs synthétiques.
+    from werkzeug.security import generate_password_hash
+    empreinte = generate_password_hash("motdepasse", method="pbkdf2:sha256:1000")
+    inserer("user", "INSERT INTO user (user_id, user_nom, user_prenom, user_login, user_email, user_password) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (
+        (i, "Nom {}".format(i), "Prénom {}".format(i), "utilisateur{}".format(i),
+         "utilisateur{}@exemple.org".format(i), empreinte)
+        for i in range(1, utilisateurs + 1)
+    ))
+    inserer("authorship", "INSERT INTO authorship (authorship_plat_id, authorship_user_id) VALUES (?, ?)", (
+        (plat_id, hasard.randint(1, utilisateurs))
+        for plat_id in range(1, plats + 1)
+        for _ in range(hasard.randint(1, 2))
+    ))
+    return nombres
+
+
+def main(arguments=None):
+    parseur = argparse.ArgumentParser(description="Génère un catalogue synthétique de recettes.")
+    parseur.add_argument("--echelle", choices=sorted(ECHELLES), default="1k", help="nombre de plats à générer")
+    parseur.add_argument("--plats", type=int, default=None, help="nombre de plats, à la place de --echelle")
+    parseur.add_argument("--sortie", required=True, help="chemin de la base SQLite à créer")
+    parseur.add_argument("--graine", type=int, default=0, help="graine du générateur aléatoire")
+    arguments = parseur.parse_args(arguments)
+
+    if os.path.exists(arguments.sortie):
+        sys.exit("{} existe déjà.".format(arguments.sortie))
+    os.environ["RECETTES_DB"] = os.path.abspath(arguments.sortie)
+
+    from application.app import app, db
+    from application.migrations import migrer
+    from application.modeles.recherche import reconstruire_index
+
+    with app.app_context():
+        migrer()
+        connexion = db.engine.raw_connection()
+        try:
+            nombres = generer(connexion, arguments.plats or ECHELLES[arguments.echelle], arguments.graine)
+        finally:
+            connexion.close()
+        debut = time.perf_counter()
+        reconstruire_index()
+        print("index de recherche : {:.1f} s".format(time.perf_counter() - debut))
+    print(nombres)
+
+
+if __name__ == "__main__":
+    main()
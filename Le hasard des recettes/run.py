@@ -1,4 +1,9 @@
 from application.app import app
+from application.migrations import migrer
+from application.modeles.similaires import construire_index_similarites
 
 if __name__ == "__main__":
+    with app.app_context():
+        migrer(rapport=lambda fichier: print("Migration appliquée : {}".format(fichier)))
+        construire_index_similarites()
     app.run(debug=True)
@@ -0,0 +1,37 @@
+import os
+import tempfile
+
+import pytest
+
+# La base de données doit être choisie avant le premier import de l'application.
+dossier = tempfile.mkdtemp(prefix="recettes-tests-")
+os.environ["RECETTES_DB"] = os.path.join(dossier, "recettes.sqlite")
+
+from application.app import app, db
+from application.cache import cache_reponses, cache_fragments
+from application.migrations import migrer
+from application.modeles.similaires import construire_index_similarites
+from benchmarks.generateur import generer
+
+
+@pytest.fixture(scope="session")
+def client():
+    """permet d'obtenir un client de test sur une base de données migrée et remplie par benchmarks.generateur.
+    """
+    with app.app_context():
+        migrer()
+        connexion = db.engine.raw_connection()
+        try:
+            generer(connexion, 200, rapport=lambda message: None)
+        finally:
+            connexion.close()
+        construire_index_similarites()
+    return app.test_client()
+
+
+@pytest.fixture(autouse=True)
+def caches_vides():
+    """permet de vider les caches avant chaque test, pour que chaque requête atteigne la base de données.
+    """
+    cache_reponses.vider()
+    cache_fragments.vider()
@@ -0,0 +1,26 @@
+import pytest
+
+from application.instrumentation import verifier_nombre_requetes
+
+
+# Nombre maximal de requêtes SQL des routes dont les relations sont chargées à l'avance (selectinload,
+# joinedload) : un chargement "N+1" le ferait dépendre du nombre de lignes affichées.
+@pytest.mark.parametrize("url, maximum", [
+    ("/plats/1", 2),
+    ("/plats/57", 2),
+    ("/ingredients/1", 2),
+    ("/ingredients/12", 2),
+    ("/api/plats", 3),
+    ("/api/plats?limit=100", 3),
+    ("/api/plats/1", 2),
+    # La pagination par curseur lit aussi un id pour savoir si une page précède la page courante.
+    ("/api/plats?after=10&limit=50", 3)
+])
+def test_nombre_requetes(client, url, maximum):
+    verifier_nombre_requetes(url, maximum, client=client)
+
+
+def test_nombre_requetes_independant_de_la_page(client):
+    petite = verifier_nombre_requetes("/api/plats?limit=2", 3, client=client)
+    grande = verifier_nombre_requetes("/api/plats?limit=100", 3, client=client)
+    assert len(petite) == len(grande)